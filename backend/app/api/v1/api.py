@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.api.v1.endpoints import permisos, auth, companies, users
+from app.api.v1.endpoints import permisos, auth, companies, users, monitoring
 from app.api.v1.endpoints import trucks
 
 api_router = APIRouter()
@@ -17,4 +17,7 @@ api_router.include_router(trucks.router, prefix="", tags=["trucks"])
 api_router.include_router(companies.router, prefix="/companies", tags=["empresas"])
 
 # Incluir router de usuarios
-api_router.include_router(users.router, prefix="/users", tags=["usuarios"]) 
\ No newline at end of file
+api_router.include_router(users.router, prefix="/users", tags=["usuarios"])
+
+# Incluir router de monitoreo
+api_router.include_router(monitoring.router, prefix="/monitoring", tags=["monitoreo"]) 
\ No newline at end of file
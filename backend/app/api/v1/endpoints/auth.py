@@ -1,9 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordRequestForm
-from datetime import timedelta
-from app.core.security import create_access_token, ldap_auth, add_token_to_blacklist, is_token_blacklisted
+from starlette.concurrency import run_in_threadpool
+from datetime import datetime, timedelta
+from app.core.security import create_access_token, ldap_auth, add_token_to_blacklist
 from app.core.config import settings
-from app.core.deps import get_current_user
+from app.core.deps import get_current_user, oauth2_scheme
+from app.services.auth_context import auth_context_cache
+from app.services.ad_profile_cache import ad_profile_cache
+from app.services.refresh_tokens import refresh_token_store
 from pydantic import BaseModel, validator
 from typing import Optional, List
 import re
@@ -14,8 +18,16 @@ class TokenResponse(BaseModel):
     access_token: str
     token_type: str
     expires_in: int
+    refresh_token: Optional[str] = None
+    refresh_expires_in: Optional[int] = None
     user: dict
 
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+class LogoutRequest(BaseModel):
+    refresh_token: Optional[str] = None
+
 class LoginCredentials(BaseModel):
     username: str
     password: str
@@ -147,7 +159,7 @@ async def _authenticate_user(request: Request, username: str, password: str):
         )
     
     # Intentar autenticar con LDAP
-    auth_result = ldap_auth.authenticate(username, password, client_ip, user_agent)
+    auth_result = await ldap_auth.authenticate_async(username, password, client_ip, user_agent)
     
     # Verificar si hay error específico
     if auth_result and "error" in auth_result:
@@ -188,87 +200,123 @@ async def _authenticate_user(request: Request, username: str, password: str):
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # Verificar si el usuario existe en OneSite después de autenticación LDAP exitosa
-    from app.db.databases import get_main_db
-    from sqlalchemy import text
-    
-    main_db_gen = get_main_db()
-    main_db = next(main_db_gen)
+    # Verificar si el usuario existe en OneSite después de autenticación LDAP exitosa.
+    # Resolver el contexto de autorización aquí deja la caché lista para las
+    # peticiones siguientes del usuario.
+    user_context = await run_in_threadpool(auth_context_cache.resolve, auth_result["username"])
+    _check_onesite_access(user_context)
     
-    try:
-        # Verificar si el usuario existe en OneSite
-        result = main_db.execute(
-            text("SELECT id, username, is_active FROM OneSite.[user] WHERE username = :username"),
-            {"username": username}
-        ).fetchone()
-        
-        if not result:
-            # Usuario autenticado en AD pero no existe en OneSite
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Usuario no registrado en OneSite. Contacte al administrador para obtener acceso.",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-        
-        user_id, db_username, is_active = result
-        
-        if not is_active:
-            # Usuario existe pero está inactivo
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Usuario inactivo en OneSite. Contacte al administrador.",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-            
-    finally:
-        main_db.close()
+    # Crear token de acceso y abrir la sesión de refresh
+    claims = _token_claims(auth_result)
+    refresh_token = await run_in_threadpool(refresh_token_store.issue, claims["sub"], claims)
+    return _token_response(claims, refresh_token, refresh_token_store.ttl_seconds)
+
+def _check_onesite_access(user_context: dict):
+    """Rechaza usuarios que no están registrados o activos en OneSite"""
+    if not user_context["registered"]:
+        # Usuario autenticado en AD pero no existe en OneSite
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Usuario no registrado en OneSite. Contacte al administrador para obtener acceso.",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     
-    # Crear token de acceso
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    if not user_context["is_active"]:
+        # Usuario existe pero está inactivo
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Usuario inactivo en OneSite. Contacte al administrador.",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+def _token_claims(profile: dict) -> dict:
+    """Claims del access token a partir del perfil de AD"""
+    return {
+        "sub": profile["username"],
+        "user_id": profile.get("employee_id"),
+        "email": profile["email"],
+        "full_name": profile["full_name"],
+        "roles": profile["roles"],
+        "permissions": profile["permissions"],
+        "department": profile.get("department")
+    }
+
+def _token_response(claims: dict, refresh_token: Optional[str], refresh_expires_in: int) -> dict:
+    """Respuesta común de login y refresh"""
     access_token = create_access_token(
-        data={
-            "sub": auth_result["username"],
-            "user_id": auth_result.get("employee_id"),
-            "email": auth_result["email"],
-            "full_name": auth_result["full_name"],
-            "roles": auth_result["roles"],
-            "permissions": auth_result["permissions"],
-            "department": auth_result.get("department")
-        },
-        expires_delta=access_token_expires
+        data=claims,
+        expires_delta=timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     )
     
     return {
         "access_token": access_token,
         "token_type": "bearer",
         "expires_in": settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+        "refresh_token": refresh_token,
+        "refresh_expires_in": refresh_expires_in if refresh_token else None,
         "user": {
-            "username": auth_result["username"],
-            "email": auth_result["email"],
-            "full_name": auth_result["full_name"],
-            "department": auth_result.get("department"),
-            "roles": auth_result["roles"],
-            "permissions": auth_result["permissions"]
+            "username": claims["sub"],
+            "email": claims["email"],
+            "full_name": claims["full_name"],
+            "department": claims.get("department"),
+            "roles": claims["roles"],
+            "permissions": claims["permissions"]
         }
     }
 
+@router.post("/refresh", response_model=TokenResponse)
+async def refresh(payload: RefreshRequest):
+    """
+    Emite un nuevo access token a partir de un refresh token, sin pasar por el Directorio Activo
+    
+    El refresh token es de un solo uso: la respuesta incluye su reemplazo. Los claims se
+    reconstruyen desde el perfil AD cacheado cuando está disponible (o desde los del
+    login) y el usuario debe seguir registrado y activo en OneSite.
+    
+    Args:
+        payload: Refresh token entregado en el login o en el refresh anterior
+        
+    Returns:
+        Nuevo access token y nuevo refresh token
+        
+    Raises:
+        HTTPException: Si el refresh token es inválido, ya se usó o la sesión fue revocada
+    """
+    record = await run_in_threadpool(refresh_token_store.consume, payload.refresh_token)
+    if not record:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Refresh token inválido o expirado",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    username = record["username"]
+    user_context = await run_in_threadpool(auth_context_cache.resolve, username)
+    _check_onesite_access(user_context)
+    
+    profile = await run_in_threadpool(ad_profile_cache.get, username)
+    claims = _token_claims({**profile, "username": username}) if profile else record["claims"]
+    refresh_token = await run_in_threadpool(refresh_token_store.reissue, record, claims)
+    return _token_response(claims, refresh_token, record["remaining_seconds"])
+
 @router.post("/logout")
-async def logout(current_user: dict = Depends(get_current_user), token: str = Depends(get_current_user)):
+async def logout(payload: Optional[LogoutRequest] = None, current_user: dict = Depends(get_current_user), token: str = Depends(oauth2_scheme)):
     """
     Logout seguro con invalidación de token
     
     Args:
-        current_user: Usuario actual autenticado
+        payload: Refresh token de la sesión a revocar (opcional)
+        current_user: Usuario actual autenticado (payload del token)
         token: Token JWT actual
         
     Returns:
         Mensaje de confirmación de logout
     """
     try:
-        # Agregar token a la blacklist
-        from datetime import datetime
-        expires_at = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-        add_token_to_blacklist(token, expires_at)
+        # Agregar token a la blacklist hasta su expiración
+        await run_in_threadpool(add_token_to_blacklist, token, current_user)
+        if payload and payload.refresh_token:
+            await run_in_threadpool(refresh_token_store.revoke, payload.refresh_token)
         
         return {
             "message": "Logout exitoso",
@@ -353,7 +401,7 @@ async def get_account_status(username: str):
     """
     try:
         from app.core.security import ldap_auth
-        lockout_info = ldap_auth.account_lockout.get_account_lockout_info(username)
+        lockout_info = await ldap_auth.account_lockout.get_account_lockout_info_async(username)
         
         return {
             "username": username,
@@ -3,21 +3,25 @@ Endpoints para monitoreo de seguridad de OneSite
 """
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from typing import Dict, List
+from typing import Dict, List, Optional
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 
 from app.core.deps import get_current_user
+from app.core.logging_config import logging_stats
+from app.core.redis_client import redis_circuit_breaker
 from app.services.security_monitor import security_monitor
+from app.services.audit_writer import audit_writer
+from app.services.latency_stats import latency_recorder
 from app.db.base import get_db
+from app.db.databases import db_manager
 
 router = APIRouter()
 
 @router.get("/metrics")
 async def get_security_metrics(
-    current_user = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user = Depends(get_current_user)
 ):
     """
     Obtener métricas de seguridad en tiempo real
@@ -249,6 +253,98 @@ async def get_system_health(
             detail=f"Error verificando salud del sistema: {str(e)}"
         )
 
+@router.get("/pools")
+async def get_pool_status(
+    current_user = Depends(get_current_user)
+):
+    """
+    Obtener el estado de los pools de conexiones por base de datos
+    
+    Incluye el uso actual (`checked_out`, `overflow`) y contadores acumulados desde
+    el arranque del proceso (checkouts, pico de conexiones en uso, tiempo de espera
+    por conexión y timeouts), para dimensionar `*_POOL_SIZE` / `*_MAX_OVERFLOW`.
+    """
+    try:
+        return {
+            "status": "success",
+            "data": db_manager.get_pool_status(),
+            "timestamp": datetime.now().isoformat()
+        }
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error obteniendo estado de pools: {str(e)}"
+        )
+
+@router.get("/latency")
+async def get_latency_stats(
+    route_prefix: Optional[str] = None,
+    current_user = Depends(get_current_user)
+):
+    """
+    Obtener la latencia de las peticiones por ruta (conteo, errores 5xx, promedio,
+    p50/p95/p99 y máximo), ordenada de mayor a menor p95
+    
+    Los histogramas son de este worker y se acumulan desde su arranque. Se puede
+    filtrar por prefijo, p. ej. `route_prefix=/api/v1/trucks`.
+    """
+    return {
+        "status": "success",
+        "data": latency_recorder.snapshot(route_prefix),
+        "timestamp": datetime.now().isoformat()
+    }
+
+@router.get("/redis")
+async def get_redis_status(
+    current_user = Depends(get_current_user)
+):
+    """
+    Obtener el estado del circuit breaker de Redis y la latencia de sus comandos
+    
+    `state` es `closed`, `open` (los comandos fallan de inmediato y se usan los
+    respaldos locales) o `half_open` (probando la reconexión). `calls`, `errors`,
+    `avg_ms` y `max_ms` son de los comandos enviados por este worker desde su
+    arranque; `short_circuited` los omitidos con el circuito abierto.
+    """
+    return {
+        "status": "success",
+        "data": redis_circuit_breaker.stats(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+@router.get("/audit-queue")
+async def get_audit_queue_status(
+    current_user = Depends(get_current_user)
+):
+    """
+    Obtener el estado de la cola de auditoría de login
+    
+    `queued` son eventos pendientes de escribir; `dropped` los descartados por cola
+    llena y `failed` los que fallaron al insertar el lote (vuelven a la cola y se
+    reintentan).
+    """
+    return {
+        "status": "success",
+        "data": audit_writer.stats(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+@router.get("/log-queue")
+async def get_log_queue_status(
+    current_user = Depends(get_current_user)
+):
+    """
+    Obtener el estado de la cola de logging de este worker
+    
+    `queued` son registros pendientes de escribir y `dropped` los descartados por
+    cola llena desde el arranque.
+    """
+    return {
+        "status": "success",
+        "data": logging_stats(),
+        "timestamp": datetime.now().isoformat()
+    }
+
 @router.get("/summary")
 async def get_security_summary(
     current_user = Depends(get_current_user)
@@ -1,10 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, Path
+from fastapi import APIRouter, Depends, HTTPException, Query, Path, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import ValidationError
 from sqlalchemy.orm import Session
-from typing import List, Optional
-from app.schemas.trucks import Truck, TruckCreate, TruckUpdate
-from app.crud.crud_trucks import crud_truck
-from app.db.base import get_db
-from datetime import date
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from app.schemas.trucks import Truck, TruckCreate, TruckUpdate, TruckBulkError, TruckBulkResult, TruckBulkUpdateItem, TruckBulkUpdateResult
+from app.crud.crud_trucks import async_crud_truck, crud_truck
+from app.core.pagination import InvalidCursorError, decode_cursor, merge_cursor_filters, next_cursor_for
+from app.services.truck_cache import truck_list_cache
+from app.db.base import get_async_main_db, get_db
+from app.db.databases import AsyncDBSession, db_manager
+from app.models.trucks import Truck as TruckModel
+from datetime import date, datetime, time
+import csv
+import io
+import json
 import logging
 
 # Configurar logging
@@ -16,7 +25,7 @@ router = APIRouter()
     "/trucks", 
     response_model=List[Truck],
     summary="Obtener lista de camiones",
-    description="Retorna una lista paginada de camiones con filtros opcionales por empresa, almacén, transportista, fechas, cliente, estado y número de carga.",
+    description="Retorna una lista paginada de camiones con filtros opcionales por empresa, almacén, transportista, fechas, cliente, estado y número de carga. Soporta paginación por offset (`skip`) o por cursor (`cursor`).",
     response_description="Lista de camiones encontrados",
     tags=["trucks"]
 )
@@ -31,6 +40,7 @@ def read_trucks(
     id_customer: Optional[int] = Query(None, description="ID del cliente para filtrar"),
     estatus: Optional[int] = Query(None, description="Estado del camión para filtrar"),
     load_number: Optional[str] = Query(None, description="Número de carga para filtrar"),
+    cursor: Optional[str] = Query(None, description="Cursor opaco de la página anterior (header X-Next-Cursor). Si se envía, se ignora `skip`"),
     db: Session = Depends(get_db)
 ):
     """
@@ -39,6 +49,10 @@ def read_trucks(
     **Parámetros de paginación:**
     - `skip`: Número de registros a omitir (para paginación)
     - `limit`: Número máximo de registros a retornar (máximo 1000)
+    - `cursor`: Cursor opaco para paginación keyset. Cada respuesta con una
+      página completa incluye el header `X-Next-Cursor`; enviarlo como `cursor`
+      retorna la página siguiente con costo constante sin importar la profundidad.
+      El cursor conserva los filtros activos, por lo que no es necesario repetirlos.
     
     **Filtros disponibles:**
     - `id_empresa`: Filtrar por empresa específica
@@ -52,29 +66,161 @@ def read_trucks(
     **Ejemplo de uso:**
     ```
     GET /api/v1/trucks?skip=0&limit=10&id_empresa=1&carrier=ABC
+    GET /api/v1/trucks?limit=10&cursor=<valor de X-Next-Cursor>
     ```
     """
+    filters = {
+        "id_empresa": id_empresa,
+        "id_warehouse": id_warehouse,
+        "carrier": carrier,
+        "date_from": date_from,
+        "date_to": date_to,
+        "id_customer": id_customer,
+        "estatus": estatus,
+        "load_number": load_number,
+    }
     try:
-        logger.info(f"Obteniendo trucks con parámetros: skip={skip}, limit={limit}")
-        result = crud_truck.get_multi(
-            db, 
-            skip=skip, 
-            limit=limit, 
-            id_empresa=id_empresa,
-            id_warehouse=id_warehouse, 
-            carrier=carrier, 
-            date_from=date_from, 
-            date_to=date_to,
-            id_customer=id_customer,
-            estatus=estatus,
-            load_number=load_number
-        )
-        logger.info(f"Se encontraron {len(result)} trucks")
-        return result
+        after_id = None
+        if cursor:
+            after_id, cursor_filters = decode_cursor(cursor)
+            filters = merge_cursor_filters(cursor_filters, filters)
+
+        # Read-through: la clave incluye la versión del ámbito (empresa, almacén)
+        page = {"after_id": after_id} if cursor else {"skip": skip}
+        cache_key = truck_list_cache.build_key(filters, {**page, "limit": limit})
+        cached = truck_list_cache.get(cache_key)
+        if cached is None:
+            if cursor:
+                logger.info(f"Obteniendo trucks por cursor: after_id={after_id}, limit={limit}")
+                result = crud_truck.get_multi_after(db, after_id=after_id, limit=limit, **filters)
+            else:
+                logger.info(f"Obteniendo trucks con parámetros: skip={skip}, limit={limit}")
+                result = crud_truck.get_multi(db, skip=skip, limit=limit, **filters)
+            logger.info(f"Se encontraron {len(result)} trucks")
+            cached = {
+                "items": [Truck.model_validate(item).model_dump(mode="json") for item in result],
+                "next_cursor": next_cursor_for(result, limit, filters),
+            }
+            truck_list_cache.set(cache_key, cached)
+
+        headers = {"X-Next-Cursor": cached["next_cursor"]} if cached["next_cursor"] else None
+        return JSONResponse(content=cached["items"], headers=headers)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error al obtener trucks: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error interno del servidor: {str(e)}")
 
+# Tamaño de lote leído desde el cursor del servidor durante la exportación
+EXPORT_BATCH_SIZE = 1000
+
+# Columnas exportadas en el mismo orden de la tabla trucks_control
+EXPORT_COLUMNS = [column.name for column in TruckModel.__table__.columns]
+
+
+def _export_value(value: Any) -> Any:
+    """Convierte fechas y horas a ISO 8601 para serializar la exportación"""
+    if isinstance(value, (date, datetime, time)):
+        return value.isoformat()
+    return value
+
+
+def _iter_export_rows(filters: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """
+    Itera las filas a exportar con una sesión propia.
+
+    La sesión vive mientras dure el streaming de la respuesta, que termina
+    después de que FastAPI cierra las dependencias del endpoint.
+    """
+    db = db_manager.get_session('main')
+    try:
+        yield from crud_truck.stream_multi(db, batch_size=EXPORT_BATCH_SIZE, **filters)
+    finally:
+        db.close()
+
+
+def _stream_ndjson(filters: Dict[str, Any]) -> Iterator[str]:
+    """Genera la exportación como JSON delimitado por saltos de línea"""
+    buffer = []
+    for row in _iter_export_rows(filters):
+        buffer.append(json.dumps({key: _export_value(value) for key, value in row.items()}, ensure_ascii=False))
+        if len(buffer) >= EXPORT_BATCH_SIZE:
+            yield "\n".join(buffer) + "\n"
+            buffer = []
+    if buffer:
+        yield "\n".join(buffer) + "\n"
+
+
+def _stream_csv(filters: Dict[str, Any]) -> Iterator[str]:
+    """Genera la exportación como CSV con encabezado"""
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(EXPORT_COLUMNS)
+    pending = 0
+    for row in _iter_export_rows(filters):
+        writer.writerow([_export_value(row[column]) for column in EXPORT_COLUMNS])
+        pending += 1
+        if pending >= EXPORT_BATCH_SIZE:
+            yield output.getvalue()
+            output.seek(0)
+            output.truncate(0)
+            pending = 0
+    yield output.getvalue()
+
+
+@router.get(
+    "/trucks/export",
+    summary="Exportar camiones",
+    description="Exporta en streaming (NDJSON o CSV) todos los camiones que cumplen los filtros, con uso de memoria constante.",
+    response_description="Archivo NDJSON o CSV con los camiones encontrados",
+    tags=["trucks"]
+)
+def export_trucks(
+    format: str = Query("ndjson", description="Formato de exportación: ndjson o csv", pattern="^(ndjson|csv)$"),
+    id_empresa: Optional[int] = Query(None, description="ID de la empresa para filtrar"),
+    id_warehouse: Optional[int] = Query(None, description="ID del almacén para filtrar"),
+    carrier: Optional[str] = Query(None, description="Nombre del transportista para filtrar"),
+    date_from: Optional[date] = Query(None, description="Fecha de inicio para filtrar por fecha de envío (YYYY-MM-DD)"),
+    date_to: Optional[date] = Query(None, description="Fecha de fin para filtrar por fecha de envío (YYYY-MM-DD)"),
+    id_customer: Optional[int] = Query(None, description="ID del cliente para filtrar"),
+    estatus: Optional[int] = Query(None, description="Estado del camión para filtrar"),
+    load_number: Optional[str] = Query(None, description="Número de carga para filtrar")
+):
+    """
+    Exporta camiones en streaming sin cargar el resultado completo en memoria.
+    
+    Las filas se leen en lotes desde un cursor del servidor y se envían al cliente
+    a medida que llegan, por lo que es apto para exportar trimestres completos.
+    
+    **Formatos:**
+    - `ndjson`: Un objeto JSON por línea (`application/x-ndjson`)
+    - `csv`: CSV con encabezado (`text/csv`)
+    
+    **Filtros disponibles:** los mismos de `GET /trucks`.
+    
+    **Ejemplo de uso:**
+    ```
+    GET /api/v1/trucks/export?format=csv&id_warehouse=1&date_from=2025-04-01&date_to=2025-06-30
+    ```
+    """
+    filters = {
+        "id_empresa": id_empresa,
+        "id_warehouse": id_warehouse,
+        "carrier": carrier,
+        "date_from": date_from,
+        "date_to": date_to,
+        "id_customer": id_customer,
+        "estatus": estatus,
+        "load_number": load_number,
+    }
+    logger.info(f"Exportando trucks en formato {format} con filtros: {filters}")
+    filename = f"trucks_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{'csv' if format == 'csv' else 'ndjson'}"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+
+    if format == "csv":
+        return StreamingResponse(_stream_csv(filters), media_type="text/csv", headers=headers)
+    return StreamingResponse(_stream_ndjson(filters), media_type="application/x-ndjson", headers=headers)
+
 @router.get(
     "/trucks/{truck_id}", 
     response_model=Truck,
@@ -83,9 +229,9 @@ def read_trucks(
     response_description="Detalles del camión encontrado",
     tags=["trucks"]
 )
-def read_truck(
+async def read_truck(
     truck_id: int = Path(..., description="ID único del camión", ge=1),
-    db: Session = Depends(get_db)
+    db: AsyncDBSession = Depends(get_async_main_db)
 ):
     """
     Obtiene los detalles completos de un camión específico por su ID.
@@ -104,7 +250,7 @@ def read_truck(
     """
     try:
         logger.info(f"Obteniendo truck con ID: {truck_id}")
-        db_truck = crud_truck.get(db, truck_id)
+        db_truck = await async_crud_truck.get(db, truck_id)
         if not db_truck:
             logger.warning(f"Truck con ID {truck_id} no encontrado")
             raise HTTPException(status_code=404, detail="Truck not found")
@@ -125,9 +271,9 @@ def read_truck(
     status_code=201,
     tags=["trucks"]
 )
-def create_truck(
+async def create_truck(
     truck: TruckCreate,
-    db: Session = Depends(get_db)
+    db: AsyncDBSession = Depends(get_async_main_db)
 ):
     """
     Crea un nuevo registro de camión.
@@ -170,13 +316,188 @@ def create_truck(
     """
     try:
         logger.info(f"Recibida petición para crear truck: {truck}")
-        result = crud_truck.create(db, truck)
+        result = await async_crud_truck.create(db, truck)
         logger.info(f"Truck creado exitosamente: {result}")
         return result
     except Exception as e:
         logger.error(f"Error al crear truck: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error interno del servidor: {str(e)}")
 
+# Máximo de filas aceptadas por petición de carga masiva
+BULK_MAX_ROWS = 50000
+
+
+def _parse_bulk_csv(content: bytes) -> List[Dict[str, Any]]:
+    """Convierte un CSV con encabezado en filas; las celdas vacías se toman como nulas"""
+    reader = csv.DictReader(io.StringIO(content.decode("utf-8-sig")))
+    rows = []
+    for row in reader:
+        rows.append({
+            key.strip(): (value if value != "" else None)
+            for key, value in row.items()
+            if key is not None
+        })
+    return rows
+
+
+def _validate_bulk_rows(raw_rows: List[Any], file_name: Optional[str] = None) -> Tuple[List[Tuple[int, TruckCreate]], List[TruckBulkError]]:
+    """Valida cada fila con TruckCreate y separa las válidas de las rechazadas"""
+    valid: List[Tuple[int, TruckCreate]] = []
+    errors: List[TruckBulkError] = []
+    for index, raw in enumerate(raw_rows):
+        if not isinstance(raw, dict):
+            errors.append(TruckBulkError(index=index, errors=["La fila debe ser un objeto JSON"]))
+            continue
+        if file_name and not raw.get("file_name"):
+            raw = {**raw, "file_name": file_name[:100]}
+        try:
+            valid.append((index, TruckCreate.model_validate(raw)))
+        except ValidationError as e:
+            errors.append(TruckBulkError(
+                index=index,
+                load_number=raw.get("load_number") if isinstance(raw.get("load_number"), str) else None,
+                errors=[f"{'.'.join(str(loc) for loc in err['loc'])}: {err['msg']}" for err in e.errors()]
+            ))
+    return valid, errors
+
+
+@router.post(
+    "/trucks/bulk",
+    response_model=TruckBulkResult,
+    summary="Carga masiva de camiones",
+    description="Crea camiones en lote desde un arreglo JSON o un archivo CSV, con inserciones por lotes y errores reportados por fila.",
+    response_description="Resumen de la carga con el detalle de las filas rechazadas",
+    tags=["trucks"],
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {
+                    "schema": {"type": "array", "items": {"$ref": "#/components/schemas/TruckCreate"}}
+                },
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "properties": {"file": {"type": "string", "format": "binary"}},
+                        "required": ["file"]
+                    }
+                }
+            }
+        }
+    }
+)
+async def create_trucks_bulk(
+    request: Request,
+    db: AsyncDBSession = Depends(get_async_main_db)
+):
+    """
+    Crea camiones de forma masiva (cargas nocturnas de archivos).
+    
+    **Formatos aceptados:**
+    - `application/json`: Arreglo de objetos con los campos de `POST /trucks`
+    - `multipart/form-data`: Archivo CSV en el campo `file`, con encabezado usando
+      los nombres de campo de `POST /trucks`. Si las filas no traen `file_name`,
+      se usa el nombre del archivo subido.
+    
+    Cada fila se valida con el mismo esquema de `POST /trucks`. Las filas válidas se
+    insertan en lotes de 500 con una transacción por lote; las filas inválidas o que
+    fallen en base de datos se reportan en `errors` sin abortar la carga.
+    
+    **Ejemplo de uso:**
+    ```
+    curl -X POST /api/v1/trucks/bulk -F "file=@cargas_2025-06-26.csv"
+    ```
+    """
+    content_type = request.headers.get("content-type", "")
+    file_name = None
+    try:
+        if content_type.startswith("multipart/form-data"):
+            form = await request.form()
+            upload = form.get("file")
+            if upload is None or isinstance(upload, str):
+                raise HTTPException(status_code=400, detail="Se requiere un archivo CSV en el campo 'file'")
+            file_name = upload.filename
+            raw_rows = _parse_bulk_csv(await upload.read())
+        else:
+            raw_rows = await request.json()
+    except HTTPException:
+        raise
+    except (ValueError, UnicodeDecodeError, csv.Error) as e:
+        raise HTTPException(status_code=400, detail=f"Contenido inválido: {str(e)}")
+
+    if not isinstance(raw_rows, list):
+        raise HTTPException(status_code=400, detail="Se esperaba un arreglo de camiones")
+    if len(raw_rows) > BULK_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"Máximo {BULK_MAX_ROWS} filas por petición")
+
+    valid_rows, errors = _validate_bulk_rows(raw_rows, file_name)
+    logger.info(f"Carga masiva recibida: {len(raw_rows)} filas, {len(valid_rows)} válidas")
+
+    try:
+        created, db_errors = await async_crud_truck.create_bulk(db, valid_rows)
+    except Exception as e:
+        logger.error(f"Error en carga masiva de trucks: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error interno del servidor: {str(e)}")
+
+    errors.extend(TruckBulkError(**error) for error in db_errors)
+    errors.sort(key=lambda error: error.index)
+    return TruckBulkResult(
+        total=len(raw_rows),
+        created=created,
+        failed=len(errors),
+        errors=errors
+    )
+
+@router.patch(
+    "/trucks/bulk",
+    response_model=TruckBulkUpdateResult,
+    summary="Actualización masiva de camiones",
+    description="Aplica actualizaciones parciales a muchos camiones, identificados por ID o número de carga, con sentencias UPDATE por lote.",
+    response_description="Resumen de la actualización con el detalle de los elementos rechazados",
+    tags=["trucks"]
+)
+async def update_trucks_bulk(
+    items: List[TruckBulkUpdateItem],
+    upsert: bool = Query(False, description="Crear los camiones cuyo load_number no exista"),
+    db: AsyncDBSession = Depends(get_async_main_db)
+):
+    """
+    Actualiza muchos camiones en pocas sentencias (cambios de turno en muelle).
+    
+    Cada elemento se identifica por `id` o, si no se envía, por `load_number`, y
+    solo se modifican los campos enviados. Los elementos se agrupan por lotes y
+    por combinación de campos, y cada grupo se aplica con un único
+    `UPDATE ... FROM (VALUES ...)`, en lugar de una consulta y un commit por camión.
+    
+    Con `upsert=true`, los elementos identificados por `load_number` que no existan
+    se insertan como camiones nuevos.
+    
+    **Ejemplo de uso:**
+    ```json
+    [
+      {"load_number": "LOAD-2025-001", "estatus": 2, "door": "A3", "time_in": "08:30:00"},
+      {"id": 42, "estado_cargue": 2, "time_out": "16:45:00"}
+    ]
+    ```
+    """
+    if len(items) > BULK_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"Máximo {BULK_MAX_ROWS} elementos por petición")
+    try:
+        logger.info(f"Actualización masiva recibida: {len(items)} elementos, upsert={upsert}")
+        updated, created, errors = await async_crud_truck.update_bulk(db, list(enumerate(items)), upsert=upsert)
+    except Exception as e:
+        logger.error(f"Error en actualización masiva de trucks: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error interno del servidor: {str(e)}")
+
+    bulk_errors = sorted((TruckBulkError(**error) for error in errors), key=lambda error: error.index)
+    return TruckBulkUpdateResult(
+        total=len(items),
+        updated=updated,
+        created=created,
+        failed=len(bulk_errors),
+        errors=bulk_errors
+    )
+
 @router.put(
     "/trucks/{truck_id}", 
     response_model=Truck,
@@ -185,10 +506,10 @@ def create_truck(
     response_description="Camión actualizado exitosamente",
     tags=["trucks"]
 )
-def update_truck(
+async def update_truck(
     truck_id: int = Path(..., description="ID único del camión a actualizar", ge=1),
     truck: TruckUpdate = None,
-    db: Session = Depends(get_db)
+    db: AsyncDBSession = Depends(get_async_main_db)
 ):
     """
     Actualiza los datos de un camión existente.
@@ -214,11 +535,11 @@ def update_truck(
     """
     try:
         logger.info(f"Actualizando truck con ID: {truck_id}")
-        db_truck = crud_truck.get(db, truck_id)
+        db_truck = await async_crud_truck.get(db, truck_id)
         if not db_truck:
             logger.warning(f"Truck con ID {truck_id} no encontrado para actualizar")
             raise HTTPException(status_code=404, detail="Truck not found")
-        result = crud_truck.update(db, db_truck, truck)
+        result = await async_crud_truck.update(db, db_truck, truck)
         logger.info(f"Truck actualizado exitosamente: {result}")
         return result
     except HTTPException:
@@ -235,9 +556,9 @@ def update_truck(
     response_description="Camión eliminado exitosamente",
     tags=["trucks"]
 )
-def delete_truck(
+async def delete_truck(
     truck_id: int = Path(..., description="ID único del camión a eliminar", ge=1),
-    db: Session = Depends(get_db)
+    db: AsyncDBSession = Depends(get_async_main_db)
 ):
     """
     Elimina un camión existente.
@@ -256,7 +577,7 @@ def delete_truck(
     """
     try:
         logger.info(f"Eliminando truck con ID: {truck_id}")
-        result = crud_truck.remove(db, truck_id)
+        result = await async_crud_truck.remove(db, truck_id)
         if not result:
             logger.warning(f"Truck con ID {truck_id} no encontrado para eliminar")
             raise HTTPException(status_code=404, detail="Truck not found")
@@ -276,10 +597,10 @@ def delete_truck(
     response_description="Lista de camiones encontrados",
     tags=["trucks"]
 )
-def read_trucks_by_empresa_and_warehouse(
+async def read_trucks_by_empresa_and_warehouse(
     id_empresa: int = Path(..., description="ID de la empresa", ge=1),
     id_warehouse: int = Path(..., description="ID del almacén", ge=1),
-    db: Session = Depends(get_db)
+    db: AsyncDBSession = Depends(get_async_main_db)
 ):
     """
     Obtiene todos los camiones de una empresa y almacén específicos.
@@ -295,7 +616,7 @@ def read_trucks_by_empresa_and_warehouse(
     """
     try:
         logger.info(f"Obteniendo trucks por empresa {id_empresa} y warehouse {id_warehouse}")
-        result = crud_truck.get_by_empresa_and_warehouse(db, id_empresa, id_warehouse)
+        result = await async_crud_truck.get_by_empresa_and_warehouse(db, id_empresa, id_warehouse)
         logger.info(f"Se encontraron {len(result)} trucks")
         return result
     except Exception as e:
@@ -310,12 +631,12 @@ def read_trucks_by_empresa_and_warehouse(
     response_description="Lista de camiones encontrados",
     tags=["trucks"]
 )
-def read_trucks_by_empresa_warehouse_and_dates(
+async def read_trucks_by_empresa_warehouse_and_dates(
     id_empresa: int = Path(..., description="ID de la empresa", ge=1),
     id_warehouse: int = Path(..., description="ID del almacén", ge=1),
     date_from: date = Query(..., description="Fecha de inicio (YYYY-MM-DD)"),
     date_to: date = Query(..., description="Fecha de fin (YYYY-MM-DD)"),
-    db: Session = Depends(get_db)
+    db: AsyncDBSession = Depends(get_async_main_db)
 ):
     """
     Obtiene camiones de una empresa y almacén específicos dentro de un rango de fechas.
@@ -333,7 +654,7 @@ def read_trucks_by_empresa_warehouse_and_dates(
     """
     try:
         logger.info(f"Obteniendo trucks por empresa {id_empresa}, warehouse {id_warehouse}, fechas {date_from} a {date_to}")
-        result = crud_truck.get_by_empresa_warehouse_and_dates(db, id_empresa, id_warehouse, date_from, date_to)
+        result = await async_crud_truck.get_by_empresa_warehouse_and_dates(db, id_empresa, id_warehouse, date_from, date_to)
         logger.info(f"Se encontraron {len(result)} trucks")
         return result
     except Exception as e:
@@ -348,11 +669,11 @@ def read_trucks_by_empresa_warehouse_and_dates(
     response_description="Lista de camiones encontrados",
     tags=["trucks"]
 )
-def read_trucks_by_warehouse_and_dates(
+async def read_trucks_by_warehouse_and_dates(
     id_warehouse: int = Path(..., description="ID del almacén", ge=1),
     date_from: date = Query(..., description="Fecha de inicio (YYYY-MM-DD)"),
     date_to: date = Query(..., description="Fecha de fin (YYYY-MM-DD)"),
-    db: Session = Depends(get_db)
+    db: AsyncDBSession = Depends(get_async_main_db)
 ):
     """
     Obtiene camiones de un almacén específico dentro de un rango de fechas.
@@ -369,7 +690,7 @@ def read_trucks_by_warehouse_and_dates(
     """
     try:
         logger.info(f"Obteniendo trucks por warehouse {id_warehouse}, fechas {date_from} a {date_to}")
-        result = crud_truck.get_by_warehouse_and_dates(db, id_warehouse, date_from, date_to)
+        result = await async_crud_truck.get_by_warehouse_and_dates(db, id_warehouse, date_from, date_to)
         logger.info(f"Se encontraron {len(result)} trucks")
         return result
     except Exception as e:
@@ -384,9 +705,9 @@ def read_trucks_by_warehouse_and_dates(
     response_description="Lista de camiones encontrados",
     tags=["trucks"]
 )
-def read_trucks_by_carrier(
+async def read_trucks_by_carrier(
     carrier: str = Path(..., description="Nombre del transportista"),
-    db: Session = Depends(get_db)
+    db: AsyncDBSession = Depends(get_async_main_db)
 ):
     """
     Obtiene todos los camiones de un transportista específico.
@@ -401,7 +722,7 @@ def read_trucks_by_carrier(
     """
     try:
         logger.info(f"Obteniendo trucks por carrier: {carrier}")
-        result = crud_truck.get_by_carrier(db, carrier)
+        result = await async_crud_truck.get_by_carrier(db, carrier)
         logger.info(f"Se encontraron {len(result)} trucks")
         return result
     except Exception as e:
@@ -416,9 +737,9 @@ def read_trucks_by_carrier(
     response_description="Detalles del camión encontrado",
     tags=["trucks"]
 )
-def read_truck_by_load_number(
+async def read_truck_by_load_number(
     load_number: str = Path(..., description="Número de carga del camión"),
-    db: Session = Depends(get_db)
+    db: AsyncDBSession = Depends(get_async_main_db)
 ):
     """
     Obtiene los detalles de un camión específico por su número de carga.
@@ -437,7 +758,7 @@ def read_truck_by_load_number(
     """
     try:
         logger.info(f"Obteniendo truck por load_number: {load_number}")
-        db_truck = crud_truck.get_by_load_number(db, load_number)
+        db_truck = await async_crud_truck.get_by_load_number(db, load_number)
         if not db_truck:
             logger.warning(f"Truck con load_number {load_number} no encontrado")
             raise HTTPException(status_code=404, detail="Truck not found")
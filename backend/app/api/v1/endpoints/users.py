@@ -1,19 +1,34 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
-from sqlalchemy import text, and_
+from sqlalchemy import func, text, and_
 from typing import List, Optional
 from app.db.databases import get_main_db, get_companies_db
 from app.crud.crud_user import crud_user
+from app.crud.crud_user_company_permission import crud_user_company_permission
 from app.schemas.user import User, UserCreate, UserUpdate
-from app.core.deps import get_current_user
+from app.core.deps import get_auth_context
 from app.core.security import get_password_hash
 from app.models.user import User as UserModel
 from app.models.user_company_permission import UserCompanyPermission
 from app.models.role import Role
+from app.services.auth_context import auth_context_cache
+from app.services.ad_profile_cache import ad_profile_cache
+from app.services.refresh_tokens import refresh_token_store
 from pydantic import BaseModel
 
 router = APIRouter()
 
+def _require_superuser(auth_context: dict, detail: str):
+    """
+    Solo los superusuarios de OneSite administran usuarios.
+
+    Se valida contra el contexto de autorización (invalidado en cada escritura de
+    `/users`) y no contra los permisos del token, para que una baja o un cambio de
+    rol surtan efecto sin esperar a que el token expire.
+    """
+    if not auth_context["is_superuser"]:
+        raise HTTPException(status_code=403, detail=detail)
+
 class UserCompanyPermissionCreate(BaseModel):
     company_code: str
     permission_type: str = "read"
@@ -44,21 +59,21 @@ def test_users():
 
 @router.get("/", response_model=List[UserWithPermissions])
 def get_users(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     search: Optional[str] = Query(None),
     active_only: bool = Query(True),
     db: Session = Depends(get_main_db),
-    current_user: dict = Depends(get_current_user)
+    auth_context: dict = Depends(get_auth_context)
 ):
     """
-    Obtiene una lista paginada de usuarios con sus permisos de empresa
+    Obtiene una lista paginada de usuarios con sus permisos de empresa.
+    El total de usuarios que cumplen los filtros se retorna en el header X-Total-Count.
     """
     try:
-        # Verificar que el usuario actual tenga permisos de administrador
-        if not current_user.get("permissions") or "*" not in current_user.get("permissions", []):
-            if "users:read" not in current_user.get("permissions", []):
-                raise HTTPException(status_code=403, detail="No tienes permisos para ver usuarios")
+        # Verificar que el usuario actual sea administrador de OneSite
+        _require_superuser(auth_context, "No tienes permisos para ver usuarios")
         
         # Construir consulta base
         query = db.query(UserModel)
@@ -73,27 +88,17 @@ def get_users(
                 UserModel.full_name.contains(search)
             )
         
-        # Obtener usuarios paginados
-        users = query.offset(skip).limit(limit).all()
+        # Obtener usuarios paginados junto con el total (COUNT(*) OVER () en la misma consulta)
+        rows = query.add_columns(func.count().over().label("total")).order_by(UserModel.id).offset(skip).limit(limit).all()
+        users = [user_obj for user_obj, _ in rows]
+        total = rows[0].total if rows else (query.count() if skip else 0)
+        response.headers["X-Total-Count"] = str(total)
+        
+        # Permisos de empresa de toda la página en una sola consulta
+        permissions = crud_user_company_permission.get_active_by_user_ids(db, [user_obj.id for user_obj in users])
         
-        # Para cada usuario, obtener sus permisos de empresa
         result = []
         for user_obj in users:
-            # Obtener permisos de empresa
-            company_permissions = db.query(UserCompanyPermission).filter(
-                and_(
-                    UserCompanyPermission.user_id == user_obj.id,
-                    UserCompanyPermission.is_active == True
-                )
-            ).all()
-            
-            companies = []
-            for perm in company_permissions:
-                companies.append({
-                    "company_code": perm.company_code,
-                    "permission_type": perm.permission_type
-                })
-            
             result.append(UserWithPermissions(
                 id=user_obj.id,
                 username=user_obj.username,
@@ -101,7 +106,7 @@ def get_users(
                 full_name=user_obj.full_name,
                 is_active=user_obj.is_active,
                 is_superuser=user_obj.is_superuser,
-                companies=companies,
+                companies=permissions[user_obj.id],
                 roles=[]  # TODO: Implementar roles cuando exista la relación
             ))
         
@@ -116,16 +121,14 @@ def get_users(
 def create_user(
     user_data: UserCreateRequest,
     db: Session = Depends(get_main_db),
-    current_user: dict = Depends(get_current_user)
+    auth_context: dict = Depends(get_auth_context)
 ):
     """
     Crea un nuevo usuario en OneSite con permisos de empresa
     """
     try:
-        # Verificar que el usuario actual tenga permisos de administrador
-        if not current_user.get("permissions") or "*" not in current_user.get("permissions", []):
-            if "users:create" not in current_user.get("permissions", []):
-                raise HTTPException(status_code=403, detail="No tienes permisos para crear usuarios")
+        # Verificar que el usuario actual sea administrador de OneSite
+        _require_superuser(auth_context, "No tienes permisos para crear usuarios")
         
         # Verificar que el username no exista
         existing_user = db.query(UserModel).filter(UserModel.username == user_data.username).first()
@@ -152,22 +155,23 @@ def create_user(
         db.commit()
         db.refresh(new_user)
         
-        # Crear permisos de empresa
-        created_permissions = []
-        for company_perm in user_data.company_permissions:
-            permission = UserCompanyPermission(
+        # Crear permisos de empresa (se insertan en lote al hacer commit)
+        db.add_all([
+            UserCompanyPermission(
                 user_id=new_user.id,
                 company_code=company_perm.company_code,
                 permission_type=company_perm.permission_type,
-                created_by=current_user["sub"]
+                created_by=auth_context["username"]
             )
-            db.add(permission)
-            created_permissions.append({
-                "company_code": company_perm.company_code,
-                "permission_type": company_perm.permission_type
-            })
+            for company_perm in user_data.company_permissions
+        ])
+        created_permissions = [
+            {"company_code": company_perm.company_code, "permission_type": company_perm.permission_type}
+            for company_perm in user_data.company_permissions
+        ]
         
         db.commit()
+        auth_context_cache.invalidate(new_user.username)
         
         return UserWithPermissions(
             id=new_user.id,
@@ -190,16 +194,14 @@ def create_user(
 def get_user(
     user_id: int,
     db: Session = Depends(get_main_db),
-    current_user: dict = Depends(get_current_user)
+    auth_context: dict = Depends(get_auth_context)
 ):
     """
     Obtiene un usuario específico por ID
     """
     try:
-        # Verificar permisos
-        if not current_user.get("permissions") or "*" not in current_user.get("permissions", []):
-            if "users:read" not in current_user.get("permissions", []):
-                raise HTTPException(status_code=403, detail="No tienes permisos para ver usuarios")
+        # Verificar que el usuario actual sea administrador de OneSite
+        _require_superuser(auth_context, "No tienes permisos para ver usuarios")
         
         # Buscar usuario
         user_obj = db.query(UserModel).filter(UserModel.id == user_id).first()
@@ -207,19 +209,7 @@ def get_user(
             raise HTTPException(status_code=404, detail="Usuario no encontrado")
         
         # Obtener permisos de empresa
-        company_permissions = db.query(UserCompanyPermission).filter(
-            and_(
-                UserCompanyPermission.user_id == user_obj.id,
-                UserCompanyPermission.is_active == True
-            )
-        ).all()
-        
-        companies = []
-        for perm in company_permissions:
-            companies.append({
-                "company_code": perm.company_code,
-                "permission_type": perm.permission_type
-            })
+        companies = crud_user_company_permission.get_active_by_user_ids(db, [user_obj.id])[user_obj.id]
         
         return UserWithPermissions(
             id=user_obj.id,
@@ -242,16 +232,14 @@ def update_user(
     user_id: int,
     user_data: UserCreateRequest,
     db: Session = Depends(get_main_db),
-    current_user: dict = Depends(get_current_user)
+    auth_context: dict = Depends(get_auth_context)
 ):
     """
     Actualiza un usuario existente
     """
     try:
-        # Verificar permisos
-        if not current_user.get("permissions") or "*" not in current_user.get("permissions", []):
-            if "users:write" not in current_user.get("permissions", []):
-                raise HTTPException(status_code=403, detail="No tienes permisos para modificar usuarios")
+        # Verificar que el usuario actual sea administrador de OneSite
+        _require_superuser(auth_context, "No tienes permisos para modificar usuarios")
         
         # Buscar usuario
         user_obj = db.query(UserModel).filter(UserModel.id == user_id).first()
@@ -275,6 +263,7 @@ def update_user(
                 raise HTTPException(status_code=400, detail="Email ya existe")
         
         # Actualizar datos del usuario
+        previous_username = user_obj.username
         user_obj.username = user_data.username
         user_obj.email = user_data.email
         user_obj.full_name = user_data.full_name
@@ -288,25 +277,29 @@ def update_user(
         # Desactivar permisos existentes
         db.query(UserCompanyPermission).filter(
             UserCompanyPermission.user_id == user_id
-        ).update({"is_active": False})
+        ).update({"is_active": False}, synchronize_session=False)
         
-        # Crear nuevos permisos
-        created_permissions = []
-        for company_perm in user_data.company_permissions:
-            permission = UserCompanyPermission(
+        # Crear nuevos permisos (se insertan en lote al hacer commit)
+        db.add_all([
+            UserCompanyPermission(
                 user_id=user_id,
                 company_code=company_perm.company_code,
                 permission_type=company_perm.permission_type,
-                created_by=current_user["sub"]
+                created_by=auth_context["username"]
             )
-            db.add(permission)
-            created_permissions.append({
-                "company_code": company_perm.company_code,
-                "permission_type": company_perm.permission_type
-            })
+            for company_perm in user_data.company_permissions
+        ])
+        created_permissions = [
+            {"company_code": company_perm.company_code, "permission_type": company_perm.permission_type}
+            for company_perm in user_data.company_permissions
+        ]
         
         db.commit()
         db.refresh(user_obj)
+        auth_context_cache.invalidate(previous_username, user_obj.username)
+        ad_profile_cache.invalidate(previous_username, user_obj.username)
+        if previous_username != user_obj.username:
+            refresh_token_store.revoke_user(previous_username)
         
         return UserWithPermissions(
             id=user_obj.id,
@@ -325,20 +318,47 @@ def update_user(
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Error actualizando usuario: {str(e)}")
 
+@router.delete("/{user_id}/profile-cache")
+def invalidate_user_profile_cache(
+    user_id: int,
+    db: Session = Depends(get_main_db),
+    auth_context: dict = Depends(get_auth_context)
+):
+    """
+    Descarta el perfil AD y el contexto de autorización cacheados de un usuario,
+    para que el próximo login refleje cambios de grupos hechos en el Directorio Activo
+    """
+    try:
+        # Verificar que el usuario actual sea administrador de OneSite
+        _require_superuser(auth_context, "No tienes permisos para modificar usuarios")
+        
+        # Buscar usuario
+        user_obj = db.query(UserModel).filter(UserModel.id == user_id).first()
+        if not user_obj:
+            raise HTTPException(status_code=404, detail="Usuario no encontrado")
+        
+        ad_profile_cache.invalidate(user_obj.username)
+        auth_context_cache.invalidate(user_obj.username)
+        
+        return {"message": "Caché de perfil invalidada exitosamente"}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error invalidando caché de perfil: {str(e)}")
+
 @router.delete("/{user_id}")
 def delete_user(
     user_id: int,
     db: Session = Depends(get_main_db),
-    current_user: dict = Depends(get_current_user)
+    auth_context: dict = Depends(get_auth_context)
 ):
     """
     Desactiva un usuario (soft delete)
     """
     try:
-        # Verificar permisos
-        if not current_user.get("permissions") or "*" not in current_user.get("permissions", []):
-            if "users:delete" not in current_user.get("permissions", []):
-                raise HTTPException(status_code=403, detail="No tienes permisos para eliminar usuarios")
+        # Verificar que el usuario actual sea administrador de OneSite
+        _require_superuser(auth_context, "No tienes permisos para eliminar usuarios")
         
         # Buscar usuario
         user_obj = db.query(UserModel).filter(UserModel.id == user_id).first()
@@ -346,7 +366,7 @@ def delete_user(
             raise HTTPException(status_code=404, detail="Usuario no encontrado")
         
         # No permitir eliminar el propio usuario
-        if user_obj.username == current_user["sub"]:
+        if user_obj.username.lower() == auth_context["username"].lower():
             raise HTTPException(status_code=400, detail="No puedes eliminar tu propio usuario")
         
         # Desactivar usuario
@@ -358,6 +378,9 @@ def delete_user(
         ).update({"is_active": False})
         
         db.commit()
+        auth_context_cache.invalidate(user_obj.username)
+        ad_profile_cache.invalidate(user_obj.username)
+        refresh_token_store.revoke_user(user_obj.username)
         
         return {"message": "Usuario desactivado exitosamente"}
         
@@ -0,0 +1,116 @@
+"""
+Circuit breaker para dependencias externas de OneSite
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker por fallas consecutivas, seguro entre hilos.
+
+    Tras `failure_threshold` fallas seguidas el circuito se abre y `allow()` rechaza
+    las llamadas sin intentarlas durante `reset_seconds`; luego deja pasar una sola
+    llamada de prueba (semiabierto) que lo cierra si responde o lo vuelve a abrir si
+    falla. Además acumula conteo, errores y latencia de las llamadas intentadas.
+
+    Cada cambio de estado abre una nueva generación. `allow()` entrega a la llamada
+    la generación vigente y `record()` solo cambia el estado si la recibe de vuelta:
+    una llamada iniciada antes de abrirse el circuito que termina después no lo
+    cierra ni libera el turno de la llamada de prueba.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_seconds: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self.state = "closed"
+        self.generation = 1
+        self.consecutive_failures = 0
+        self._opened_at = 0.0
+        self._trial_started_at: Optional[float] = None
+        self.opened_count = 0
+        self.short_circuited = 0
+        self.calls = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def _transition(self, state: str) -> None:
+        self.state = state
+        self.generation += 1
+        self._trial_started_at = None
+
+    def allow(self) -> Optional[int]:
+        """
+        Indica si la llamada puede intentarse.
+
+        Returns:
+            Generación que la llamada debe pasar a `record()`, o None si el circuito
+            la rechaza
+        """
+        with self._lock:
+            if self.state == "closed":
+                return self.generation
+            now = time.monotonic()
+            if self.state == "open" and now - self._opened_at >= self.reset_seconds:
+                self._transition("half_open")
+            if self.state == "half_open":
+                # Una llamada de prueba que no reporta en `reset_seconds` cede su turno
+                if self._trial_started_at is not None and now - self._trial_started_at >= self.reset_seconds:
+                    self._transition("half_open")
+                if self._trial_started_at is None:
+                    self._trial_started_at = now
+                    return self.generation
+            self.short_circuited += 1
+            return None
+
+    def record(self, generation: int, elapsed_ms: float, failed: bool) -> None:
+        """Registra el resultado de una llamada intentada con la generación que entregó `allow()`"""
+        with self._lock:
+            self.calls += 1
+            self.total_ms += elapsed_ms
+            self.max_ms = max(self.max_ms, elapsed_ms)
+            if failed:
+                self.errors += 1
+            if generation != self.generation:
+                # Llamada de una generación anterior: solo cuenta para las estadísticas
+                return
+            if not failed:
+                if self.state != "closed":
+                    logger.info(f"Circuito {self.name} cerrado: el servicio responde de nuevo")
+                    self._transition("closed")
+                self.consecutive_failures = 0
+                return
+            self.consecutive_failures += 1
+            if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+                self.opened_count += 1
+                logger.warning(
+                    f"Circuito {self.name} abierto tras {self.consecutive_failures} fallas; "
+                    f"reintento en {self.reset_seconds}s"
+                )
+                self._transition("open")
+                self._opened_at = time.monotonic()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "name": self.name,
+                "state": self.state,
+                "generation": self.generation,
+                "consecutive_failures": self.consecutive_failures,
+                "failure_threshold": self.failure_threshold,
+                "reset_seconds": self.reset_seconds,
+                "opened_count": self.opened_count,
+                "short_circuited": self.short_circuited,
+                "calls": self.calls,
+                "errors": self.errors,
+                "avg_ms": round(self.total_ms / self.calls, 3) if self.calls else 0.0,
+                "max_ms": round(self.max_ms, 3),
+            }
@@ -54,6 +54,11 @@ class Settings(BaseSettings):
     SECRET_KEY: str = os.getenv("SECRET_KEY")
     ALGORITHM: str = os.getenv("ALGORITHM", "HS256")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "60"))
+    # Refresh tokens rotativos guardados en Redis; 0 deshabilita el flujo de refresh
+    REFRESH_TOKEN_EXPIRE_HOURS: int = int(os.getenv("REFRESH_TOKEN_EXPIRE_HOURS", "12"))
+    # Payloads de JWT ya verificados que se reutilizan sin volver a decodificar; 0 deshabilita la caché
+    TOKEN_DECODE_CACHE_SECONDS: int = int(os.getenv("TOKEN_DECODE_CACHE_SECONDS", "30"))
+    TOKEN_DECODE_CACHE_SIZE: int = int(os.getenv("TOKEN_DECODE_CACHE_SIZE", "2048"))
     
     # Configuración de CORS
     CORS_ORIGINS: List[str] = json.loads(os.getenv("CORS_ORIGINS", '["https://teg.1sitesoft.com", "http://localhost:4200", "http://127.0.0.1:4200", "http://localhost:8000", "http://127.0.0.1:8000"]'))
@@ -69,25 +74,103 @@ class Settings(BaseSettings):
     AD_DOMAIN: str = os.getenv("AD_DOMAIN", "elite.local")
     AD_SSL_CERT_PATH: Optional[str] = os.getenv("AD_SSL_CERT_PATH", None)
     AD_VERIFY_HOSTNAME: bool = os.getenv("AD_VERIFY_HOSTNAME", "True").lower() == "true"
+    # Cuenta de servicio para las búsquedas en AD (conexiones del pool); sin ella se busca con la sesión del usuario
+    AD_SERVICE_USER: Optional[str] = os.getenv("AD_SERVICE_USER", None)
+    AD_SERVICE_PASSWORD: Optional[str] = os.getenv("AD_SERVICE_PASSWORD", None)
+    # Pool de conexiones LDAP: también limita los binds simultáneos por worker
+    LDAP_POOL_SIZE: int = int(os.getenv("LDAP_POOL_SIZE", "10"))
+    LDAP_POOL_TIMEOUT: int = int(os.getenv("LDAP_POOL_TIMEOUT", "10"))
+    LDAP_POOL_MAX_IDLE_SECONDS: int = int(os.getenv("LDAP_POOL_MAX_IDLE_SECONDS", "300"))
+    # Vigencia del perfil AD cacheado (grupos, roles y permisos); 0 deshabilita la caché
+    AD_PROFILE_CACHE_TTL_SECONDS: int = int(os.getenv("AD_PROFILE_CACHE_TTL_SECONDS", "900"))
     
     # Configuración de seguridad
+    # Intentos de login por minuto y por IP
     RATE_LIMIT_PER_MINUTE: int = int(os.getenv("RATE_LIMIT_PER_MINUTE", "5"))
+    # Presupuesto de la API por minuto (unidades de costo, ver ROUTE_COSTS) por IP y por usuario
+    RATE_LIMIT_IP_PER_MINUTE: int = int(os.getenv("RATE_LIMIT_IP_PER_MINUTE", "600"))
+    RATE_LIMIT_USER_PER_MINUTE: int = int(os.getenv("RATE_LIMIT_USER_PER_MINUTE", "300"))
     MAX_LOGIN_ATTEMPTS: int = int(os.getenv("MAX_LOGIN_ATTEMPTS", "5"))
     ACCOUNT_LOCKOUT_MINUTES: int = int(os.getenv("ACCOUNT_LOCKOUT_MINUTES", "15"))
+    # Segundos que se reutilizan las métricas de /monitoring antes de volver a consultarlas
+    SECURITY_METRICS_CACHE_SECONDS: int = int(os.getenv("SECURITY_METRICS_CACHE_SECONDS", "10"))
+    # Intervalo del recolector de métricas en segundo plano (un solo worker líder); 0 lo deshabilita
+    SECURITY_METRICS_INTERVAL_SECONDS: int = int(os.getenv("SECURITY_METRICS_INTERVAL_SECONDS", "60"))
+    # Auditoría de login por lotes: tamaño de lote, intervalo máximo entre volcados y
+    # eventos en memoria antes de descartar
+    AUDIT_BATCH_SIZE: int = int(os.getenv("AUDIT_BATCH_SIZE", "100"))
+    AUDIT_FLUSH_INTERVAL_SECONDS: float = float(os.getenv("AUDIT_FLUSH_INTERVAL_SECONDS", "2"))
+    AUDIT_QUEUE_MAX_SIZE: int = int(os.getenv("AUDIT_QUEUE_MAX_SIZE", "10000"))
+    # Token Bearer exigido por /metrics (Prometheus); vacío deja el endpoint abierto
+    METRICS_TOKEN: str = os.getenv("METRICS_TOKEN", "")
+    
+    # Pool de conexiones: valores por defecto para todas las bases de datos. Cada base
+    # puede sobrescribirlos con su prefijo (SATURNO13_POOL_SIZE, JUPITER12MIA_POOL_RECYCLE, ...)
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT: int = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "300"))
+    # Con pre-ping cada checkout hace un round-trip; sin él, las conexiones caídas se
+    # detectan al fallar la consulta y el pool se invalida (acotar con POOL_RECYCLE)
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
     
     # Configuración de Redis
     REDIS_HOST: str = os.getenv("REDIS_HOST", "localhost")
     REDIS_PORT: int = int(os.getenv("REDIS_PORT", "6379"))
     REDIS_DB: int = int(os.getenv("REDIS_DB", "0"))
     REDIS_PASSWORD: Optional[str] = os.getenv("REDIS_PASSWORD", "")
+    REDIS_SOCKET_TIMEOUT: float = float(os.getenv("REDIS_SOCKET_TIMEOUT", "1.0"))
+    REDIS_MAX_CONNECTIONS: int = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+    # Circuit breaker: fallas de conexión seguidas que lo abren y segundos hasta reintentar
+    REDIS_CIRCUIT_FAILURE_THRESHOLD: int = int(os.getenv("REDIS_CIRCUIT_FAILURE_THRESHOLD", "5"))
+    REDIS_CIRCUIT_RESET_SECONDS: float = float(os.getenv("REDIS_CIRCUIT_RESET_SECONDS", "15"))
+    
+    # Configuración de caché
+    TRUCKS_CACHE_TTL_SECONDS: int = int(os.getenv("TRUCKS_CACHE_TTL_SECONDS", "60"))  # 0 deshabilita la caché
+    COMPANIES_CACHE_TTL_SECONDS: int = int(os.getenv("COMPANIES_CACHE_TTL_SECONDS", "300"))  # Snapshot en memoria del catálogo de empresas
+    AUTH_CONTEXT_CACHE_TTL_SECONDS: int = int(os.getenv("AUTH_CONTEXT_CACHE_TTL_SECONDS", "300"))  # Contexto de autorización por usuario
     
     # Configuración de logging
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
     LOG_FILE: str = os.getenv("LOG_FILE", "onesite.log")
+    # Access log en JSON (vacío lo envía a stdout)
+    ACCESS_LOG_FILE: str = os.getenv("ACCESS_LOG_FILE", "onesite-access.log")
+    # Rotación por tamaño; los archivos rotados se comprimen con gzip
+    LOG_MAX_BYTES: int = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+    LOG_BACKUP_COUNT: int = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+    # Fracción de registros INFO/DEBUG de la aplicación y de peticiones exitosas del
+    # access log que se conservan (1 = todos); errores y peticiones lentas siempre se registran
+    LOG_SAMPLE_RATE: float = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
+    ACCESS_LOG_SAMPLE_RATE: float = float(os.getenv("ACCESS_LOG_SAMPLE_RATE", "1.0"))
+    # Registros en memoria pendientes de escribir; con la cola llena se descartan y se cuentan
+    LOG_QUEUE_MAX_SIZE: int = int(os.getenv("LOG_QUEUE_MAX_SIZE", "10000"))
     
     # Configuración del entorno
     ENVIRONMENT: str = os.getenv("ENVIRONMENT", "development")
     
+    def get_pool_options(self, database_name: str) -> dict:
+        """Opciones de pool para una base de datos ('main', 'saturno13', 'jupiter12mia')"""
+        defaults = {
+            "POOL_SIZE": self.DB_POOL_SIZE,
+            "MAX_OVERFLOW": self.DB_MAX_OVERFLOW,
+            "POOL_TIMEOUT": self.DB_POOL_TIMEOUT,
+            "POOL_RECYCLE": self.DB_POOL_RECYCLE,
+            "POOL_PRE_PING": self.DB_POOL_PRE_PING,
+        }
+        if database_name != "main":
+            prefix = database_name.upper()
+            for key, default in defaults.items():
+                value = os.getenv(f"{prefix}_{key}")
+                if value is not None:
+                    defaults[key] = value.lower() == "true" if isinstance(default, bool) else int(value)
+        return {
+            "pool_size": defaults["POOL_SIZE"],
+            "max_overflow": defaults["MAX_OVERFLOW"],
+            "pool_timeout": defaults["POOL_TIMEOUT"],
+            "pool_recycle": defaults["POOL_RECYCLE"],
+            "pool_pre_ping": defaults["POOL_PRE_PING"],
+        }
+    
     # URLs de las bases de datos
     @property
     def DATABASE_URL(self) -> str:
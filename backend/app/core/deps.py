@@ -1,15 +1,13 @@
 from typing import Generator, Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from app.db.base import get_db
 from app.core.security import verify_token
 from app.core.config import settings
+from app.services.auth_context import auth_context_cache
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login")
 
 def get_current_user(
-    db: Session = Depends(get_db),
     token: str = Depends(oauth2_scheme)
 ) -> Optional[dict]:
     """
@@ -27,4 +25,26 @@ def get_current_user(
     
     # Aquí deberías obtener el usuario de la base de datos
     # Por ahora retornamos el payload
-    return payload 
\ No newline at end of file
+    return payload
+
+def get_auth_context(current_user: dict = Depends(get_current_user)) -> dict:
+    """
+    Obtiene el contexto de autorización del usuario actual en OneSite.
+
+    Retorna `user_id`, `is_superuser`, `is_active` y `company_codes` resueltos desde
+    la caché de Redis; solo consulta la base de datos si el contexto no está cacheado.
+    Rechaza a usuarios no registrados o inactivos en OneSite.
+    """
+    context = auth_context_cache.resolve(current_user["sub"])
+    
+    if not context["registered"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Usuario no registrado en OneSite. Contacte al administrador para obtener acceso."
+        )
+    if not context["is_active"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Usuario inactivo en OneSite. Contacte al administrador."
+        )
+    return context 
\ No newline at end of file
@@ -0,0 +1,130 @@
+"""
+Pool de conexiones LDAP de la cuenta de servicio para las búsquedas en el Directorio Activo
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Deque, Optional, Tuple
+
+from ldap3 import Connection, Server, SIMPLE
+
+logger = logging.getLogger(__name__)
+
+
+class LDAPPoolTimeoutError(Exception):
+    """No se obtuvo una conexión LDAP del pool dentro del tiempo de espera"""
+
+
+class LDAPPoolBindError(Exception):
+    """La cuenta de servicio no pudo autenticarse al abrir una conexión del pool"""
+
+
+class LDAPConnectionPool:
+    """
+    Pool acotado de conexiones LDAP autenticadas con la cuenta de servicio.
+
+    Abrir una conexión a AD por el puerto 636 implica un handshake TLS completo; el
+    pool lo evita reutilizando sockets abiertos para las búsquedas en el directorio.
+    Cada conexión se autentica una sola vez, al abrirse, con la cuenta de servicio, y
+    solo se usa para buscar: las credenciales de los usuarios se verifican en
+    conexiones propias que nunca entran al pool. Las conexiones cuyo bind falla, que
+    producen errores o que ya no están autenticadas como la cuenta de servicio se
+    descartan en lugar de devolverse.
+    """
+
+    def __init__(self, server: Server, bind_user: Optional[str], bind_password: Optional[str], size: int,
+                 max_idle_seconds: int, acquire_timeout: float, receive_timeout: int = 5):
+        self.server = server
+        self.bind_user = bind_user
+        self.bind_password = bind_password
+        self.size = size
+        self.max_idle_seconds = max_idle_seconds
+        self.acquire_timeout = acquire_timeout
+        self.receive_timeout = receive_timeout
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle: Deque[Tuple[Connection, float]] = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        """El pool solo funciona con una cuenta de servicio configurada"""
+        return bool(self.bind_user and self.bind_password)
+
+    def _open_connection(self) -> Connection:
+        conn = Connection(
+            self.server,
+            user=self.bind_user,
+            password=self.bind_password,
+            authentication=SIMPLE,
+            auto_bind=False,
+            receive_timeout=self.receive_timeout,
+            read_only=True,
+            lazy=False,
+            check_names=True,
+            raise_exceptions=False  # Manejar errores manualmente
+        )
+        conn.open()
+        if not conn.bind():
+            self._close(conn)
+            raise LDAPPoolBindError(f"Bind de la cuenta de servicio rechazado: {conn.result}")
+        return conn
+
+    def _take_idle(self):
+        """Retorna la conexión ociosa más reciente que siga vigente, cerrando las vencidas"""
+        now = time.monotonic()
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None
+                conn, released_at = self._idle.pop()
+            if not conn.closed and now - released_at < self.max_idle_seconds:
+                return conn
+            self._close(conn)
+
+    @staticmethod
+    def _close(conn: Connection):
+        try:
+            conn.unbind()
+        except Exception as e:
+            logger.debug(f"Error cerrando conexión LDAP: {e}")
+
+    def acquire(self) -> Connection:
+        """
+        Presta una conexión autenticada del pool, abriendo una nueva si no hay ociosas.
+
+        Raises:
+            LDAPPoolTimeoutError: Si todas las conexiones están en uso más allá del timeout
+            LDAPPoolBindError: Si la cuenta de servicio no pudo autenticarse
+        """
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            raise LDAPPoolTimeoutError("No hay conexiones LDAP disponibles")
+        try:
+            return self._take_idle() or self._open_connection()
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, conn: Connection, reusable: bool = True):
+        """Devuelve la conexión al pool o la cierra si no debe reutilizarse"""
+        try:
+            # Solo vuelven al pool conexiones abiertas y autenticadas como la cuenta de servicio
+            if reusable and not conn.closed and conn.bound and conn.user == self.bind_user:
+                with self._lock:
+                    self._idle.append((conn, time.monotonic()))
+            else:
+                self._close(conn)
+        finally:
+            self._slots.release()
+
+    def idle_count(self) -> int:
+        with self._lock:
+            return len(self._idle)
+
+    def close_all(self):
+        """Cierra las conexiones ociosas (apagado de la aplicación)"""
+        with self._lock:
+            idle, self._idle = list(self._idle), deque()
+        for conn, _ in idle:
+            self._close(conn)
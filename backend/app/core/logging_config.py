@@ -0,0 +1,213 @@
+"""
+Configuración de logging de OneSite
+
+Los registros se encolan en el hilo que los emite (`QueueHandler`) y un único
+hilo (`QueueListener`) los escribe en archivo y consola, de modo que el I/O no
+ocurre en el camino de la petición. La cola es acotada: si el disco no da abasto,
+los registros nuevos se descartan y se cuentan en lugar de acumularse en memoria.
+Los archivos rotan por tamaño y los rotados se comprimen con gzip. El access log
+se escribe como JSON en su propio archivo.
+
+Con varios workers, cada uno rota su propio archivo: usar un `LOG_FILE` por
+worker o delegar la rotación en el sistema (logrotate) si comparten ruta.
+"""
+
+import atexit
+import contextvars
+import gzip
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import shutil
+import sys
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+
+from app.core.config import settings
+
+# Logger del access log (un registro JSON por petición)
+ACCESS_LOGGER_NAME = "onesite.access"
+
+# Id de la petición en curso; lo fija el middleware y lo toman todos los registros
+request_id_var: contextvars.ContextVar[str] = contextvars.ContextVar("request_id", default="-")
+
+APP_LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s"
+
+# Campos del access log, en orden
+ACCESS_FIELDS = ("request_id", "method", "path", "route", "status", "duration_ms", "client_ip", "user_agent")
+
+# Peticiones que se registran siempre, sin muestreo
+SLOW_REQUEST_MS = 1000
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional["DroppingQueueHandler"] = None
+
+
+class RequestIdFilter(logging.Filter):
+    """Agrega `request_id` al registro (se aplica al encolar, en el contexto de la petición)"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "request_id"):
+            record.request_id = request_id_var.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Conserva una fracción de los registros INFO/DEBUG de la aplicación; WARNING o más siempre pasan"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.rate >= 1 or record.levelno >= logging.WARNING or record.name == ACCESS_LOGGER_NAME:
+            return True
+        return random.random() < self.rate
+
+
+class LoggerNameFilter(logging.Filter):
+    """Separa el access log de los registros de la aplicación"""
+
+    def __init__(self, name: str, include: bool):
+        super().__init__()
+        self.logger_name = name
+        self.include = include
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return (record.name == self.logger_name) == self.include
+
+
+class JsonFormatter(logging.Formatter):
+    """Un objeto JSON por línea con los campos estructurados del registro"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in ACCESS_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """`QueueHandler` sobre una cola acotada: con la cola llena descarta el registro y lo cuenta"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+
+
+class CompressedRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """`RotatingFileHandler` que comprime con gzip los archivos rotados (`.1.gz`, `.2.gz`, ...)"""
+
+    def __init__(self, filename: str, max_bytes: int, backup_count: int):
+        directory = os.path.dirname(os.path.abspath(filename))
+        os.makedirs(directory, exist_ok=True)
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8", delay=True)
+        self.namer = lambda name: f"{name}.gz"
+        self.rotator = self._compress
+
+    @staticmethod
+    def _compress(source: str, dest: str):
+        with open(source, "rb") as src, gzip.open(dest, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(source)
+
+
+def should_log_access(status_code: int, duration_ms: float) -> bool:
+    """Muestreo del access log: errores y peticiones lentas siempre se registran"""
+    rate = settings.ACCESS_LOG_SAMPLE_RATE
+    if rate >= 1 or status_code >= 400 or duration_ms >= SLOW_REQUEST_MS:
+        return True
+    return random.random() < rate
+
+
+def setup_logging() -> None:
+    """Configura el logging del proceso (idempotente)"""
+    global _listener, _queue_handler
+    if _listener is not None:
+        return
+
+    app_only = LoggerNameFilter(ACCESS_LOGGER_NAME, include=False)
+    access_only = LoggerNameFilter(ACCESS_LOGGER_NAME, include=True)
+    text_formatter = logging.Formatter(APP_LOG_FORMAT)
+    json_formatter = JsonFormatter()
+
+    handlers = []
+    app_file = CompressedRotatingFileHandler(settings.LOG_FILE, settings.LOG_MAX_BYTES, settings.LOG_BACKUP_COUNT)
+    app_file.setFormatter(text_formatter)
+    app_file.addFilter(app_only)
+    handlers.append(app_file)
+
+    app_stream = logging.StreamHandler(sys.stderr)
+    app_stream.setFormatter(text_formatter)
+    app_stream.addFilter(app_only)
+    handlers.append(app_stream)
+
+    if settings.ACCESS_LOG_FILE:
+        access_handler = CompressedRotatingFileHandler(settings.ACCESS_LOG_FILE, settings.LOG_MAX_BYTES, settings.LOG_BACKUP_COUNT)
+    else:
+        access_handler = logging.StreamHandler(sys.stdout)
+    access_handler.setFormatter(json_formatter)
+    access_handler.addFilter(access_only)
+    handlers.append(access_handler)
+
+    log_queue: queue.Queue = queue.Queue(settings.LOG_QUEUE_MAX_SIZE)
+    queue_handler = DroppingQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(settings.LOG_SAMPLE_RATE))
+    queue_handler.addFilter(RequestIdFilter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(getattr(logging, settings.LOG_LEVEL.upper(), logging.INFO))
+
+    # El access log se registra en INFO aunque LOG_LEVEL sea más alto
+    logging.getLogger(ACCESS_LOGGER_NAME).setLevel(logging.INFO)
+
+    _queue_handler = queue_handler
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging() -> None:
+    """Vacía la cola y detiene el hilo de escritura"""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
+
+
+def logging_stats() -> Dict:
+    """Estado de la cola de logging de este worker"""
+    if _queue_handler is None:
+        return {"queued": 0, "dropped": 0, "max_queue_size": settings.LOG_QUEUE_MAX_SIZE}
+    return {
+        "queued": _queue_handler.queue.qsize(),
+        "dropped": _queue_handler.dropped,
+        "max_queue_size": _queue_handler.queue.maxsize,
+    }
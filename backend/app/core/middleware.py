@@ -0,0 +1,168 @@
+"""
+Middleware ASGI de OneSite: CORS, headers de seguridad y registro de latencia
+"""
+
+import logging
+import re
+import time
+import uuid
+from typing import List, Tuple
+
+from app.core.logging_config import ACCESS_LOGGER_NAME, request_id_var, should_log_access
+from app.core.telemetry import HTTP_REQUESTS, HTTP_REQUEST_DURATION
+from app.services.latency_stats import latency_recorder
+
+access_logger = logging.getLogger(ACCESS_LOGGER_NAME)
+
+# Un X-Request-ID entrante se respeta solo si es corto y sin caracteres raros
+_VALID_REQUEST_ID = re.compile(rb"^[A-Za-z0-9._-]{1,64}$")
+
+# Headers CORS (se permiten todos los orígenes temporalmente)
+CORS_HEADERS: List[Tuple[bytes, bytes]] = [
+    (b"access-control-allow-origin", b"*"),
+    (b"access-control-allow-credentials", b"true"),
+    (b"access-control-expose-headers", b"X-Next-Cursor, X-Total-Count, X-RateLimit-Remaining, Retry-After, X-Request-ID"),
+]
+
+# Respuesta a las solicitudes OPTIONS (preflight), sin pasar por la aplicación
+PREFLIGHT_HEADERS: List[Tuple[bytes, bytes]] = [
+    (b"access-control-allow-origin", b"*"),
+    (b"access-control-allow-methods", b"*"),
+    (b"access-control-allow-headers", b"*"),
+    (b"access-control-allow-credentials", b"true"),
+    (b"access-control-max-age", b"86400"),  # Cache por 24 horas
+    (b"content-length", b"0"),
+]
+
+SECURITY_HEADERS: List[Tuple[bytes, bytes]] = [
+    (b"x-frame-options", b"DENY"),
+    (b"x-content-type-options", b"nosniff"),
+    (b"x-xss-protection", b"1; mode=block"),
+    (b"strict-transport-security", b"max-age=31536000; includeSubDomains"),
+    (b"content-security-policy", b"default-src 'self'; script-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net; "
+                                 b"style-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net; "
+                                 b"img-src 'self' data: https://fastapi.tiangolo.com; font-src 'self' https://cdn.jsdelivr.net"),
+    (b"referrer-policy", b"strict-origin-when-cross-origin"),
+    (b"permissions-policy", b"geolocation=(), microphone=(), camera=()"),
+]
+
+# Headers agregados a toda respuesta; reemplazan a los que ya traiga con el mismo nombre
+RESPONSE_HEADERS = CORS_HEADERS + SECURITY_HEADERS
+_RESPONSE_HEADER_NAMES = frozenset(name for name, _ in RESPONSE_HEADERS)
+
+
+def route_template(scope) -> str:
+    """Plantilla de la ruta resuelta, p. ej. /api/v1/trucks/{truck_id}"""
+    route_path = getattr(scope.get("route"), "path", None)
+    if not route_path:
+        # Las rutas no resueltas se agrupan para no crear una serie por URL
+        return "unmatched"
+    # En routers incluidos `route.path` es relativo a sus prefijos (estáticos):
+    # anteponer los segmentos de la URL que no corresponden a la ruta
+    segments = scope["path"].rstrip("/").split("/")
+    depth = route_path.rstrip("/").count("/")
+    return "/".join(segments[:len(segments) - depth]) + route_path
+
+
+def record_latency(scope, status_code: int, process_time: float) -> str:
+    """Registra la latencia de la petición por método y plantilla de ruta; retorna la plantilla"""
+    method, route = scope["method"], route_template(scope)
+    latency_recorder.record(method, route, status_code, process_time * 1000)
+    HTTP_REQUESTS.labels(method, route, str(status_code)).inc()
+    HTTP_REQUEST_DURATION.labels(method, route).observe(process_time)
+    return route
+
+
+class OneSiteMiddleware:
+    """
+    Middleware ASGI puro que reemplaza a las tres capas `@app.middleware("http")`.
+
+    Responde los preflight OPTIONS sin llegar a la aplicación, agrega los headers
+    CORS y de seguridad (listas precalculadas), `X-Process-Time` y `X-Request-ID`
+    al iniciar la respuesta, y mide la petición una sola vez, al terminar de enviar
+    el cuerpo, registrándola en el access log (JSON, muestreado). No envuelve el
+    cuerpo, así que las respuestas en streaming se envían tal cual.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        request_id = self._request_id(scope)
+        request_id_var.set(request_id)
+        request_id_header = (b"x-request-id", request_id.encode("latin-1"))
+
+        if scope["method"] == "OPTIONS":
+            await send({
+                "type": "http.response.start",
+                "status": 200,
+                "headers": PREFLIGHT_HEADERS + SECURITY_HEADERS + [self._process_time_header(started), request_id_header],
+            })
+            await send({"type": "http.response.body", "body": b""})
+            self._finish(scope, 200, started, request_id)
+            return
+
+        status_code = 500
+        finished = False
+
+        async def send_wrapper(message):
+            nonlocal status_code, finished
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = [
+                    (name, value) for name, value in message.get("headers", [])
+                    if name.lower() not in _RESPONSE_HEADER_NAMES
+                ]
+                headers.extend(RESPONSE_HEADERS)
+                headers.append(self._process_time_header(started))
+                headers.append(request_id_header)
+                message = {**message, "headers": headers}
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                finished = True
+                self._finish(scope, status_code, started, request_id)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            if not finished:
+                self._finish(scope, 500, started, request_id)
+            raise
+
+    @staticmethod
+    def _request_id(scope) -> str:
+        for name, value in scope.get("headers", []):
+            if name == b"x-request-id":
+                if _VALID_REQUEST_ID.match(value):
+                    return value.decode("latin-1")
+                break
+        return uuid.uuid4().hex
+
+    @staticmethod
+    def _process_time_header(started: float) -> Tuple[bytes, bytes]:
+        return b"x-process-time", str(time.perf_counter() - started).encode("latin-1")
+
+    @staticmethod
+    def _finish(scope, status_code: int, started: float, request_id: str):
+        process_time = time.perf_counter() - started
+        route = record_latency(scope, status_code, process_time)
+        duration_ms = round(process_time * 1000, 3)
+        if not should_log_access(status_code, duration_ms):
+            return
+        user_agent = next((value for name, value in scope.get("headers", []) if name == b"user-agent"), b"unknown")
+        # Access log (sin información sensible: ni query string ni headers de autenticación)
+        access_logger.info("request", extra={
+            "request_id": request_id,
+            "method": scope["method"],
+            "path": scope["path"],
+            "route": route,
+            "status": status_code,
+            "duration_ms": duration_ms,
+            "client_ip": scope["client"][0] if scope.get("client") else "unknown",
+            "user_agent": user_agent.decode("latin-1")[:200],
+        })
@@ -0,0 +1,95 @@
+"""
+Utilidades de paginación por cursor (keyset / seek) para OneSite
+"""
+
+import base64
+import binascii
+import json
+from datetime import date
+from typing import Any, Dict, Optional, Tuple
+
+# Campos de filtro que se serializan como fecha dentro del cursor
+_DATE_FIELDS = {"date_from", "date_to"}
+
+
+class InvalidCursorError(ValueError):
+    """El cursor recibido no es válido o no corresponde a los filtros"""
+
+
+def _normalize_filters(filters: Dict[str, Any]) -> Dict[str, Any]:
+    """Descarta filtros vacíos y convierte fechas a ISO para comparar/serializar"""
+    normalized = {}
+    for key, value in filters.items():
+        if value is None:
+            continue
+        if isinstance(value, date):
+            value = value.isoformat()
+        normalized[key] = value
+    return normalized
+
+
+def encode_cursor(last_id: int, filters: Dict[str, Any]) -> str:
+    """
+    Genera un cursor opaco con el último ID entregado y los filtros activos.
+
+    Args:
+        last_id: ID del último registro de la página actual
+        filters: Filtros aplicados a la consulta
+
+    Returns:
+        Cadena base64 segura para URL
+    """
+    payload = {"id": last_id, "f": _normalize_filters(filters)}
+    raw = json.dumps(payload, separators=(",", ":"), sort_keys=True).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[int, Dict[str, Any]]:
+    """
+    Decodifica un cursor generado por `encode_cursor`.
+
+    Returns:
+        Tupla (último ID, filtros) con las fechas ya convertidas a `date`
+
+    Raises:
+        InvalidCursorError: Si el cursor está corrupto
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        last_id = int(payload["id"])
+        filters = dict(payload.get("f") or {})
+        for key in _DATE_FIELDS & filters.keys():
+            filters[key] = date.fromisoformat(filters[key])
+    except (binascii.Error, UnicodeError, ValueError, KeyError, TypeError, OverflowError) as e:
+        # Mensaje fijo: el detalle del decodificador no se expone al cliente
+        raise InvalidCursorError("Cursor inválido") from e
+    return last_id, filters
+
+
+def merge_cursor_filters(cursor_filters: Dict[str, Any], request_filters: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Combina los filtros del cursor con los recibidos en la petición.
+
+    Los filtros explícitos de la petición deben coincidir con los del cursor;
+    los ausentes se toman del cursor.
+
+    Raises:
+        InvalidCursorError: Si algún filtro explícito difiere del cursor
+    """
+    explicit = _normalize_filters(request_filters)
+    encoded_cursor = _normalize_filters(cursor_filters)
+    for key, value in explicit.items():
+        if encoded_cursor.get(key) != value:
+            raise InvalidCursorError(f"El filtro '{key}' no corresponde al cursor")
+
+    merged = {key: None for key in request_filters}
+    merged.update({key: value for key, value in cursor_filters.items() if key in merged})
+    return merged
+
+
+def next_cursor_for(items: list, limit: int, filters: Dict[str, Any]) -> Optional[str]:
+    """Retorna el cursor de la siguiente página o None si no hay más registros"""
+    if len(items) < limit or not items:
+        return None
+    return encode_cursor(items[-1].id, filters)
@@ -0,0 +1,173 @@
+"""
+Rate limiting distribuido en Redis para OneSite
+"""
+
+import logging
+import math
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Request, Response, status
+
+from app.core.config import settings
+from app.core.redis_client import redis_client
+from app.core.security import verify_token
+from app.services.security_counters import security_counters
+
+logger = logging.getLogger(__name__)
+
+# Token bucket sobre varias claves (IP y usuario): solo consume si todas tienen saldo.
+# KEYS: un bucket por identidad; ARGV: ahora (ms), costo y (capacidad, recarga por ms) por clave.
+# Retorna {permitido, índice de la clave agotada, espera en ms, saldo mínimo restante}.
+TOKEN_BUCKET_SCRIPT = """
+local now = tonumber(ARGV[1])
+local cost = tonumber(ARGV[2])
+local levels = {}
+local blocked, retry_after = 0, 0
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[1 + i * 2])
+    local rate = tonumber(ARGV[2 + i * 2])
+    local bucket = redis.call('hmget', key, 'tokens', 'ts')
+    local tokens = tonumber(bucket[1]) or capacity
+    local elapsed = math.max(0, now - (tonumber(bucket[2]) or now))
+    tokens = math.min(capacity, tokens + elapsed * rate)
+    levels[i] = tokens
+    if tokens < cost then
+        local wait = math.ceil((cost - tokens) / rate)
+        if wait > retry_after then
+            blocked, retry_after = i, wait
+        end
+    end
+end
+if blocked > 0 then
+    return {0, blocked, retry_after, 0}
+end
+local remaining = -1
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[1 + i * 2])
+    local rate = tonumber(ARGV[2 + i * 2])
+    local left = levels[i] - cost
+    redis.call('hset', key, 'tokens', tostring(left), 'ts', tostring(now))
+    redis.call('pexpire', key, math.ceil(capacity / rate))
+    if remaining < 0 or left < remaining then
+        remaining = left
+    end
+end
+return {1, 0, 0, math.floor(remaining)}
+"""
+
+# Costo por endpoint (nombre de la función de la ruta); el resto cuesta 1.
+# Las exportaciones y operaciones masivas consumen más presupuesto que una consulta.
+ROUTE_COSTS: Dict[str, int] = {
+    "export_trucks": 20,
+    "create_trucks_bulk": 10,
+    "update_trucks_bulk": 10,
+    "read_trucks": 2,
+    "get_daily_metrics": 5,
+    "cleanup_old_data": 20,
+}
+
+# Endpoints de login: presupuesto propio por IP (RATE_LIMIT_PER_MINUTE intentos por minuto)
+LOGIN_ROUTES = frozenset({"login", "login_json"})
+
+
+class RateLimiter:
+    """
+    Token bucket compartido por todos los workers, por IP y por usuario autenticado.
+
+    Cada identidad tiene un bucket en Redis (`ratelimit:<ámbito>:<tipo>:<id>`) con
+    capacidad igual a su presupuesto por minuto, que se recarga de forma continua.
+    Cada petición consume el costo de su ruta de todos sus buckets en una sola
+    llamada a un script Lua, de modo que el límite es el mismo con uno o varios
+    workers. Si Redis no responde, la petición se permite.
+    """
+
+    KEY_PREFIX = "ratelimit"
+
+    def __init__(self, client=redis_client):
+        self.client = client
+        self._consume = client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    def hit(self, scope: str, identities: List[Tuple[str, str, int]], cost: int = 1) -> Dict[str, Any]:
+        """
+        Consume `cost` de los buckets de las identidades indicadas.
+
+        Args:
+            scope: Ámbito del presupuesto ("api" o "login")
+            identities: Tuplas (tipo, identificador, presupuesto por minuto)
+            cost: Unidades que consume la petición
+
+        Returns:
+            Dict con `allowed`, `remaining` (-1 si Redis no respondió) y, si se
+            rechaza, `retry_after_seconds` y `blocked_by` (tipo de identidad agotada)
+        """
+        keys, args = [], [int(time.time() * 1000), cost]
+        for kind, identifier, per_minute in identities:
+            keys.append(f"{self.KEY_PREFIX}:{scope}:{kind}:{identifier}")
+            # La capacidad nunca es menor al costo: una petición cara no queda bloqueada siempre
+            capacity = max(per_minute, cost)
+            args.extend([capacity, capacity / 60000])
+        try:
+            allowed, blocked, retry_after_ms, remaining = self._consume(keys=keys, args=args)
+        except Exception as e:
+            logger.warning(f"Rate limiter no disponible, se permite la petición: {e}")
+            return {"allowed": True, "remaining": -1}
+        if allowed:
+            return {"allowed": True, "remaining": int(remaining)}
+        return {
+            "allowed": False,
+            "remaining": 0,
+            "retry_after_seconds": max(1, math.ceil(int(retry_after_ms) / 1000)),
+            "blocked_by": identities[int(blocked) - 1][0],
+        }
+
+
+# Instancia global del rate limiter
+rate_limiter = RateLimiter()
+
+
+def _authenticated_username(request: Request) -> Optional[str]:
+    """Usuario del token Bearer, si es válido (el decode queda cacheado para la ruta)"""
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    payload = verify_token(token)
+    return payload.get("sub") if payload else None
+
+
+def enforce_rate_limit(request: Request, response: Response) -> None:
+    """
+    Dependencia de las rutas de la API: aplica el presupuesto por IP y por usuario.
+
+    Responde 429 con `Retry-After` al agotarse y registra la IP o el usuario en
+    los contadores de seguridad del monitoreo.
+    """
+    if request.method == "OPTIONS":
+        return
+    route_name = getattr(request.scope.get("route"), "name", "")
+    client_ip = request.client.host if request.client else "unknown"
+
+    if route_name in LOGIN_ROUTES:
+        result = rate_limiter.hit("login", [("ip", client_ip, settings.RATE_LIMIT_PER_MINUTE)])
+        identity = client_ip
+    else:
+        identities = [("ip", client_ip, settings.RATE_LIMIT_IP_PER_MINUTE)]
+        username = _authenticated_username(request)
+        if username:
+            identities.append(("user", username.lower(), settings.RATE_LIMIT_USER_PER_MINUTE))
+        result = rate_limiter.hit("api", identities, ROUTE_COSTS.get(route_name, 1))
+        identity = username.lower() if result.get("blocked_by") == "user" else client_ip
+
+    if result["allowed"]:
+        if result["remaining"] >= 0:
+            response.headers["X-RateLimit-Remaining"] = str(result["remaining"])
+        return
+
+    blocked_by, retry_after = result["blocked_by"], result["retry_after_seconds"]
+    security_counters.mark(f"rate_limited:{blocked_by}", identity, time.time() + retry_after)
+    logger.warning(f"Rate limit excedido por {blocked_by} {identity} en {request.method} {request.url.path}")
+    raise HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Demasiadas solicitudes, intente nuevamente más tarde",
+        headers={"Retry-After": str(retry_after)},
+    )
@@ -0,0 +1,139 @@
+"""
+Clientes Redis compartidos para OneSite
+
+Los clientes síncrono y asíncrono comparten un circuit breaker: tras
+`REDIS_CIRCUIT_FAILURE_THRESHOLD` fallas de conexión seguidas los comandos fallan
+de inmediato con `RedisCircuitOpenError` (una `redis.ConnectionError`), de modo que
+cada llamador pasa a su respaldo local sin esperar el timeout del socket.
+"""
+
+import time
+from typing import Optional, Tuple
+
+import redis
+import redis.asyncio
+from redis.client import Pipeline
+
+from app.core.circuit_breaker import CircuitBreaker
+from app.core.config import settings
+from app.core.telemetry import REDIS_COMMAND_DURATION, REDIS_COMMAND_ERRORS, REDIS_SHORT_CIRCUITED
+
+# Circuit breaker compartido por todas las conexiones a Redis del proceso
+redis_circuit_breaker = CircuitBreaker(
+    "redis",
+    failure_threshold=settings.REDIS_CIRCUIT_FAILURE_THRESHOLD,
+    reset_seconds=settings.REDIS_CIRCUIT_RESET_SECONDS,
+)
+
+
+class RedisCircuitOpenError(redis.ConnectionError):
+    """El circuito de Redis está abierto: el comando no se envió"""
+
+
+def _command_name(args) -> str:
+    return str(args[0]).upper() if args else "UNKNOWN"
+
+
+def _before_command(command: str) -> Tuple[int, float]:
+    """Rechaza el comando si el circuito está abierto; retorna la generación del circuito y el instante de inicio"""
+    generation = redis_circuit_breaker.allow()
+    if generation is None:
+        REDIS_SHORT_CIRCUITED.labels(command).inc()
+        raise RedisCircuitOpenError(f"Circuito de Redis abierto, {command} omitido")
+    return generation, time.perf_counter()
+
+
+def _after_command(command: str, call: Tuple[int, float], error: Optional[Exception] = None) -> None:
+    """Registra la latencia y el resultado; solo las fallas de conexión abren el circuito"""
+    generation, started = call
+    elapsed = time.perf_counter() - started
+    redis_circuit_breaker.record(generation, elapsed * 1000, isinstance(error, (redis.ConnectionError, redis.TimeoutError, OSError)))
+    REDIS_COMMAND_DURATION.labels(command).observe(elapsed)
+    if error is not None:
+        REDIS_COMMAND_ERRORS.labels(command).inc()
+
+
+class InstrumentedPipeline(Pipeline):
+    """Pipeline que mide su ejecución completa como un solo comando `PIPELINE`"""
+
+    def execute(self, raise_on_error: bool = True):
+        call = _before_command("PIPELINE")
+        try:
+            result = super().execute(raise_on_error)
+        except Exception as e:
+            _after_command("PIPELINE", call, e)
+            raise
+        _after_command("PIPELINE", call)
+        return result
+
+
+class InstrumentedRedis(redis.Redis):
+    """Cliente Redis que exporta la duración y los errores de cada comando por nombre"""
+
+    def execute_command(self, *args, **options):
+        command = _command_name(args)
+        call = _before_command(command)
+        try:
+            result = super().execute_command(*args, **options)
+        except Exception as e:
+            _after_command(command, call, e)
+            raise
+        _after_command(command, call)
+        return result
+
+    def pipeline(self, transaction=True, shard_hint=None) -> InstrumentedPipeline:
+        return InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+class AsyncInstrumentedPipeline(redis.asyncio.client.Pipeline):
+    """Versión asíncrona de `InstrumentedPipeline`"""
+
+    async def execute(self, raise_on_error: bool = True):
+        call = _before_command("PIPELINE")
+        try:
+            result = await super().execute(raise_on_error)
+        except Exception as e:
+            _after_command("PIPELINE", call, e)
+            raise
+        _after_command("PIPELINE", call)
+        return result
+
+
+class AsyncInstrumentedRedis(redis.asyncio.Redis):
+    """Versión asíncrona de `InstrumentedRedis`, para usar desde el event loop"""
+
+    async def execute_command(self, *args, **options):
+        command = _command_name(args)
+        call = _before_command(command)
+        try:
+            result = await super().execute_command(*args, **options)
+        except Exception as e:
+            _after_command(command, call, e)
+            raise
+        _after_command(command, call)
+        return result
+
+    def pipeline(self, transaction=True, shard_hint=None) -> AsyncInstrumentedPipeline:
+        return AsyncInstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+_connection_options = dict(
+    host=settings.REDIS_HOST,
+    port=settings.REDIS_PORT,
+    db=settings.REDIS_DB,
+    password=settings.REDIS_PASSWORD or None,
+    decode_responses=True,
+    socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+    socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+    max_connections=settings.REDIS_MAX_CONNECTIONS
+)
+
+# Pool de conexiones único para todo el proceso
+redis_pool = redis.ConnectionPool(**_connection_options)
+
+# Cliente síncrono compartido (blacklist, bloqueos, caché); para hilos y threadpool
+redis_client = InstrumentedRedis(connection_pool=redis_pool)
+
+# Pool y cliente asíncronos compartidos para los handlers `async def`
+async_redis_pool = redis.asyncio.ConnectionPool(**_connection_options)
+async_redis_client = AsyncInstrumentedRedis(connection_pool=async_redis_pool)
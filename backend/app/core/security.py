@@ -1,5 +1,7 @@
 from datetime import datetime, timedelta
-from typing import Any, Union, Optional, Dict
+from functools import lru_cache, partial
+from typing import Any, FrozenSet, Union, Optional, Dict, Tuple
+from anyio import CapacityLimiter, to_thread
 from jose import jwt, JWTError
 from passlib.context import CryptContext
 from app.core.config import settings
@@ -7,30 +9,25 @@ from ldap3 import Server, Connection, ALL, SIMPLE, SUBTREE
 import logging
 import ssl
 from ldap3 import Tls
-import redis
+from app.core.redis_client import async_redis_client, redis_client
+from app.core.ldap_pool import LDAPConnectionPool, LDAPPoolBindError, LDAPPoolTimeoutError
+from app.core.telemetry import LDAP_BIND_DURATION, LDAP_BIND_FAILURES, record_cache
+from app.core.token_blacklist import token_blacklist
+from app.services.ad_profile_cache import ad_profile_cache
+from app.services.security_counters import security_counters
+from app.services.audit_writer import audit_writer
+import hashlib
 import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
 
-# Configurar logging seguro
-logging.basicConfig(
-    level=getattr(logging, settings.LOG_LEVEL),
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(settings.LOG_FILE),
-        logging.StreamHandler()
-    ]
-)
+# El logging del proceso se configura en app.core.logging_config (desde main.py)
 logger = logging.getLogger(__name__)
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-# Configurar Redis para rate limiting y blacklist
-redis_client = redis.Redis(
-    host=settings.REDIS_HOST,
-    port=settings.REDIS_PORT,
-    db=settings.REDIS_DB,
-    decode_responses=True
-)
-
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
@@ -46,36 +43,94 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    # jti: identificador único del token, usado por la blacklist
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
+class TokenDecodeCache:
+    """
+    Payloads de tokens ya verificados, por token, durante unos segundos.
+
+    Un cliente reutiliza el mismo token en todas sus peticiones; así la firma se
+    verifica una vez por ventana y no en cada petición. Una entrada nunca sobrevive
+    a la expiración del token, y la blacklist se sigue consultando en cada acceso.
+    """
+
+    def __init__(self, ttl_seconds: int, max_size: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is not None and entry[1] <= time.time():
+                del self._entries[token]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(token)
+        record_cache("token_decode", entry is not None)
+        return entry[0] if entry is not None else None
+
+    def set(self, token: str, payload: Dict[str, Any]):
+        if self.ttl_seconds <= 0:
+            return
+        valid_until = time.time() + self.ttl_seconds
+        if "exp" in payload:
+            valid_until = min(valid_until, float(payload["exp"]))
+        with self._lock:
+            self._entries[token] = (payload, valid_until)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, token: str):
+        with self._lock:
+            self._entries.pop(token, None)
+
+token_decode_cache = TokenDecodeCache(settings.TOKEN_DECODE_CACHE_SECONDS, settings.TOKEN_DECODE_CACHE_SIZE)
+
 def verify_token(token: str) -> Optional[Dict[str, Any]]:
     """
     Verifica y decodifica un token JWT
     """
-    try:
-        # Verificar si el token está en la blacklist
-        if is_token_blacklisted(token):
+    payload = token_decode_cache.get(token)
+    if payload is None:
+        try:
+            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        except JWTError:
             return None
-            
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        return payload
-    except JWTError:
-        return None
+        token_decode_cache.set(token, payload)
+    
+    # Verificar si el token está en la blacklist
+    jti = payload.get("jti")
+    if jti:
+        revoked = token_blacklist.is_revoked(jti)
+    else:
+        # Tokens emitidos antes de incluir jti
+        revoked = is_token_blacklisted(token)
+    return None if revoked else dict(payload)
 
 def is_token_blacklisted(token: str) -> bool:
-    """Verifica si un token está en la blacklist"""
+    """Verifica si un token sin jti está en la blacklist"""
     try:
         return redis_client.exists(f"blacklist:{token}")
     except Exception as e:
         logger.error(f"Error verificando blacklist: {e}")
         return False
 
-def add_token_to_blacklist(token: str, expires_at: datetime):
-    """Agrega un token a la blacklist"""
+def add_token_to_blacklist(token: str, payload: Dict[str, Any]):
+    """Agrega un token a la blacklist hasta su expiración"""
+    token_decode_cache.discard(token)
+    expires_at = float(payload.get("exp") or time.time() + settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+    security_counters.mark("blacklisted_tokens", payload.get("jti") or hashlib.sha256(token.encode()).hexdigest(), expires_at)
+    if payload.get("jti"):
+        token_blacklist.revoke(payload["jti"], expires_at)
+        return
     try:
-        ttl = int((expires_at - datetime.utcnow()).total_seconds())
+        ttl = int(expires_at - time.time())
         if ttl > 0:
             redis_client.setex(f"blacklist:{token}", ttl, "blacklisted")
     except Exception as e:
@@ -87,10 +142,12 @@ class SecureLogger:
     def __init__(self):
         self.logger = logging.getLogger(__name__)
     
-    def log_login_attempt(self, username: str, success: bool, ip_address: str, user_agent: str = None):
+    def log_login_attempt(self, username: str, success: bool, ip_address: str, user_agent: str = None, failure_reason: str = None):
         """Registra intentos de login sin exponer contraseñas"""
         status = "SUCCESS" if success else "FAILED"
         log_message = f"Login attempt - User: {username}, Status: {status}, IP: {ip_address}"
+        if failure_reason:
+            log_message += f", Reason: {failure_reason}"
         if user_agent:
             log_message += f", User-Agent: {user_agent[:100]}"
         
@@ -98,17 +155,65 @@ class SecureLogger:
             self.logger.info(log_message)
         else:
             self.logger.warning(log_message)
+        
+        # Auditoría en base de datos: se encola y se escribe por lotes fuera del login
+        audit_writer.record_login_attempt(username, success, ip_address, user_agent, failure_reason)
     
     def log_security_event(self, event_type: str, details: str, severity: str = "INFO"):
         """Registra eventos de seguridad"""
         self.logger.warning(f"Security Event - Type: {event_type}, Details: {details}, Severity: {severity}")
 
+# Resultados de los scripts de bloqueo
+LOCKOUT_COUNTED = 0         # Intento registrado, la cuenta sigue habilitada
+LOCKOUT_LOCKED_NOW = 1      # Este intento alcanzó el máximo y bloqueó la cuenta
+LOCKOUT_ALREADY_LOCKED = 2  # La cuenta ya estaba bloqueada; no se registra nada
+
+# Verifica el bloqueo y registra un intento fallido; al llegar al máximo bloquea la
+# cuenta y la suma al contador de cuentas bloqueadas, todo en una sola operación atómica
+RECORD_FAILED_ATTEMPT_SCRIPT = """
+if redis.call('exists', KEYS[2]) == 1 then
+    return {0, 2}
+end
+local attempts = redis.call('incr', KEYS[1])
+if attempts == 1 then
+    redis.call('expire', KEYS[1], ARGV[2])
+end
+if attempts >= tonumber(ARGV[1]) then
+    redis.call('set', KEYS[2], 'locked', 'EX', ARGV[3])
+    redis.call('del', KEYS[1])
+    redis.call('zremrangebyscore', KEYS[3], '-inf', ARGV[4])
+    redis.call('zadd', KEYS[3], tonumber(ARGV[4]) + tonumber(ARGV[3]), ARGV[5])
+    return {attempts, 1}
+end
+return {attempts, 0}
+"""
+
+# Verifica el bloqueo y, si la cuenta no está bloqueada, resetea sus intentos fallidos
+RESET_FAILED_ATTEMPTS_SCRIPT = """
+if redis.call('exists', KEYS[2]) == 1 then
+    return 2
+end
+redis.call('del', KEYS[1])
+return 0
+"""
+
 class AccountLockout:
-    """Gestión de bloqueo de cuentas por intentos fallidos"""
+    """
+    Gestión de bloqueo de cuentas por intentos fallidos
+    
+    La verificación del bloqueo junto con el registro (o el reseteo) de los intentos
+    se resuelve en Redis con un script Lua, de modo que cada login es un solo
+    round-trip y atómico entre workers.
+    """
+    
+    # TTL del contador de intentos fallidos (1 hora)
+    ATTEMPTS_TTL_SECONDS = 3600
     
     def __init__(self):
         self.max_attempts = settings.MAX_LOGIN_ATTEMPTS
         self.lockout_duration = settings.ACCOUNT_LOCKOUT_MINUTES * 60  # Convertir a segundos
+        self._record_failed_attempt = redis_client.register_script(RECORD_FAILED_ATTEMPT_SCRIPT)
+        self._reset_failed_attempts = redis_client.register_script(RESET_FAILED_ATTEMPTS_SCRIPT)
     
     def is_account_locked(self, username: str) -> bool:
         """Verifica si una cuenta está bloqueada"""
@@ -119,65 +224,112 @@ class AccountLockout:
             logger.error(f"Error verificando bloqueo de cuenta: {e}")
             return False
     
+    @staticmethod
+    def _queue_lockout_reads(pipe, username: str):
+        """Encola en el pipeline las lecturas del estado de bloqueo"""
+        lock_key = f"lockout:{username}"
+        attempt_key = f"attempts:{username}"
+        pipe.exists(lock_key)
+        pipe.get(attempt_key)
+        pipe.ttl(lock_key)
+        pipe.ttl(attempt_key)
+        return pipe
+    
+    def _lockout_info(self, is_locked=0, attempts=None, lock_ttl=-1, attempt_ttl=-1) -> dict:
+        return {
+            "is_locked": bool(is_locked),
+            "failed_attempts": int(attempts) if attempts else 0,
+            "lock_remaining_seconds": lock_ttl if lock_ttl > 0 else 0,
+            "attempts_remaining_seconds": attempt_ttl if attempt_ttl > 0 else 0,
+            "max_attempts": self.max_attempts,
+            "lockout_duration_minutes": self.lockout_duration // 60
+        }
+    
     def get_account_lockout_info(self, username: str) -> dict:
-        """Obtiene información detallada sobre el estado de bloqueo de una cuenta"""
+        """Obtiene información detallada sobre el estado de bloqueo de una cuenta (un solo round-trip)"""
         try:
-            lock_key = f"lockout:{username}"
-            attempt_key = f"attempts:{username}"
-            
-            is_locked = redis_client.exists(lock_key)
-            attempts = redis_client.get(attempt_key)
-            lock_ttl = redis_client.ttl(lock_key) if is_locked else -1
-            attempt_ttl = redis_client.ttl(attempt_key) if attempts else -1
-            
-            return {
-                "is_locked": bool(is_locked),
-                "failed_attempts": int(attempts) if attempts else 0,
-                "lock_remaining_seconds": lock_ttl if lock_ttl > 0 else 0,
-                "attempts_remaining_seconds": attempt_ttl if attempt_ttl > 0 else 0,
-                "max_attempts": self.max_attempts,
-                "lockout_duration_minutes": self.lockout_duration // 60
-            }
+            # MULTI/EXEC: las cuatro lecturas ven el mismo estado
+            return self._lockout_info(*self._queue_lockout_reads(redis_client.pipeline(), username).execute())
         except Exception as e:
             logger.error(f"Error obteniendo información de bloqueo: {e}")
-            return {
-                "is_locked": False,
-                "failed_attempts": 0,
-                "lock_remaining_seconds": 0,
-                "attempts_remaining_seconds": 0,
-                "max_attempts": self.max_attempts,
-                "lockout_duration_minutes": self.lockout_duration // 60
-            }
+            return self._lockout_info()
     
-    def record_failed_attempt(self, username: str):
-        """Registra un intento fallido"""
+    async def get_account_lockout_info_async(self, username: str) -> dict:
+        """Igual que `get_account_lockout_info`, con el cliente asíncrono (sin bloquear el event loop)"""
         try:
-            attempt_key = f"attempts:{username}"
-            attempts = redis_client.incr(attempt_key)
-            
-            # Establecer TTL para el contador de intentos (1 hora)
-            if attempts == 1:
-                redis_client.expire(attempt_key, 3600)
-            
-            if attempts >= self.max_attempts:
-                lock_key = f"lockout:{username}"
-                redis_client.setex(lock_key, self.lockout_duration, "locked")
-                redis_client.delete(attempt_key)
-                logger.warning(f"Cuenta bloqueada: {username} por {self.max_attempts} intentos fallidos")
+            pipe = self._queue_lockout_reads(async_redis_client.pipeline(), username)
+            return self._lockout_info(*(await pipe.execute()))
+        except Exception as e:
+            logger.error(f"Error obteniendo información de bloqueo: {e}")
+            return self._lockout_info()
+    
+    def record_failed_attempt(self, username: str) -> bool:
+        """
+        Registra un intento fallido, salvo que la cuenta ya esté bloqueada
+
+        Returns:
+            True si la cuenta ya estaba bloqueada antes de este intento
+        """
+        try:
+            attempts, status = self._record_failed_attempt(
+                keys=[f"attempts:{username}", f"lockout:{username}", security_counters.key("lockouts")],
+                args=[self.max_attempts, self.ATTEMPTS_TTL_SECONDS, self.lockout_duration, time.time(), username]
+            )
+            if int(status) == LOCKOUT_LOCKED_NOW:
+                logger.warning(f"Cuenta bloqueada: {username} por {attempts} intentos fallidos")
+            return int(status) == LOCKOUT_ALREADY_LOCKED
         except Exception as e:
             logger.error(f"Error registrando intento fallido: {e}")
+            return False
     
-    def reset_failed_attempts(self, username: str):
-        """Resetea los intentos fallidos después de un login exitoso"""
+    def reset_failed_attempts(self, username: str) -> bool:
+        """
+        Resetea los intentos fallidos después de un bind exitoso, salvo que la cuenta esté bloqueada
+
+        Returns:
+            True si la cuenta está bloqueada (el login debe rechazarse)
+        """
         try:
-            attempt_key = f"attempts:{username}"
-            redis_client.delete(attempt_key)
+            status = self._reset_failed_attempts(keys=[f"attempts:{username}", f"lockout:{username}"])
+            return int(status) == LOCKOUT_ALREADY_LOCKED
         except Exception as e:
             logger.error(f"Error reseteando intentos fallidos: {e}")
+            return False
 
 # Cache global para la configuración SSL optimizada
 _ssl_config_cache = {}
 
+# Mapeo de grupos de AD a roles de OneSite
+AD_GROUP_ROLES: Dict[str, str] = {
+    "Operadores": "operadores",
+    "Supervisores": "supervisores",
+    "Administradores": "administradores",
+    "Gerentes": "gerentes",
+    "Auditores": "auditores",
+    "IT_Support": "soporte_tecnico"
+}
+
+# Permisos por rol, precalculados como conjuntos inmutables
+ROLE_PERMISSIONS: Dict[str, FrozenSet[str]] = {
+    "operadores": frozenset({"trucks:read", "trucks:create"}),
+    "supervisores": frozenset({"trucks:read", "trucks:write", "trucks:delete", "reports:read"}),
+    "administradores": frozenset({"*"}),  # Todos los permisos
+    "gerentes": frozenset({"trucks:read", "trucks:write", "reports:read", "reports:write"}),
+    "auditores": frozenset({"trucks:read", "audit:read", "reports:read"}),
+    "soporte_tecnico": frozenset({"trucks:read", "system:read"})
+}
+
+@lru_cache(maxsize=256)
+def permissions_for_roles(roles: Tuple[str, ...]) -> Tuple[str, ...]:
+    """Une los permisos de una combinación de roles (memoizado por combinación)"""
+    permissions = set()
+    for role in roles:
+        role_permissions = ROLE_PERMISSIONS.get(role, frozenset())
+        if "*" in role_permissions:
+            return ("*",)  # Administrador tiene todos los permisos
+        permissions |= role_permissions
+    return tuple(sorted(permissions))
+
 class LDAPAuth:
     def __init__(self):
         # Usar configuración SSL cacheada para evitar múltiples intentos
@@ -185,6 +337,30 @@ class LDAPAuth:
         self.search_base = settings.AD_BASE_DN
         self.secure_logger = SecureLogger()
         self.account_lockout = AccountLockout()
+        # Conexiones de la cuenta de servicio, solo para búsquedas en el directorio
+        self.connection_pool = LDAPConnectionPool(
+            self.server,
+            bind_user=settings.AD_SERVICE_USER,
+            bind_password=settings.AD_SERVICE_PASSWORD,
+            size=settings.LDAP_POOL_SIZE,
+            max_idle_seconds=settings.LDAP_POOL_MAX_IDLE_SECONDS,
+            acquire_timeout=settings.LDAP_POOL_TIMEOUT
+        )
+        # Se crea en el event loop en el primer login
+        self._bind_limiter: Optional[CapacityLimiter] = None
+    
+    async def authenticate_async(self, username: str, password: str, ip_address: str = "unknown", user_agent: str = None) -> Optional[Dict[str, Any]]:
+        """
+        Ejecuta `authenticate` en un hilo para no bloquear el event loop durante el
+        round-trip con AD. Los logins simultáneos se acotan al tamaño del pool LDAP;
+        el resto espera suspendido en el event loop sin ocupar hilos.
+        """
+        if self._bind_limiter is None:
+            self._bind_limiter = CapacityLimiter(settings.LDAP_POOL_SIZE)
+        return await to_thread.run_sync(
+            partial(self.authenticate, username, password, ip_address, user_agent),
+            limiter=self._bind_limiter
+        )
     
     def _get_cached_server(self):
         """Obtiene un servidor LDAP con configuración SSL cacheada"""
@@ -302,67 +478,67 @@ class LDAPAuth:
             Dict con error específico si la autenticación falla
         """
         try:
-            # Verificar si la cuenta está bloqueada
-            if self.account_lockout.is_account_locked(username):
-                self.secure_logger.log_login_attempt(username, False, ip_address, user_agent)
-                logger.warning(f"Intento de login en cuenta bloqueada: {username}")
-                return {
-                    "error": "account_locked",
-                    "message": "Cuenta bloqueada por múltiples intentos fallidos",
-                    "username": username
-                }
-            
             # Formatear el nombre de usuario para LDAP
             user_dn = f"{username}@{settings.AD_DOMAIN}"
             logger.info(f"Intentando autenticar usuario: {username} desde IP: {ip_address}")
             
-            # Crear conexión LDAP con timeouts optimizados
-            conn = Connection(
-                self.server,
-                user=user_dn,
-                password=password,
-                authentication=SIMPLE,
-                auto_bind=False,
-                receive_timeout=5,  # Reducido de 10 a 5 segundos
-                read_only=True,
-                lazy=False,  # Conexión inmediata
-                check_names=True,
-                raise_exceptions=False  # Manejar errores manualmente
-            )
-            
             # Intentar hacer bind manualmente para capturar errores específicos
             try:
-                if conn.bind():
+                user_conn = self._bind_user(user_dn, password)
+                if user_conn is not None:
+                    # El bloqueo se verifica en el mismo round-trip que resetea los intentos
+                    if self.account_lockout.reset_failed_attempts(username):
+                        self._close_connection(user_conn)
+                        return self._account_locked(username, ip_address, user_agent)
                     self.secure_logger.log_login_attempt(username, True, ip_address, user_agent)
-                    self.account_lockout.reset_failed_attempts(username)
                     logger.info("Autenticacion LDAP exitosa")
                     
+                    # Perfil cacheado: evita la búsqueda en el directorio tras el bind
+                    cached_profile = ad_profile_cache.get(username)
+                    if cached_profile:
+                        self._close_connection(user_conn)
+                        return {**cached_profile, "username": username}
+                    
                     # Buscar información del usuario
-                    user_info = self._get_user_info(conn, username)
+                    try:
+                        user_info = self._search_user(username, user_conn)
+                    except (LDAPPoolTimeoutError, LDAPPoolBindError) as pool_error:
+                        LDAP_BIND_FAILURES.labels("pool_timeout" if isinstance(pool_error, LDAPPoolTimeoutError) else "service_bind").inc()
+                        logger.warning(f"Pool LDAP no disponible buscando a {username}: {pool_error}")
+                        return {
+                            "error": "ldap_error",
+                            "message": f"Directorio Activo ocupado, intente nuevamente: {str(pool_error)[:100]}",
+                            "username": username
+                        }
                     
                     if user_info:
+                        ad_profile_cache.set(username, user_info)
                         return user_info
                     else:
                         logger.warning("Usuario no encontrado en el Directorio Activo")
-                        self.secure_logger.log_login_attempt(username, False, ip_address, user_agent)
+                        self.secure_logger.log_login_attempt(username, False, ip_address, user_agent, "user_not_found")
                         return {
                             "error": "user_not_found",
                             "message": "Usuario no encontrado en el Directorio Activo",
                             "username": username
                         }
                 else:
+                    LDAP_BIND_FAILURES.labels("invalid_credentials").inc()
+                    if self.account_lockout.record_failed_attempt(username):
+                        return self._account_locked(username, ip_address, user_agent)
                     logger.error("La autenticacion LDAP fallo")
-                    self.secure_logger.log_login_attempt(username, False, ip_address, user_agent)
-                    self.account_lockout.record_failed_attempt(username)
+                    self.secure_logger.log_login_attempt(username, False, ip_address, user_agent, "invalid_credentials")
                     return {
                         "error": "invalid_credentials",
                         "message": "Credenciales incorrectas",
                         "username": username
                     }
             except Exception as bind_error:
+                LDAP_BIND_FAILURES.labels("bind_error").inc()
                 logger.error(f"Error durante el bind LDAP: {str(bind_error)}")
-                self.secure_logger.log_login_attempt(username, False, ip_address, user_agent)
-                self.account_lockout.record_failed_attempt(username)
+                if self.account_lockout.record_failed_attempt(username):
+                    return self._account_locked(username, ip_address, user_agent)
+                self.secure_logger.log_login_attempt(username, False, ip_address, user_agent, "bind_error")
                 
                 # Analizar el tipo de error
                 error_message = str(bind_error).lower()
@@ -387,8 +563,9 @@ class LDAPAuth:
                 
         except Exception as e:
             logger.error(f"Error en la autenticacion LDAP: {str(e)}")
-            self.secure_logger.log_login_attempt(username, False, ip_address, user_agent)
-            self.account_lockout.record_failed_attempt(username)
+            if self.account_lockout.record_failed_attempt(username):
+                return self._account_locked(username, ip_address, user_agent)
+            self.secure_logger.log_login_attempt(username, False, ip_address, user_agent, "ldap_error")
             
             # Para errores de conexión más específicos
             return {
@@ -396,9 +573,78 @@ class LDAPAuth:
                 "message": f"Error de conexión LDAP: {str(e)[:100]}",
                 "username": username
             }
+
+    def _account_locked(self, username: str, ip_address: str, user_agent: str) -> Dict[str, Any]:
+        self.secure_logger.log_login_attempt(username, False, ip_address, user_agent, "account_locked")
+        logger.warning(f"Intento de login en cuenta bloqueada: {username}")
+        return {
+            "error": "account_locked",
+            "message": "Cuenta bloqueada por múltiples intentos fallidos",
+            "username": username
+        }
+
+    def _bind_user(self, user_dn: str, password: str) -> Optional[Connection]:
+        """
+        Verifica las credenciales del usuario en una conexión propia, fuera del pool.
+
+        Returns:
+            La conexión autenticada si el bind fue exitoso (el llamador debe cerrarla
+            con `_close_connection`) o None si las credenciales son incorrectas
+        """
+        conn = Connection(
+            self.server,
+            user=user_dn,
+            password=password,
+            authentication=SIMPLE,
+            auto_bind=False,
+            receive_timeout=5,
+            read_only=True,
+            raise_exceptions=False  # Manejar errores manualmente
+        )
+        bind_started = time.perf_counter()
+        try:
+            conn.open()
+            bound = conn.bind()
+        except Exception:
+            self._close_connection(conn)
+            raise
         finally:
-            if 'conn' in locals():
-                conn.unbind()
+            LDAP_BIND_DURATION.observe(time.perf_counter() - bind_started)
+        if not bound:
+            self._close_connection(conn)
+            return None
+        return conn
+
+    @staticmethod
+    def _close_connection(conn: Connection):
+        try:
+            conn.unbind()
+        except Exception as e:
+            logger.debug(f"Error cerrando conexión LDAP: {e}")
+
+    def _search_user(self, username: str, user_conn: Connection) -> Optional[Dict[str, Any]]:
+        """
+        Busca el perfil del usuario y cierra su conexión.
+
+        Con cuenta de servicio la búsqueda usa una conexión del pool; sin ella se
+        hace sobre la conexión recién autenticada del propio usuario.
+        """
+        if not self.connection_pool.enabled:
+            try:
+                return self._get_user_info(user_conn, username)
+            finally:
+                self._close_connection(user_conn)
+        
+        self._close_connection(user_conn)
+        conn = self.connection_pool.acquire()
+        reusable = False
+        try:
+            user_info = self._get_user_info(conn, username)
+            # Una búsqueda que falló a nivel de protocolo descarta la conexión
+            reusable = user_info is not None or (conn.result or {}).get("result") == 0
+            return user_info
+        finally:
+            self.connection_pool.release(conn, reusable=reusable)
 
     def _get_user_info(self, conn: Connection, username: str) -> Optional[Dict[str, Any]]:
         """Obtiene información detallada del usuario desde AD"""
@@ -458,41 +704,11 @@ class LDAPAuth:
 
     def _map_ad_groups_to_roles(self, ad_groups: list) -> list:
         """Mapea grupos de AD a roles de OneSite"""
-        role_mapping = {
-            "Operadores": "operadores",
-            "Supervisores": "supervisores", 
-            "Administradores": "administradores",
-            "Gerentes": "gerentes",
-            "Auditores": "auditores",
-            "IT_Support": "soporte_tecnico"
-        }
-        
-        roles = []
-        for group in ad_groups:
-            if group in role_mapping:
-                roles.append(role_mapping[group])
-        
-        return roles
+        return [AD_GROUP_ROLES[group] for group in ad_groups if group in AD_GROUP_ROLES]
 
     def _get_permissions_from_roles(self, roles: list) -> list:
         """Obtiene permisos basados en roles"""
-        permissions = {
-            "operadores": ["trucks:read", "trucks:create"],
-            "supervisores": ["trucks:read", "trucks:write", "trucks:delete", "reports:read"],
-            "administradores": ["*"],  # Todos los permisos
-            "gerentes": ["trucks:read", "trucks:write", "reports:read", "reports:write"],
-            "auditores": ["trucks:read", "audit:read", "reports:read"],
-            "soporte_tecnico": ["trucks:read", "system:read"]
-        }
-        
-        user_permissions = []
-        for role in roles:
-            if role in permissions:
-                if permissions[role] == ["*"]:
-                    return ["*"]  # Administrador tiene todos los permisos
-                user_permissions.extend(permissions[role])
-        
-        return list(set(user_permissions))  # Eliminar duplicados
+        return list(permissions_for_roles(tuple(roles)))
 
 # Instancia global del servicio de autenticación LDAP
 ldap_auth = LDAPAuth() 
\ No newline at end of file
@@ -0,0 +1,110 @@
+"""
+Métricas Prometheus/OpenMetrics del proceso de la API de OneSite
+
+Con varios workers de uvicorn, definir `PROMETHEUS_MULTIPROC_DIR` (un directorio
+vacío al arrancar) antes de iniciar los procesos: cada worker escribe sus valores
+en archivos de ese directorio y `/metrics` los agrega, sin importar qué worker
+atienda la petición.
+"""
+
+import os
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    REGISTRY,
+    generate_latest,
+    multiprocess,
+)
+
+# Mismos límites que los histogramas de /monitoring/latency, en segundos
+LATENCY_BUCKETS_SECONDS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FAST_BUCKETS_SECONDS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+HTTP_REQUESTS = Counter(
+    "onesite_http_requests_total",
+    "Peticiones HTTP atendidas",
+    ["method", "route", "status"],
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "onesite_http_request_duration_seconds",
+    "Duración de las peticiones HTTP",
+    ["method", "route"],
+    buckets=LATENCY_BUCKETS_SECONDS,
+)
+
+DB_POOL_CHECKED_OUT = Gauge(
+    "onesite_db_pool_checked_out",
+    "Conexiones del pool en uso",
+    ["database"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_EVENTS = Counter(
+    "onesite_db_pool_events_total",
+    "Eventos del pool de conexiones (connect, checkout, invalidate, timeout)",
+    ["database", "event"],
+)
+DB_POOL_WAIT = Histogram(
+    "onesite_db_pool_wait_seconds",
+    "Espera por una conexión del pool",
+    ["database"],
+    buckets=FAST_BUCKETS_SECONDS,
+)
+
+REDIS_COMMAND_DURATION = Histogram(
+    "onesite_redis_command_duration_seconds",
+    "Duración de los comandos Redis (los pipelines cuentan como un comando)",
+    ["command"],
+    buckets=FAST_BUCKETS_SECONDS,
+)
+REDIS_COMMAND_ERRORS = Counter(
+    "onesite_redis_command_errors_total",
+    "Comandos Redis con error",
+    ["command"],
+)
+REDIS_SHORT_CIRCUITED = Counter(
+    "onesite_redis_short_circuited_total",
+    "Comandos Redis omitidos por el circuit breaker abierto",
+    ["command"],
+)
+
+LDAP_BIND_DURATION = Histogram(
+    "onesite_ldap_bind_duration_seconds",
+    "Duración de los binds contra el Directorio Activo",
+    buckets=LATENCY_BUCKETS_SECONDS,
+)
+LDAP_BIND_FAILURES = Counter(
+    "onesite_ldap_bind_failures_total",
+    "Binds LDAP fallidos por motivo",
+    ["reason"],
+)
+
+CACHE_REQUESTS = Counter(
+    "onesite_cache_requests_total",
+    "Lecturas de caché por resultado (hit/miss)",
+    ["cache", "result"],
+)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    """Registra una lectura de caché"""
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def render_metrics() -> tuple:
+    """Retorna (contenido, content-type) de la exposición de métricas"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead() -> None:
+    """Descarta los gauges `live*` de este worker al apagarse (modo multiproceso)"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(os.getpid())
@@ -0,0 +1,140 @@
+"""
+Blacklist de tokens JWT por `jti` con copia local sincronizada vía Redis pub/sub
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+from app.core.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBlacklist:
+    """
+    Tokens revocados (logout) indexados por su `jti`.
+
+    Cada proceso mantiene en memoria los `jti` revocados con su expiración. Un hilo
+    suscrito al canal `blacklist:events` recibe las revocaciones de los demás workers
+    y, al (re)conectarse, recarga las claves `blacklist:jti:*` vigentes. Mientras la
+    suscripción está activa, verificar un token no requiere ir a Redis; si se pierde,
+    la verificación vuelve a consultar Redis hasta que se resincronice.
+    """
+
+    KEY_PREFIX = "blacklist:jti"
+    CHANNEL = "blacklist:events"
+    PRUNE_INTERVAL_SECONDS = 60
+
+    def __init__(self, client=redis_client):
+        self.client = client
+        self._revoked: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._synced = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _key(self, jti: str) -> str:
+        return f"{self.KEY_PREFIX}:{jti}"
+
+    def _remember(self, jti: str, expires_at: float):
+        with self._lock:
+            self._revoked[jti] = expires_at
+
+    def _prune(self):
+        now = time.time()
+        with self._lock:
+            self._revoked = {jti: exp for jti, exp in self._revoked.items() if exp > now}
+
+    def revoke(self, jti: str, expires_at: float):
+        """Revoca el token hasta su expiración (timestamp epoch) y lo notifica a los demás procesos"""
+        ttl = int(expires_at - time.time())
+        if ttl <= 0:
+            return
+        self._remember(jti, expires_at)
+        try:
+            pipe = self.client.pipeline()
+            pipe.setex(self._key(jti), ttl, int(expires_at))
+            pipe.publish(self.CHANNEL, f"{jti}:{int(expires_at)}")
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Error agregando token a blacklist: {e}")
+
+    def is_revoked(self, jti: str) -> bool:
+        """Indica si el `jti` fue revocado"""
+        self.start()
+        with self._lock:
+            expires_at = self._revoked.get(jti)
+        if expires_at is not None:
+            return expires_at > time.time()
+        if self._synced.is_set():
+            return False
+
+        # Sin suscripción activa la copia local puede estar incompleta
+        try:
+            return bool(self.client.exists(self._key(jti)))
+        except Exception as e:
+            logger.error(f"Error verificando blacklist: {e}")
+            return False
+
+    def start(self):
+        """Inicia el hilo de sincronización si no está corriendo"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._listen, name="token-blacklist-sync", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Detiene el hilo de sincronización (apagado de la aplicación)"""
+        self._stop.set()
+        self._synced.clear()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _load_snapshot(self):
+        """Carga los `jti` revocados vigentes desde Redis"""
+        keys = list(self.client.scan_iter(match=f"{self.KEY_PREFIX}:*", count=500))
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            for key, expires_at in zip(batch, self.client.mget(batch)):
+                if expires_at:
+                    self._remember(key[len(self.KEY_PREFIX) + 1:], float(expires_at))
+
+    def _listen(self):
+        backoff = 1
+        while not self._stop.is_set():
+            pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            try:
+                # Suscribirse antes de cargar el snapshot para no perder revocaciones
+                pubsub.subscribe(self.CHANNEL)
+                self._load_snapshot()
+                self._synced.set()
+                backoff = 1
+                last_prune = time.monotonic()
+                while not self._stop.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message.get("type") == "message":
+                        jti, _, expires_at = message["data"].rpartition(":")
+                        self._remember(jti, float(expires_at))
+                    if time.monotonic() - last_prune > self.PRUNE_INTERVAL_SECONDS:
+                        self._prune()
+                        last_prune = time.monotonic()
+            except Exception as e:
+                self._synced.clear()
+                logger.warning(f"Sincronización de blacklist no disponible, reintentando en {backoff}s: {e}")
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 30)
+            finally:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+
+
+# Instancia global de la blacklist de tokens
+token_blacklist = TokenBlacklist()
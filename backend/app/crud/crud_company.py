@@ -1,10 +1,68 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
-from typing import List, Optional
+from typing import Dict, List, Optional
+from app.core.config import settings
+from app.core.telemetry import record_cache
+from app.db.databases import AsyncDBSession
 from app.models.company import Company
 from app.schemas.company import CompanyCreate, CompanyUpdate
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class CompanyCatalogSnapshot:
+    """
+    Snapshot en memoria de las empresas activas de TheEliteGroup_Parameters.Companies.
+
+    El catálogo cambia muy poco, así que se carga completo una vez y se indexa por
+    `id_Company` e `id_Oracle`; las consultas frecuentes se resuelven con búsquedas
+    en diccionarios en lugar de ir a SATURNO13. Se recarga al vencer el TTL o al
+    invalidarlo desde las escrituras de `/companies`. Cada proceso mantiene su
+    propio snapshot, por lo que entre workers la desactualización máxima es el TTL.
+    """
+
+    def __init__(self, ttl_seconds: int = settings.COMPANIES_CACHE_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._loaded_at: Optional[float] = None
+        self.companies: List[Company] = []
+        self.by_id: Dict[int, Company] = {}
+        self.by_oracle: Dict[str, Company] = {}
+
+    def is_fresh(self) -> bool:
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl_seconds
+
+    def ensure_loaded(self, db: Session) -> "CompanyCatalogSnapshot":
+        """Recarga el snapshot si venció; solo un hilo consulta la base de datos"""
+        if self.is_fresh():
+            record_cache("company_catalog", True)
+            return self
+        record_cache("company_catalog", False)
+        with self._lock:
+            if self.is_fresh():
+                return self
+            companies = db.query(Company).filter(Company.Estado_Cargue == 1).order_by(Company.Company).all()
+            # Desvincular de la sesión para poder compartir los objetos entre peticiones
+            for obj in companies:
+                db.expunge(obj)
+            self.companies = companies
+            self.by_id = {obj.id_Company: obj for obj in companies}
+            self.by_oracle = {obj.id_Oracle: obj for obj in companies if obj.id_Oracle}
+            self._loaded_at = time.monotonic()
+            logger.info(f"Catálogo de empresas cargado: {len(companies)} empresas activas")
+        return self
+
+    def invalidate(self) -> None:
+        """Fuerza la recarga en la próxima consulta"""
+        self._loaded_at = None
+
 
 class CRUDCompany:
+    def __init__(self):
+        self.catalog = CompanyCatalogSnapshot()
+
     def get(self, db: Session, company_id: int) -> Optional[Company]:
         """Obtiene una empresa por su ID"""
         return db.query(Company).filter(Company.id_Company == company_id).first()
@@ -29,29 +87,27 @@ class CRUDCompany:
         active_only: bool = True
     ) -> List[Company]:
         """Obtiene múltiples empresas con paginación"""
-        query = db.query(Company)
-        
         if active_only:
-            query = query.filter(Company.Estado_Cargue == 1)
-        
-        query = query.order_by(Company.Company)
+            return self.catalog.ensure_loaded(db).companies[skip:skip + limit]
+
+        query = db.query(Company).order_by(Company.Company)
         return query.offset(skip).limit(limit).all()
     
     def create(self, db: Session, obj_in: CompanyCreate) -> Company:
         """Crea una nueva empresa"""
         from datetime import datetime
         
+        # `name`, `code`, `is_active` y las fechas son propiedades de solo lectura del
+        # modelo: se escriben las columnas reales de la tabla
         db_obj = Company(
-            name=obj_in.name,
-            code=obj_in.code,
-            description=obj_in.description,
-            is_active=obj_in.is_active,
-            created_at=datetime.now(),
-            updated_at=datetime.now()
+            **obj_in.dict(),
+            Estado_Cargue=1,
+            Fecha_crea=datetime.now()
         )
         db.add(db_obj)
         db.commit()
         db.refresh(db_obj)
+        self.catalog.invalidate()
         return db_obj
     
     def update(
@@ -61,50 +117,45 @@ class CRUDCompany:
         obj_in: CompanyUpdate
     ) -> Company:
         """Actualiza una empresa existente"""
-        from datetime import datetime
-        
         update_data = obj_in.dict(exclude_unset=True)
         
-        # Agregar timestamp de actualización
-        update_data['updated_at'] = datetime.now()
-        
         for field, value in update_data.items():
             setattr(db_obj, field, value)
         
         db.add(db_obj)
         db.commit()
         db.refresh(db_obj)
+        self.catalog.invalidate()
         return db_obj
     
     def delete(self, db: Session, company_id: int) -> Company:
         """Elimina una empresa (soft delete marcándola como inactiva)"""
         db_obj = db.query(Company).filter(Company.id_Company == company_id).first()
         if db_obj:
-            db_obj.is_active = False
+            db_obj.Estado_Cargue = 0
             db.add(db_obj)
             db.commit()
             db.refresh(db_obj)
+            self.catalog.invalidate()
         return db_obj
     
     def count(self, db: Session, active_only: bool = True) -> int:
         """Cuenta el total de empresas"""
-        query = db.query(Company)
-        
         if active_only:
-            query = query.filter(Company.Estado_Cargue == 1)
+            return len(self.catalog.ensure_loaded(db).companies)
         
-        return query.count()
+        return db.query(Company).count()
 
     def get_multi_by_ids(self, db: Session, ids: list, active_only: bool = True):
-        query = db.query(Company).filter(Company.id_Company.in_(ids))
         if active_only:
-            query = query.filter(Company.Estado_Cargue == 1)
-        query = query.order_by(Company.Company)
-        return query.all()
+            wanted = set(ids)
+            return [obj for obj in self.catalog.ensure_loaded(db).companies if obj.id_Company in wanted]
+        query = db.query(Company).filter(Company.id_Company.in_(ids))
+        return query.order_by(Company.Company).all()
     
     def get_active_companies(self, db: Session) -> List[Company]:
         """Obtiene todas las empresas activas"""
-        return db.query(Company).filter(Company.Estado_Cargue == 1).order_by(Company.Company).all()
+        return list(self.catalog.ensure_loaded(db).companies)
     
     def get_companies_for_user(self, db: Session, user_id: int) -> List[Company]:
         """Obtiene las empresas asignadas a un usuario específico"""
@@ -124,28 +175,75 @@ class CRUDCompany:
         if not company_codes:
             return []
         
-        # Separar códigos numéricos y alfanuméricos
-        numeric_codes = [int(code) for code in company_codes if code.isdigit()]
-        oracle_codes = [code for code in company_codes if not code.isdigit()]
-        
-        # Crear filtros
-        filters = []
-        if oracle_codes:
-            filters.append(Company.id_Oracle.in_(oracle_codes))
-        if numeric_codes:
-            filters.append(Company.id_Company.in_(numeric_codes))
+        return self._filter_by_codes(self.catalog.ensure_loaded(db), company_codes)
+    
+    @staticmethod
+    def _filter_by_codes(catalog: CompanyCatalogSnapshot, company_codes: List[str]) -> List[Company]:
+        """Resuelve los códigos contra el snapshot del catálogo"""
+        # Códigos numéricos se buscan por id_Company y alfanuméricos por id_Oracle
+        matched_ids = set()
+        for code in company_codes:
+            obj = catalog.by_id.get(int(code)) if code.isdigit() else catalog.by_oracle.get(code)
+            if obj is not None:
+                matched_ids.add(obj.id_Company)
         
-        if not filters:
+        # Conservar el orden por nombre del catálogo
+        return [obj for obj in catalog.companies if obj.id_Company in matched_ids]
+
+class AsyncCRUDCompany:
+    """
+    Variante asíncrona de CRUDCompany para endpoints `async def`.
+
+    Las lecturas servidas por el snapshot del catálogo se resuelven sin salir del
+    event loop; el resto se ejecuta con `AsyncDBSession.run_sync`.
+    """
+
+    def __init__(self, crud: CRUDCompany):
+        self.crud = crud
+
+    async def _catalog(self, db: AsyncDBSession) -> CompanyCatalogSnapshot:
+        catalog = self.crud.catalog
+        if not catalog.is_fresh():
+            await db.run_sync(catalog.ensure_loaded)
+        else:
+            record_cache("company_catalog", True)
+        return catalog
+
+    async def get(self, db: AsyncDBSession, company_id: int) -> Optional[Company]:
+        return await db.run_sync(self.crud.get, company_id)
+
+    async def get_by_code(self, db: AsyncDBSession, code: str) -> Optional[Company]:
+        return await db.run_sync(self.crud.get_by_code, code)
+
+    async def get_by_oracle_id(self, db: AsyncDBSession, oracle_id: str) -> Optional[Company]:
+        return await db.run_sync(self.crud.get_by_oracle_id, oracle_id)
+
+    async def get_multi(self, db: AsyncDBSession, skip: int = 0, limit: int = 100, active_only: bool = True) -> List[Company]:
+        if active_only:
+            return (await self._catalog(db)).companies[skip:skip + limit]
+        return await db.run_sync(self.crud.get_multi, skip, limit, active_only)
+
+    async def count(self, db: AsyncDBSession, active_only: bool = True) -> int:
+        if active_only:
+            return len((await self._catalog(db)).companies)
+        return await db.run_sync(self.crud.count, active_only)
+
+    async def get_active_companies(self, db: AsyncDBSession) -> List[Company]:
+        return list((await self._catalog(db)).companies)
+
+    async def get_companies_by_codes(self, db: AsyncDBSession, company_codes: List[str]) -> List[Company]:
+        if not company_codes:
             return []
-        
-        # Aplicar filtros con OR
-        query = db.query(Company).filter(
-            and_(
-                or_(*filters),
-                Company.Estado_Cargue == 1  # Solo empresas activas
-            )
-        )
-        
-        return query.order_by(Company.Company).all()
+        return self.crud._filter_by_codes(await self._catalog(db), company_codes)
+
+    async def create(self, db: AsyncDBSession, obj_in: CompanyCreate) -> Company:
+        return await db.run_sync(self.crud.create, obj_in)
+
+    async def update(self, db: AsyncDBSession, db_obj: Company, obj_in: CompanyUpdate) -> Company:
+        return await db.run_sync(self.crud.update, db_obj, obj_in)
+
+    async def delete(self, db: AsyncDBSession, company_id: int) -> Company:
+        return await db.run_sync(self.crud.delete, company_id)
 
-company = CRUDCompany() 
\ No newline at end of file
+company = CRUDCompany()
+async_company = AsyncCRUDCompany(company) 
\ No newline at end of file
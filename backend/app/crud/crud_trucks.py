@@ -1,21 +1,28 @@
+from sqlalchemy import column, insert, or_, select, update, values
 from sqlalchemy.orm import Session
+from app.db.databases import AsyncDBSession
 from app.models.trucks import Truck
-from app.schemas.trucks import TruckCreate, TruckUpdate
-from typing import List, Optional
+from app.schemas.trucks import TruckBulkUpdateItem, TruckCreate, TruckUpdate
+from app.services.truck_cache import truck_list_cache
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 from datetime import date
 import logging
 
-# Configurar logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Filas por transacción en la carga masiva
+BULK_CHUNK_SIZE = 500
+
+# SQL Server admite como máximo 2100 parámetros y 1000 filas por INSERT ... VALUES
+MSSQL_MAX_PARAMS = 2000
+MSSQL_MAX_VALUES_ROWS = 1000
+
 class CRUDTruck:
     def get(self, db: Session, truck_id: int) -> Optional[Truck]:
         return db.query(Truck).filter(Truck.id == truck_id).first()
 
-    def get_multi(self, db: Session, *, skip=0, limit=100, id_empresa=None, id_warehouse=None, carrier=None, date_from=None, date_to=None, id_customer=None, estatus=None, load_number=None) -> List[Truck]:
-        query = db.query(Truck)
-        
+    def _apply_filters(self, query, *, id_empresa=None, id_warehouse=None, carrier=None, date_from=None, date_to=None, id_customer=None, estatus=None, load_number=None):
+        """Aplica los filtros comunes de listado de trucks a una consulta"""
         if id_empresa:
             query = query.filter(Truck.id_empresa == id_empresa)
         if id_warehouse:
@@ -32,34 +39,269 @@ class CRUDTruck:
             query = query.filter(Truck.estatus == estatus)
         if load_number:
             query = query.filter(Truck.load_number == load_number)
+        return query
+
+    def get_multi(self, db: Session, *, skip=0, limit=100, **filters) -> List[Truck]:
+        query = self._apply_filters(db.query(Truck), **filters)
         
         # SQL Server requiere ORDER BY cuando se usa OFFSET/LIMIT
         query = query.order_by(Truck.id.desc())  # Ordenar por ID descendente (más recientes primero)
             
         return query.offset(skip).limit(limit).all()
 
+    def get_multi_after(self, db: Session, *, after_id: Optional[int] = None, limit=100, **filters) -> List[Truck]:
+        """
+        Paginación por cursor (keyset): retorna los trucks con ID menor a `after_id`.
+
+        A diferencia de OFFSET, el costo de cada página es constante sin importar
+        la profundidad, ya que SQL Server busca directamente sobre el índice de `id`.
+        """
+        query = self._apply_filters(db.query(Truck), **filters)
+        if after_id is not None:
+            query = query.filter(Truck.id < after_id)
+        return query.order_by(Truck.id.desc()).limit(limit).all()
+
+    def stream_multi(self, db: Session, *, batch_size: int = 1000, **filters) -> Iterator[Dict[str, Any]]:
+        """
+        Recorre los trucks que cumplen los filtros sin materializar el resultado.
+
+        Selecciona columnas planas (sin instanciar objetos ORM) y las lee en lotes
+        de `batch_size` desde un cursor de servidor, por lo que la memoria usada es
+        constante sin importar el tamaño de la exportación.
+        """
+        query = self._apply_filters(db.query(*Truck.__table__.columns), **filters)
+        stmt = query.order_by(Truck.id.desc()).statement
+        result = db.execute(
+            stmt.execution_options(stream_results=True, yield_per=batch_size)
+        )
+        for row in result.mappings():
+            yield row
+
     def create(self, db: Session, obj_in: TruckCreate) -> Truck:
         try:
-            logger.info(f"Creando truck con datos: {obj_in.dict()}")
             db_obj = Truck(**obj_in.dict(exclude_unset=True))
-            logger.info(f"Objeto creado: {db_obj}")
             db.add(db_obj)
-            logger.info("Objeto agregado a la sesión")
             db.commit()
-            logger.info("Commit realizado exitosamente")
             db.refresh(db_obj)
-            logger.info(f"Objeto refrescado: {db_obj}")
+            logger.info(f"Truck {db_obj.id} creado (empresa {db_obj.id_empresa}, almacén {db_obj.id_warehouse})")
+            truck_list_cache.invalidate([(db_obj.id_empresa, db_obj.id_warehouse)])
             return db_obj
         except Exception as e:
             logger.error(f"Error al crear truck: {str(e)}")
             db.rollback()
             raise e
 
+    def create_bulk(self, db: Session, rows: List[Tuple[int, TruckCreate]], chunk_size: int = BULK_CHUNK_SIZE) -> Tuple[int, List[Dict[str, Any]]]:
+        """
+        Inserta trucks en lotes, con una transacción por lote.
+
+        Cada lote se escribe con un `executemany` por grupo de columnas, que el
+        dialecto de SQL Server convierte en INSERT multi-fila (insertmanyvalues).
+        Si un lote falla se reintenta fila por fila para aislar las filas con
+        error sin abortar el resto de la carga.
+
+        Args:
+            db: Sesión de base de datos
+            rows: Tuplas (índice original, datos validados)
+            chunk_size: Filas por transacción
+
+        Returns:
+            Tupla (filas creadas, errores por fila)
+        """
+        created = 0
+        errors: List[Dict[str, Any]] = []
+
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            try:
+                self._insert_chunk(db, [obj_in.dict(exclude_unset=True) for _, obj_in in chunk])
+                db.commit()
+                created += len(chunk)
+            except Exception as e:
+                db.rollback()
+                logger.warning(f"Lote de {len(chunk)} trucks falló, reintentando fila por fila: {str(e)}")
+                for index, obj_in in chunk:
+                    try:
+                        self._insert_chunk(db, [obj_in.dict(exclude_unset=True)])
+                        db.commit()
+                        created += 1
+                    except Exception as row_error:
+                        db.rollback()
+                        errors.append({
+                            "index": index,
+                            "load_number": obj_in.load_number,
+                            "errors": [str(getattr(row_error, "orig", row_error))[:300]]
+                        })
+
+        if created:
+            truck_list_cache.invalidate({(obj_in.id_empresa, obj_in.id_warehouse) for _, obj_in in rows})
+        logger.info(f"Carga masiva de trucks: {created} creados, {len(errors)} con error")
+        return created, errors
+
+    def _insert_chunk(self, db: Session, data: List[Dict[str, Any]]) -> None:
+        """
+        Ejecuta los INSERT de un lote agrupando filas con las mismas columnas.
+
+        SQLAlchemy pagina cada `executemany` en sentencias INSERT ... VALUES de
+        hasta 1000 filas y 2099 parámetros, los límites de SQL Server.
+        """
+        groups: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+        for item in data:
+            groups.setdefault(tuple(sorted(item)), []).append(item)
+
+        table = Truck.__table__
+        for items in groups.values():
+            db.execute(insert(table), items)
+
+    def update_bulk(self, db: Session, items: List[Tuple[int, TruckBulkUpdateItem]], upsert: bool = False, chunk_size: int = BULK_CHUNK_SIZE) -> Tuple[int, int, List[Dict[str, Any]]]:
+        """
+        Aplica actualizaciones parciales en lote, identificadas por `id` o `load_number`.
+
+        Por cada lote se resuelven las filas de cada clave con una sola consulta y se
+        emite un UPDATE ... FROM (VALUES ...) por id para cada combinación de campos,
+        en lugar de un SELECT + UPDATE por camión. Si un lote falla se reintenta
+        elemento por elemento para aislar los errores.
+
+        Args:
+            db: Sesión de base de datos
+            items: Tuplas (índice original, actualización)
+            upsert: Si es True, los `load_number` inexistentes se insertan
+            chunk_size: Elementos por transacción
+
+        Returns:
+            Tupla (filas actualizadas, filas creadas, errores por elemento)
+        """
+        table = Truck.__table__
+        updated = 0
+        created = 0
+        errors: List[Dict[str, Any]] = []
+        # Pares (empresa, almacén) tocados, antes y después de la actualización
+        touched_scopes = set()
+
+        for start in range(0, len(items), chunk_size):
+            chunk = items[start:start + chunk_size]
+
+            # Resolver en una sola consulta a qué filas apunta cada clave
+            ids = {item.id for _, item in chunk if item.id}
+            load_numbers = {item.load_number for _, item in chunk if not item.id and item.load_number}
+            conditions = []
+            if ids:
+                conditions.append(table.c.id.in_(ids))
+            if load_numbers:
+                conditions.append(table.c.load_number.in_(load_numbers))
+            scopes_by_id: Dict[int, Tuple[Any, Any]] = {}
+            ids_by_load_number: Dict[str, List[int]] = {}
+            if conditions:
+                query = select(table.c.id, table.c.load_number, table.c.id_empresa, table.c.id_warehouse).where(or_(*conditions))
+                for row in db.execute(query):
+                    scopes_by_id[row.id] = (row.id_empresa, row.id_warehouse)
+                    ids_by_load_number.setdefault(row.load_number, []).append(row.id)
+
+            # Cambios por fila: un id y un load_number de la misma fila, o claves
+            # repetidas en la petición, se combinan y prevalecen los últimos valores
+            pending: Dict[int, Dict[str, Any]] = {}
+            to_create: Dict[str, Dict[str, Any]] = {}
+            for index, item in chunk:
+                fields = item.dict(exclude_unset=True)
+                fields.pop("id", None)
+                if item.id:
+                    row_ids = [item.id] if item.id in scopes_by_id else []
+                elif item.load_number:
+                    row_ids = ids_by_load_number.get(fields.pop("load_number"), [])
+                else:
+                    errors.append({"index": index, "load_number": None, "errors": ["Se requiere id o load_number"]})
+                    continue
+
+                if not row_ids:
+                    if upsert and not item.id:
+                        entry = to_create.setdefault(item.load_number, {"indexes": [], "fields": {}})
+                        entry["indexes"].append(index)
+                        entry["fields"].update(item.dict(exclude_unset=True, exclude={"id"}))
+                    else:
+                        errors.append({"index": index, "load_number": item.load_number, "errors": ["Truck not found"]})
+                    continue
+
+                for row_id in row_ids:
+                    entry = pending.setdefault(row_id, {"items": [], "fields": {}})
+                    entry["items"].append((index, item.load_number))
+                    entry["fields"].update(fields)
+
+            entries = [(row_id, entry) for row_id, entry in pending.items() if entry["fields"]]
+            for row_id, entry in entries:
+                id_empresa, id_warehouse = scopes_by_id[row_id]
+                touched_scopes.add((id_empresa, id_warehouse))
+                touched_scopes.add((entry["fields"].get("id_empresa", id_empresa), entry["fields"].get("id_warehouse", id_warehouse)))
+
+            try:
+                updated += self._update_rows(db, entries)
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                logger.warning(f"Lote de {len(entries)} actualizaciones falló, reintentando una por una: {str(e)}")
+                # Un load_number puede abarcar varias filas: un error por elemento
+                failed: Dict[int, Dict[str, Any]] = {}
+                for entry in entries:
+                    try:
+                        updated += self._update_rows(db, [entry])
+                        db.commit()
+                    except Exception as row_error:
+                        db.rollback()
+                        for index, load_number in entry[1]["items"]:
+                            failed.setdefault(index, {
+                                "index": index,
+                                "load_number": load_number,
+                                "errors": [str(getattr(row_error, "orig", row_error))[:300]]
+                            })
+                errors.extend(failed.values())
+
+            if to_create:
+                # Un solo INSERT por load_number nuevo, con los valores combinados
+                creates = list(to_create.values())
+                chunk_created, create_errors = self.create_bulk(
+                    db, [(position, TruckCreate(**entry["fields"])) for position, entry in enumerate(creates)]
+                )
+                created += chunk_created
+                for error in create_errors:
+                    errors.extend({**error, "index": index} for index in creates[error["index"]]["indexes"])
+
+        if updated:
+            truck_list_cache.invalidate(touched_scopes)
+        logger.info(f"Actualización masiva de trucks: {updated} actualizados, {created} creados, {len(errors)} con error")
+        return updated, created, errors
+
+    def _update_rows(self, db: Session, entries: List[Tuple[int, Dict[str, Any]]]) -> int:
+        """Emite un UPDATE ... FROM (VALUES ...) por id para cada grupo de campos"""
+        table = Truck.__table__
+        groups: Dict[Tuple[str, ...], List[Tuple[int, Dict[str, Any]]]] = {}
+        for row_id, entry in entries:
+            fields = entry["fields"]
+            groups.setdefault(tuple(sorted(fields)), []).append((row_id, fields))
+
+        affected = 0
+        for field_names, rows in groups.items():
+            rows_per_statement = max(1, min(MSSQL_MAX_VALUES_ROWS, MSSQL_MAX_PARAMS // (len(field_names) + 1)))
+            for offset in range(0, len(rows), rows_per_statement):
+                batch = rows[offset:offset + rows_per_statement]
+                source = values(
+                    column("match_id", table.c.id.type),
+                    *[column(name, table.c[name].type) for name in field_names],
+                    name="v"
+                ).data([(row_id, *[fields[name] for name in field_names]) for row_id, fields in batch])
+                stmt = (
+                    update(table)
+                    .where(table.c.id == source.c.match_id)
+                    .values({name: source.c[name] for name in field_names})
+                )
+                affected += db.execute(stmt).rowcount
+        return affected
+
     def update(self, db: Session, db_obj: Truck, obj_in: TruckUpdate) -> Truck:
+        previous_scope = (db_obj.id_empresa, db_obj.id_warehouse)
         for field, value in obj_in.dict(exclude_unset=True).items():
             setattr(db_obj, field, value)
         db.commit()
         db.refresh(db_obj)
+        truck_list_cache.invalidate([previous_scope, (db_obj.id_empresa, db_obj.id_warehouse)])
         return db_obj
 
     def remove(self, db: Session, truck_id: int) -> Optional[Truck]:
@@ -67,6 +309,7 @@ class CRUDTruck:
         if obj:
             db.delete(obj)
             db.commit()
+            truck_list_cache.invalidate([(obj.id_empresa, obj.id_warehouse)])
         return obj
 
     def get_by_empresa_and_warehouse(self, db: Session, id_empresa: int, id_warehouse: int) -> List[Truck]:
@@ -96,4 +339,55 @@ class CRUDTruck:
     def get_by_load_number(self, db: Session, load_number: str) -> Optional[Truck]:
         return db.query(Truck).filter(Truck.load_number == load_number).first()
 
-crud_truck = CRUDTruck() 
\ No newline at end of file
+class AsyncCRUDTruck:
+    """
+    Variante asíncrona de CRUDTruck para endpoints `async def`.
+
+    Cada operación delega en CRUDTruck a través de `AsyncDBSession.run_sync`, por lo
+    que comparte la lógica de consultas, lotes e invalidación de caché.
+    """
+
+    def __init__(self, crud: CRUDTruck):
+        self.crud = crud
+
+    async def get(self, db: AsyncDBSession, truck_id: int) -> Optional[Truck]:
+        return await db.run_sync(self.crud.get, truck_id)
+
+    async def get_multi(self, db: AsyncDBSession, *, skip=0, limit=100, **filters) -> List[Truck]:
+        return await db.run_sync(self.crud.get_multi, skip=skip, limit=limit, **filters)
+
+    async def get_multi_after(self, db: AsyncDBSession, *, after_id: Optional[int] = None, limit=100, **filters) -> List[Truck]:
+        return await db.run_sync(self.crud.get_multi_after, after_id=after_id, limit=limit, **filters)
+
+    async def create(self, db: AsyncDBSession, obj_in: TruckCreate) -> Truck:
+        return await db.run_sync(self.crud.create, obj_in)
+
+    async def create_bulk(self, db: AsyncDBSession, rows: List[Tuple[int, TruckCreate]], chunk_size: int = BULK_CHUNK_SIZE) -> Tuple[int, List[Dict[str, Any]]]:
+        return await db.run_sync(self.crud.create_bulk, rows, chunk_size)
+
+    async def update_bulk(self, db: AsyncDBSession, items: List[Tuple[int, TruckBulkUpdateItem]], upsert: bool = False, chunk_size: int = BULK_CHUNK_SIZE) -> Tuple[int, int, List[Dict[str, Any]]]:
+        return await db.run_sync(self.crud.update_bulk, items, upsert, chunk_size)
+
+    async def update(self, db: AsyncDBSession, db_obj: Truck, obj_in: TruckUpdate) -> Truck:
+        return await db.run_sync(self.crud.update, db_obj, obj_in)
+
+    async def remove(self, db: AsyncDBSession, truck_id: int) -> Optional[Truck]:
+        return await db.run_sync(self.crud.remove, truck_id)
+
+    async def get_by_empresa_and_warehouse(self, db: AsyncDBSession, id_empresa: int, id_warehouse: int) -> List[Truck]:
+        return await db.run_sync(self.crud.get_by_empresa_and_warehouse, id_empresa, id_warehouse)
+
+    async def get_by_empresa_warehouse_and_dates(self, db: AsyncDBSession, id_empresa: int, id_warehouse: int, date_from: date, date_to: date) -> List[Truck]:
+        return await db.run_sync(self.crud.get_by_empresa_warehouse_and_dates, id_empresa, id_warehouse, date_from, date_to)
+
+    async def get_by_warehouse_and_dates(self, db: AsyncDBSession, id_warehouse: int, date_from: date, date_to: date) -> List[Truck]:
+        return await db.run_sync(self.crud.get_by_warehouse_and_dates, id_warehouse, date_from, date_to)
+
+    async def get_by_carrier(self, db: AsyncDBSession, carrier: str) -> List[Truck]:
+        return await db.run_sync(self.crud.get_by_carrier, carrier)
+
+    async def get_by_load_number(self, db: AsyncDBSession, load_number: str) -> Optional[Truck]:
+        return await db.run_sync(self.crud.get_by_load_number, load_number)
+
+crud_truck = CRUDTruck()
+async_crud_truck = AsyncCRUDTruck(crud_truck) 
\ No newline at end of file
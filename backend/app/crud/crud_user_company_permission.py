@@ -1,8 +1,37 @@
 from sqlalchemy.orm import Session
+from typing import Dict, Iterable, List
 from app.models.user_company_permission import UserCompanyPermission
 
 class CRUDUserCompanyPermission:
     def get_companies_for_user(self, db: Session, user_id: int):
         return db.query(UserCompanyPermission.company_id).filter(UserCompanyPermission.user_id == user_id).all()
 
-crud_user_company_permission = CRUDUserCompanyPermission() 
\ No newline at end of file
+    def get_active_by_user_ids(self, db: Session, user_ids: Iterable[int]) -> Dict[int, List[dict]]:
+        """
+        Obtiene los permisos de empresa activos de varios usuarios en una sola consulta.
+
+        Returns:
+            Diccionario user_id -> lista de {"company_code", "permission_type"};
+            los usuarios sin permisos quedan con lista vacía
+        """
+        permissions: Dict[int, List[dict]] = {user_id: [] for user_id in user_ids}
+        if not permissions:
+            return permissions
+
+        rows = db.query(
+            UserCompanyPermission.user_id,
+            UserCompanyPermission.company_code,
+            UserCompanyPermission.permission_type
+        ).filter(
+            UserCompanyPermission.user_id.in_(list(permissions)),
+            UserCompanyPermission.is_active == True
+        ).order_by(UserCompanyPermission.user_id, UserCompanyPermission.id).all()
+
+        for user_id, company_code, permission_type in rows:
+            permissions[user_id].append({
+                "company_code": company_code,
+                "permission_type": permission_type
+            })
+        return permissions
+
+crud_user_company_permission = CRUDUserCompanyPermission()
\ No newline at end of file
@@ -12,11 +12,11 @@ from app.models.permisos import Permiso
 from app.models.user_company_permission import UserCompanyPermission
 
 # Dependencies para compatibilidad
-from app.db.databases import get_main_db, get_saturno13_db, get_companies_db
+from app.db.databases import get_main_db, get_saturno13_db, get_companies_db, get_async_main_db, get_async_companies_db
 
 def get_db():
     """Dependency para la base de datos principal (compatibilidad)"""
-    return get_main_db()
+    yield from get_main_db()
 
 # Exportar las nuevas dependencies y modelos
-__all__ = ['Base', 'get_db', 'get_main_db', 'get_saturno13_db', 'get_companies_db', 'User', 'Role', 'Company', 'Truck', 'Permiso', 'UserCompanyPermission'] 
\ No newline at end of file
+__all__ = ['Base', 'get_db', 'get_main_db', 'get_saturno13_db', 'get_companies_db', 'get_async_main_db', 'get_async_companies_db', 'User', 'Role', 'Company', 'Truck', 'Permiso', 'UserCompanyPermission'] 
\ No newline at end of file
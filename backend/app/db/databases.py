@@ -1,17 +1,61 @@
+from functools import partial
+from typing import Any, Callable, Optional
+from anyio import CapacityLimiter, to_thread
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 from app.core.config import settings
+from app.db.pool_stats import InstrumentedQueuePool, instrument_engine, pool_status
 
 # =============================================================================
 # CONFIGURACIÓN DE MÚLTIPLES BASES DE DATOS
 # =============================================================================
 
+class AsyncDBSession:
+    """
+    Sesión asíncrona que ejecuta una `Session` síncrona en hilos dedicados.
+
+    Expone `run_sync(fn, *args, **kwargs)` con la misma firma que
+    `sqlalchemy.ext.asyncio.AsyncSession.run_sync`: `fn` recibe la sesión síncrona
+    como primer argumento. Las llamadas se ejecutan con un `CapacityLimiter` propio
+    de cada base de datos (acotado al pool de conexiones), de modo que las consultas
+    en espera quedan suspendidas en el event loop en lugar de ocupar hilos del
+    threadpool de Starlette.
+    """
+    
+    def __init__(self, session_factory: sessionmaker, limiter: CapacityLimiter):
+        self._session_factory = session_factory
+        self._limiter = limiter
+        self._session: Optional[Session] = None
+    
+    def _call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        if self._session is None:
+            self._session = self._session_factory()
+        return fn(self._session, *args, **kwargs)
+    
+    async def run_sync(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Ejecuta `fn(session, *args, **kwargs)` en un hilo del limitador"""
+        return await to_thread.run_sync(partial(self._call, fn, *args, **kwargs), limiter=self._limiter)
+    
+    async def close(self):
+        """Cierra la sesión síncrona subyacente si llegó a abrirse"""
+        if self._session is not None:
+            session, self._session = self._session, None
+            await to_thread.run_sync(session.close, limiter=self._limiter)
+    
+    async def __aenter__(self) -> "AsyncDBSession":
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
 class DatabaseManager:
     """Gestor de múltiples conexiones de bases de datos"""
     
     def __init__(self):
         self._engines = {}
         self._sessions = {}
+        self._pool_stats = {}
+        self._async_limiters = {}
         self._initialize_connections()
     
     def _initialize_connections(self):
@@ -19,11 +63,7 @@ class DatabaseManager:
         
         # Base de datos principal (OneSite)
         if all([settings.DB_SERVER, settings.DB_NAME, settings.DB_USER, settings.DB_PASSWORD]):
-            self._engines['main'] = create_engine(
-                settings.DATABASE_URL,
-                pool_pre_ping=True,
-                pool_recycle=300
-            )
+            self._engines['main'] = self._create_engine('main', settings.DATABASE_URL)
             self._sessions['main'] = sessionmaker(
                 autocommit=False, 
                 autoflush=False, 
@@ -33,11 +73,7 @@ class DatabaseManager:
         
         # Base de datos SATURNO13 (TheEliteGroup)
         if all([settings.SATURNO13_SERVER, settings.SATURNO13_DB, settings.SATURNO13_USER, settings.SATURNO13_PASSWORD]):
-            self._engines['saturno13'] = create_engine(
-                settings.SATURNO13_DATABASE_URL,
-                pool_pre_ping=True,
-                pool_recycle=300
-            )
+            self._engines['saturno13'] = self._create_engine('saturno13', settings.SATURNO13_DATABASE_URL)
             self._sessions['saturno13'] = sessionmaker(
                 autocommit=False, 
                 autoflush=False, 
@@ -47,11 +83,7 @@ class DatabaseManager:
         
         # Base de datos JUPITER12MIA (EFLOWER_Reports)
         if all([settings.JUPITER12MIA_SERVER, settings.JUPITER12MIA_DB, settings.JUPITER12MIA_USER, settings.JUPITER12MIA_PASSWORD]):
-            self._engines['jupiter12mia'] = create_engine(
-                settings.JUPITER12MIA_DATABASE_URL,
-                pool_pre_ping=True,
-                pool_recycle=300
-            )
+            self._engines['jupiter12mia'] = self._create_engine('jupiter12mia', settings.JUPITER12MIA_DATABASE_URL)
             self._sessions['jupiter12mia'] = sessionmaker(
                 autocommit=False, 
                 autoflush=False, 
@@ -59,6 +91,14 @@ class DatabaseManager:
             )
             print(f"✅ Conexión a JUPITER12MIA: {settings.JUPITER12MIA_SERVER}/{settings.JUPITER12MIA_DB}")
     
+    def _create_engine(self, database_name: str, url: str):
+        """Crea un engine con el pool configurado para la base de datos e instrumentado"""
+        options = settings.get_pool_options(database_name)
+        options["poolclass"] = InstrumentedQueuePool
+        engine = create_engine(url, **options)
+        self._pool_stats[database_name] = instrument_engine(engine, database_name)
+        return engine
+    
     def get_engine(self, database_name: str = 'main'):
         """Obtiene el engine de una base de datos específica"""
         if database_name not in self._engines:
@@ -71,6 +111,39 @@ class DatabaseManager:
             raise ValueError(f"Base de datos '{database_name}' no configurada")
         return self._sessions[database_name]()
     
+    @staticmethod
+    def async_capacity(database_name: str) -> int:
+        """
+        Consultas asíncronas simultáneas de una base de datos: tantas como conexiones
+        puede entregar su pool (`pool_size` + `max_overflow`), para que las que sobran
+        esperen en el event loop y no en un hilo bloqueado por el checkout del pool
+        """
+        options = settings.get_pool_options(database_name)
+        # max_overflow negativo es overflow ilimitado en SQLAlchemy: acotar al pool base
+        return max(1, options["pool_size"] + max(options["max_overflow"], 0))
+    
+    def get_async_session(self, database_name: str = 'main') -> AsyncDBSession:
+        """Obtiene una sesión asíncrona de una base de datos específica"""
+        if database_name not in self._sessions:
+            raise ValueError(f"Base de datos '{database_name}' no configurada")
+        # El limitador se crea dentro del event loop en el primer uso
+        if database_name not in self._async_limiters:
+            self._async_limiters[database_name] = CapacityLimiter(self.async_capacity(database_name))
+        return AsyncDBSession(self._sessions[database_name], self._async_limiters[database_name])
+    
+    def get_pool_status(self) -> dict:
+        """Estado y contadores de los pools de todas las bases de datos configuradas"""
+        status = {}
+        for db_name, engine in self._engines.items():
+            status[db_name] = pool_status(engine, self._pool_stats[db_name])
+            limiter = self._async_limiters.get(db_name)
+            if limiter is not None:
+                statistics = limiter.statistics()
+                status[db_name]["async_capacity"] = statistics.total_tokens
+                status[db_name]["async_in_flight"] = statistics.borrowed_tokens
+                status[db_name]["async_waiting"] = statistics.tasks_waiting
+        return status
+    
     def test_connections(self):
         """Prueba todas las conexiones configuradas"""
         results = {}
@@ -116,17 +189,38 @@ def get_db(database_name: str = 'main'):
     finally:
         db.close()
 
+async def get_async_db(database_name: str = 'main'):
+    """
+    Dependency para obtener una sesión asíncrona de base de datos.
+    
+    Args:
+        database_name: Nombre de la base de datos ('main' o 'saturno13')
+    
+    Yields:
+        AsyncDBSession: Sesión que ejecuta las consultas fuera del event loop
+    """
+    db = db_manager.get_async_session(database_name)
+    try:
+        yield db
+    finally:
+        await db.close()
+
 def get_main_db():
     """Dependency para la base de datos principal (OneSite)"""
-    return get_db('main')
+    yield from get_db('main')
 
 def get_saturno13_db():
     """Dependency para la base de datos SATURNO13 (TheEliteGroup)"""
-    return get_db('saturno13')
+    yield from get_db('saturno13')
 
 def get_jupiter12mia_db():
     """Dependency para la base de datos JUPITER12MIA (EFLOWER_Reports)"""
-    return get_db('jupiter12mia')
+    yield from get_db('jupiter12mia')
+
+async def get_async_main_db():
+    """Dependency asíncrona para la base de datos principal (OneSite)"""
+    async for db in get_async_db('main'):
+        yield db
 
 # =============================================================================
 # CONFIGURACIÓN ESPECÍFICA PARA COMPANIES
@@ -140,4 +234,10 @@ def get_companies_db():
     if settings.USE_SATURNO13_COMPANIES and 'saturno13' in db_manager._engines:
         yield from get_db('saturno13')
     else:
-        yield from get_db('main') 
\ No newline at end of file
+        yield from get_db('main')
+
+async def get_async_companies_db():
+    """Dependency asíncrona para el módulo de empresas (SATURNO13 o la base principal)"""
+    database_name = 'saturno13' if settings.USE_SATURNO13_COMPANIES and 'saturno13' in db_manager._engines else 'main'
+    async for db in get_async_db(database_name):
+        yield db 
\ No newline at end of file
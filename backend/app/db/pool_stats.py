@@ -0,0 +1,145 @@
+"""
+Instrumentación de los pools de conexiones de SQLAlchemy para OneSite
+"""
+
+import threading
+import time
+from typing import Dict
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from app.core.telemetry import DB_POOL_CHECKED_OUT, DB_POOL_EVENTS, DB_POOL_WAIT
+
+
+class PoolStats:
+    """
+    Contadores acumulados de un pool, alimentados por los eventos del pool.
+
+    Los mismos eventos se exportan a las métricas Prometheus con la etiqueta `database`.
+    """
+
+    def __init__(self, database: str = "default"):
+        self.database = database
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.checked_out = 0
+        self.checked_out_peak = 0
+        self.wait_count = 0
+        self.wait_total_ms = 0.0
+        self.wait_max_ms = 0.0
+
+    def on_connect(self, *args):
+        with self._lock:
+            self.connects += 1
+        DB_POOL_EVENTS.labels(self.database, "connect").inc()
+
+    def on_checkout(self, *args):
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.checked_out_peak = max(self.checked_out_peak, self.checked_out)
+            checked_out = self.checked_out
+        DB_POOL_EVENTS.labels(self.database, "checkout").inc()
+        DB_POOL_CHECKED_OUT.labels(self.database).set(checked_out)
+
+    def on_checkin(self, *args):
+        with self._lock:
+            self.checkins += 1
+            self.checked_out = max(0, self.checked_out - 1)
+            checked_out = self.checked_out
+        DB_POOL_CHECKED_OUT.labels(self.database).set(checked_out)
+
+    def on_invalidate(self, *args):
+        with self._lock:
+            self.invalidations += 1
+        DB_POOL_EVENTS.labels(self.database, "invalidate").inc()
+
+    def record_wait(self, elapsed_ms: float, timed_out: bool = False):
+        """Registra el tiempo que una petición esperó por una conexión del pool"""
+        with self._lock:
+            self.wait_count += 1
+            self.wait_total_ms += elapsed_ms
+            self.wait_max_ms = max(self.wait_max_ms, elapsed_ms)
+            if timed_out:
+                self.timeouts += 1
+        DB_POOL_WAIT.labels(self.database).observe(elapsed_ms / 1000)
+        if timed_out:
+            DB_POOL_EVENTS.labels(self.database, "timeout").inc()
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts,
+                "checked_out_peak": self.checked_out_peak,
+                "wait_avg_ms": round(self.wait_total_ms / self.wait_count, 3) if self.wait_count else 0.0,
+                "wait_max_ms": round(self.wait_max_ms, 3),
+            }
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool que mide cuánto espera cada checkout por una conexión.
+
+    SQLAlchemy no emite un evento al *solicitar* una conexión, solo al entregarla,
+    por lo que la espera se mide alrededor de `_do_get`.
+    """
+
+    stats: PoolStats = None
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            if self.stats is not None:
+                self.stats.record_wait((time.perf_counter() - started) * 1000, timed_out=True)
+            raise
+        if self.stats is not None:
+            self.stats.record_wait((time.perf_counter() - started) * 1000)
+        return connection
+
+    def recreate(self):
+        # engine.dispose() recrea el pool: conservar los contadores
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+def instrument_engine(engine: Engine, database: str = "default") -> PoolStats:
+    """Registra los eventos del pool del engine y retorna sus contadores"""
+    stats = PoolStats(database)
+    if isinstance(engine.pool, InstrumentedQueuePool):
+        engine.pool.stats = stats
+    event.listen(engine, "connect", stats.on_connect)
+    event.listen(engine, "checkout", stats.on_checkout)
+    event.listen(engine, "checkin", stats.on_checkin)
+    event.listen(engine, "invalidate", stats.on_invalidate)
+    return stats
+
+
+def pool_status(engine: Engine, stats: PoolStats) -> Dict:
+    """Estado actual del pool más los contadores acumulados"""
+    pool = engine.pool
+    status = {"pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "max_overflow": pool._max_overflow,
+            "timeout_seconds": pool.timeout(),
+        })
+    status.update(stats.snapshot())
+    return status
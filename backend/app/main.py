@@ -1,96 +1,60 @@
-from fastapi import FastAPI, Request
+from fastapi import Depends, FastAPI, HTTPException, Request, status
+from fastapi.responses import Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from app.core.config import settings
+from app.core.logging_config import setup_logging
+# Configurar logging antes de importar los módulos que registran al cargarse
+setup_logging()
 from app.api.v1.api import api_router
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
+from app.services.metrics_collector import metrics_collector
+from app.services.audit_writer import audit_writer
+from app.core.security import ldap_auth
+from app.core.token_blacklist import token_blacklist
+from app.core.rate_limiter import enforce_rate_limit
+from app.core.redis_client import async_redis_pool
+from app.core.telemetry import mark_process_dead, render_metrics
+from app.core.middleware import OneSiteMiddleware
+from app.db.databases import db_manager
+from contextlib import asynccontextmanager
+import logging
+import secrets
 import time
 
-# Configurar rate limiter global
-limiter = Limiter(key_func=get_remote_address)
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Arranque y apagado de los servicios en segundo plano"""
+    token_blacklist.start()
+    metrics_collector.start()
+    audit_writer.start()
+    yield
+    await metrics_collector.stop()
+    await audit_writer.stop()
+    token_blacklist.stop()
+    ldap_auth.connection_pool.close_all()
+    db_manager.close_all()
+    await async_redis_pool.disconnect()
+    mark_process_dead()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
     description="API para el sistema OneSite",
     version=settings.VERSION,
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
-# Configurar rate limiter en la aplicación
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
-
-print("CORS_ORIGINS:", settings.CORS_ORIGINS)
+logger.info(f"CORS_ORIGINS: {settings.CORS_ORIGINS}")
 
 # Middleware de hosts confiables (recomendado para producción)
 # app.add_middleware(TrustedHostMiddleware, allowed_hosts=["teg.1sitesoft.com", "localhost", "127.0.0.1"])
 
-# Middleware CORS ultra-simple - intercepta TODAS las solicitudes
-@app.middleware("http")
-async def ultra_simple_cors(request: Request, call_next):
-    # Para solicitudes OPTIONS, responder inmediatamente
-    if request.method == "OPTIONS":
-        from fastapi.responses import Response
-        response = Response(status_code=200, content="")
-        response.headers["Access-Control-Allow-Origin"] = "*"  # Permitir todos los orígenes temporalmente
-        response.headers["Access-Control-Allow-Methods"] = "*"  # Permitir todos los métodos
-        response.headers["Access-Control-Allow-Headers"] = "*"  # Permitir todos los headers
-        response.headers["Access-Control-Allow-Credentials"] = "true"
-        response.headers["Access-Control-Max-Age"] = "86400"  # Cache por 24 horas
-        return response
-    
-    # Para todas las demás requests
-    response = await call_next(request)
-    response.headers["Access-Control-Allow-Origin"] = "*"  # Permitir todos los orígenes temporalmente
-    response.headers["Access-Control-Allow-Credentials"] = "true"
-    
-    return response
-
-# Middleware de headers de seguridad
-@app.middleware("http")
-async def add_security_headers(request: Request, call_next):
-    start_time = time.time()
-    
-    response = await call_next(request)
-    
-    # Headers de seguridad
-    response.headers["X-Frame-Options"] = "DENY"
-    response.headers["X-Content-Type-Options"] = "nosniff"
-    response.headers["X-XSS-Protection"] = "1; mode=block"
-    response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
-    response.headers["Content-Security-Policy"] = "default-src 'self'; script-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net; style-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net; img-src 'self' data: https://fastapi.tiangolo.com; font-src 'self' https://cdn.jsdelivr.net"
-    response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
-    response.headers["Permissions-Policy"] = "geolocation=(), microphone=(), camera=()"
-    
-    # Header de tiempo de respuesta
-    process_time = time.time() - start_time
-    response.headers["X-Process-Time"] = str(process_time)
-    
-    return response
-
-
-# Middleware de logging de requests
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    start_time = time.time()
-    
-    # Obtener información del cliente
-    client_ip = request.client.host if request.client else "unknown"
-    user_agent = request.headers.get("user-agent", "unknown")
-    
-    # Procesar la request
-    response = await call_next(request)
-    
-    # Calcular tiempo de respuesta
-    process_time = time.time() - start_time
-    
-    # Log de la request (sin información sensible)
-    print(f"{client_ip} - {request.method} {request.url.path} - {response.status_code} - {process_time:.3f}s")
-    
-    return response
+# Middleware único (ASGI puro): preflight CORS, headers CORS y de seguridad, y
+# registro de latencia por ruta
+app.add_middleware(OneSiteMiddleware)
 
 # CORS Middleware deshabilitado temporalmente para usar middleware personalizado
 # app.add_middleware(
@@ -103,8 +67,8 @@ async def log_requests(request: Request, call_next):
 #     max_age=3600
 # )
 
-# Incluir las rutas API
-app.include_router(api_router, prefix=settings.API_V1_STR)
+# Incluir las rutas API (con el rate limit compartido en Redis por IP y usuario)
+app.include_router(api_router, prefix=settings.API_V1_STR, dependencies=[Depends(enforce_rate_limit)])
 
 @app.get("/")
 async def root():
@@ -133,6 +97,16 @@ async def health_check():
         "version": settings.VERSION
     }
 
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics(request: Request):
+    """Métricas del proceso en formato Prometheus (de todos los workers en modo multiproceso)"""
+    if settings.METRICS_TOKEN:
+        authorization = request.headers.get("authorization", "")
+        if not secrets.compare_digest(authorization, f"Bearer {settings.METRICS_TOKEN}"):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token de métricas inválido")
+    content, content_type = render_metrics()
+    return Response(content=content, media_type=content_type)
+
 @app.options("/health")
 async def health_options():
     """Maneja peticiones OPTIONS para CORS"""
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Optional
 from datetime import date, time, datetime
 
 class TruckBase(BaseModel):
@@ -100,6 +100,29 @@ class TruckUpdate(TruckBase):
             }
         }
 
+class TruckBulkUpdateItem(TruckUpdate):
+    """
+    Actualización parcial de un camión dentro de una operación masiva.
+    
+    El camión se identifica por `id` o, si no se envía, por `load_number`
+    (en cuyo caso `load_number` no se modifica). Solo se actualizan los
+    campos enviados.
+    """
+    
+    id: Optional[int] = Field(None, description="ID del camión a actualizar", ge=1)
+    
+    class Config:
+        """Configuración del modelo para actualización masiva"""
+        json_schema_extra = {
+            "example": {
+                "load_number": "LOAD-2025-001",
+                "estatus": 2,
+                "estado_cargue": 1,
+                "door": "A3",
+                "time_in": "08:30:00"
+            }
+        }
+
 class TruckInDBBase(TruckBase):
     """
     Modelo base para camiones en la base de datos.
@@ -146,4 +169,36 @@ class Truck(TruckInDBBase):
     Este es el modelo que se utiliza para todas las respuestas
     de la API que devuelven datos de camiones.
     """
-    pass 
\ No newline at end of file
+    pass 
+
+class TruckBulkError(BaseModel):
+    """
+    Error de una fila dentro de una operación masiva.
+    """
+    
+    index: int = Field(..., description="Posición de la fila en la petición (base 0)")
+    load_number: Optional[str] = Field(None, description="Número de carga de la fila, si se envió")
+    errors: List[str] = Field(default_factory=list, description="Mensajes de error de validación o de base de datos")
+
+class TruckBulkResult(BaseModel):
+    """
+    Resultado de una carga masiva de camiones.
+    
+    Las filas inválidas se reportan en `errors` sin abortar el resto de la carga.
+    """
+    
+    total: int = Field(..., description="Filas recibidas")
+    created: int = Field(..., description="Filas insertadas")
+    failed: int = Field(..., description="Filas rechazadas")
+    errors: List[TruckBulkError] = Field(default_factory=list, description="Detalle de las filas rechazadas")
+
+class TruckBulkUpdateResult(BaseModel):
+    """
+    Resultado de una actualización masiva de camiones.
+    """
+    
+    total: int = Field(..., description="Elementos recibidos")
+    updated: int = Field(..., description="Filas actualizadas en base de datos")
+    created: int = Field(0, description="Filas insertadas por upsert (load_number inexistente)")
+    failed: int = Field(..., description="Elementos rechazados")
+    errors: List[TruckBulkError] = Field(default_factory=list, description="Detalle de los elementos rechazados o no encontrados")
@@ -0,0 +1,67 @@
+"""
+Caché de perfiles de Active Directory en Redis para OneSite
+"""
+
+import json
+import logging
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+from app.core.redis_client import redis_client
+from app.core.telemetry import record_cache
+
+logger = logging.getLogger(__name__)
+
+
+class ADProfileCache:
+    """
+    Perfil de AD (datos, grupos, roles y permisos) por username.
+
+    La membresía de grupos cambia poco, así que tras un bind exitoso el perfil se
+    toma de aquí en lugar de repetir la búsqueda `sAMAccountName` en el directorio.
+    El TTL es corto y las acciones administrativas sobre el usuario lo invalidan.
+    """
+
+    KEY_PREFIX = "ad_profile"
+
+    def __init__(self, client=redis_client, ttl_seconds: int = settings.AD_PROFILE_CACHE_TTL_SECONDS):
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+
+    def _key(self, username: str) -> str:
+        return f"{self.KEY_PREFIX}:{username.lower()}"
+
+    def get(self, username: str) -> Optional[Dict[str, Any]]:
+        """Obtiene el perfil cacheado o None"""
+        if self.ttl_seconds <= 0:
+            return None
+        try:
+            cached = self.client.get(self._key(username))
+        except Exception as e:
+            logger.warning(f"Caché de perfiles AD no disponible: {e}")
+            return None
+        record_cache("ad_profile", cached is not None)
+        return json.loads(cached) if cached else None
+
+    def set(self, username: str, profile: Dict[str, Any]) -> None:
+        """Guarda el perfil con el TTL configurado"""
+        if self.ttl_seconds <= 0:
+            return
+        try:
+            self.client.setex(self._key(username), self.ttl_seconds, json.dumps(profile))
+        except Exception as e:
+            logger.warning(f"Error guardando perfil AD de {username}: {e}")
+
+    def invalidate(self, *usernames: Optional[str]) -> None:
+        """Elimina los perfiles cacheados de los usuarios indicados"""
+        keys = [self._key(username) for username in usernames if username]
+        if not keys:
+            return
+        try:
+            self.client.delete(*keys)
+        except Exception as e:
+            logger.error(f"Error invalidando perfiles AD: {e}")
+
+
+# Instancia global de la caché de perfiles AD
+ad_profile_cache = ADProfileCache()
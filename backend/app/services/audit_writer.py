@@ -0,0 +1,177 @@
+"""
+Escritura asíncrona y por lotes de la auditoría de login de OneSite
+"""
+
+import asyncio
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import column, insert, table
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.db.databases import db_manager
+
+logger = logging.getLogger(__name__)
+
+audit_login_attempts = table(
+    "audit_login_attempts",
+    column("username"),
+    column("ip_address"),
+    column("user_agent"),
+    column("attempt_time"),
+    column("success"),
+    column("failure_reason"),
+    column("ad_domain"),
+    column("session_id"),
+    schema="security",
+)
+
+
+class AuditWriter:
+    """
+    Cola en memoria de intentos de login que se vuelca a `security.audit_login_attempts`.
+
+    `record_login_attempt` solo agrega el evento a un buffer acotado (es seguro
+    llamarlo desde los hilos de autenticación), así el login no espera a la base de
+    datos. Una tarea asyncio vuelca el buffer con un INSERT multi-fila cuando se
+    alcanza `batch_size` o cada `flush_interval`; el trigger de métricas se ejecuta
+    una vez por lote. Si el buffer está lleno los eventos se descartan y se cuentan.
+    Un lote que no se pudo escribir vuelve al inicio del buffer (lo que exceda la
+    capacidad se descarta) y se reintenta con backoff exponencial.
+    """
+
+    # Espera máxima entre reintentos mientras la base de datos no responde
+    MAX_RETRY_SECONDS = 60
+
+    def __init__(self, batch_size: int = settings.AUDIT_BATCH_SIZE,
+                 flush_interval_seconds: float = settings.AUDIT_FLUSH_INTERVAL_SECONDS,
+                 max_queue_size: int = settings.AUDIT_QUEUE_MAX_SIZE):
+        self.batch_size = batch_size
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_queue_size = max_queue_size
+        self._buffer: List[Dict] = []
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def record_login_attempt(self, username: str, success: bool, ip_address: str, user_agent: Optional[str] = None,
+                             failure_reason: Optional[str] = None, session_id: Optional[str] = None):
+        """Encola un intento de login sin bloquear"""
+        event = {
+            "username": username[:100],
+            "ip_address": (ip_address or "unknown")[:45],
+            "user_agent": user_agent,
+            "attempt_time": datetime.now(),
+            "success": bool(success),
+            "failure_reason": failure_reason,
+            "ad_domain": settings.AD_DOMAIN,
+            "session_id": session_id,
+        }
+        with self._lock:
+            if len(self._buffer) >= self.max_queue_size:
+                self.dropped += 1
+                return
+            self._buffer.append(event)
+            batch_ready = len(self._buffer) >= self.batch_size
+
+        if batch_ready and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def start(self):
+        """Inicia la tarea de volcado en el event loop actual (lifespan de la aplicación)"""
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name="audit-writer")
+
+    async def stop(self):
+        """Detiene la tarea y vuelca los eventos pendientes"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._loop = None
+        if not await run_in_threadpool(self.flush):
+            logger.error(f"Se pierden {self.stats()['queued']} eventos de auditoría sin escribir al detener")
+
+    async def _run(self):
+        retry_delay = self.flush_interval_seconds
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if await run_in_threadpool(self.flush):
+                retry_delay = self.flush_interval_seconds
+            else:
+                # Base de datos caída: no reintentar en cada lote lleno
+                await asyncio.sleep(retry_delay)
+                retry_delay = min(retry_delay * 2, self.MAX_RETRY_SECONDS)
+
+    def _take_batch(self) -> List[Dict]:
+        with self._lock:
+            batch, self._buffer = self._buffer[:self.batch_size], self._buffer[self.batch_size:]
+            return batch
+
+    def _requeue(self, batch: List[Dict]):
+        """Devuelve un lote fallido al inicio del buffer, descartando lo que exceda la capacidad"""
+        with self._lock:
+            self._buffer = batch + self._buffer
+            overflow = len(self._buffer) - self.max_queue_size
+            if overflow > 0:
+                del self._buffer[self.max_queue_size:]
+                self.dropped += overflow
+
+    def flush(self) -> bool:
+        """
+        Vuelca el buffer en lotes de `batch_size`
+
+        Returns:
+            False si un lote falló y quedó pendiente de reintento
+        """
+        batch = self._take_batch()
+        while batch:
+            db = db_manager.get_session('main')
+            try:
+                db.execute(insert(audit_login_attempts), batch)
+                db.commit()
+                self.written += len(batch)
+            except Exception as e:
+                db.rollback()
+                self.failed += len(batch)
+                logger.error(f"Error escribiendo {len(batch)} eventos de auditoría, se reintentará: {e}")
+                self._requeue(batch)
+                return False
+            finally:
+                db.close()
+            batch = self._take_batch()
+        return True
+
+    def stats(self) -> Dict:
+        with self._lock:
+            queued = len(self._buffer)
+        return {
+            "queued": queued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "batch_size": self.batch_size,
+            "max_queue_size": self.max_queue_size,
+        }
+
+
+# Instancia global del escritor de auditoría
+audit_writer = AuditWriter()
@@ -0,0 +1,116 @@
+"""
+Contexto de autorización por usuario cacheado en Redis para OneSite
+"""
+
+import json
+import logging
+from typing import Any, Dict, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.redis_client import redis_client
+from app.core.telemetry import record_cache
+from app.db.databases import db_manager
+
+logger = logging.getLogger(__name__)
+
+# Usuario y permisos de empresa activos en una sola consulta
+AUTH_CONTEXT_QUERY = text("""
+    SELECT u.id, u.is_active, u.is_superuser, p.company_code
+    FROM OneSite.[user] u
+    LEFT JOIN OneSite.user_company_permission p
+        ON p.user_id = u.id AND p.is_active = 1
+    WHERE u.username = :username
+""")
+
+
+class AuthContextCache:
+    """
+    Resuelve y cachea el contexto de autorización de un usuario de OneSite.
+
+    El contexto contiene el ID, `is_active`, `is_superuser` y los códigos de empresa
+    permitidos. Se guarda en Redis por username (incluido el resultado "no registrado")
+    y se invalida desde las escrituras de `/users`, de modo que las peticiones
+    autenticadas no consultan `OneSite.[user]` ni `user_company_permission`.
+    """
+
+    KEY_PREFIX = "auth_ctx"
+
+    def __init__(self, client=redis_client, ttl_seconds: int = settings.AUTH_CONTEXT_CACHE_TTL_SECONDS):
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+
+    def _key(self, username: str) -> str:
+        return f"{self.KEY_PREFIX}:{username.lower()}"
+
+    def load(self, db: Session, username: str) -> Dict[str, Any]:
+        """Construye el contexto consultando la base de datos principal"""
+        rows = db.execute(AUTH_CONTEXT_QUERY, {"username": username}).fetchall()
+        if not rows:
+            return {"username": username, "registered": False}
+
+        user_id, is_active, is_superuser, _ = rows[0]
+        return {
+            "username": username,
+            "registered": True,
+            "user_id": user_id,
+            "is_active": bool(is_active),
+            "is_superuser": bool(is_superuser),
+            "company_codes": sorted({row.company_code for row in rows if row.company_code}),
+        }
+
+    def get(self, username: str) -> Optional[Dict[str, Any]]:
+        """Obtiene el contexto desde Redis o None si no está cacheado"""
+        if self.ttl_seconds <= 0:
+            return None
+        try:
+            cached = self.client.get(self._key(username))
+        except Exception as e:
+            logger.warning(f"Caché de contexto de autorización no disponible: {e}")
+            return None
+        record_cache("auth_context", cached is not None)
+        return json.loads(cached) if cached else None
+
+    def resolve(self, username: str, db: Optional[Session] = None) -> Dict[str, Any]:
+        """
+        Retorna el contexto del usuario, consultando la base de datos solo si no está en caché.
+
+        Args:
+            username: Usuario autenticado (claim `sub` del token)
+            db: Sesión opcional; si no se indica se abre una de la base principal
+        """
+        context = self.get(username)
+        if context is not None:
+            return context
+
+        if db is not None:
+            context = self.load(db, username)
+        else:
+            session = db_manager.get_session('main')
+            try:
+                context = self.load(session, username)
+            finally:
+                session.close()
+
+        if self.ttl_seconds > 0:
+            try:
+                self.client.setex(self._key(username), self.ttl_seconds, json.dumps(context))
+            except Exception as e:
+                logger.warning(f"Error guardando contexto de autorización de {username}: {e}")
+        return context
+
+    def invalidate(self, *usernames: Optional[str]) -> None:
+        """Elimina el contexto cacheado de los usuarios indicados"""
+        keys = [self._key(username) for username in usernames if username]
+        if not keys:
+            return
+        try:
+            self.client.delete(*keys)
+        except Exception as e:
+            logger.error(f"Error invalidando contexto de autorización: {e}")
+
+
+# Instancia global de la caché de contexto de autorización
+auth_context_cache = AuthContextCache()
@@ -0,0 +1,161 @@
+"""
+Histogramas de latencia por ruta para el monitoreo de OneSite
+"""
+
+import bisect
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Límites superiores de los buckets en milisegundos (el último es +inf)
+LATENCY_BUCKETS_MS: Tuple[float, ...] = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, float("inf"))
+
+
+class LatencyHistogram:
+    """
+    Histograma de buckets fijos; los percentiles se interpolan dentro del bucket,
+    acotando el primero y el último con el mínimo y el máximo observados
+    """
+
+    __slots__ = ("buckets", "count", "errors", "sum_ms", "min_ms", "max_ms")
+
+    def __init__(self):
+        self.buckets = [0] * len(LATENCY_BUCKETS_MS)
+        self.count = 0
+        self.errors = 0
+        self.sum_ms = 0.0
+        self.min_ms = float("inf")
+        self.max_ms = 0.0
+
+    def observe(self, duration_ms: float, error: bool):
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS_MS, duration_ms)] += 1
+        self.count += 1
+        self.sum_ms += duration_ms
+        self.min_ms = min(self.min_ms, duration_ms)
+        self.max_ms = max(self.max_ms, duration_ms)
+        if error:
+            self.errors += 1
+
+    def percentile(self, fraction: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        cumulative = 0
+        for index, bucket_count in enumerate(self.buckets):
+            if cumulative + bucket_count >= rank and bucket_count:
+                lower = max(LATENCY_BUCKETS_MS[index - 1] if index else 0.0, self.min_ms)
+                upper = min(LATENCY_BUCKETS_MS[index], self.max_ms)
+                return lower + (upper - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.max_ms
+
+    def summary(self) -> Dict:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "avg_ms": round(self.sum_ms / self.count, 3) if self.count else 0.0,
+            "p50_ms": round(self.percentile(0.50), 3),
+            "p95_ms": round(self.percentile(0.95), 3),
+            "p99_ms": round(self.percentile(0.99), 3),
+            "max_ms": round(self.max_ms, 3),
+        }
+
+
+class LatencyRecorder:
+    """
+    Latencia de las peticiones HTTP de este proceso, por método y plantilla de ruta.
+
+    Además del histograma acumulado por ruta, lleva el total y la suma por hora que
+    cada worker vuelca a Redis (`latency:hourly:<fecha>:<hora>`), de donde el
+    recolector de métricas calcula `avg_response_time_ms` de `security_metrics`.
+    """
+
+    HOURLY_KEY_PREFIX = "latency:hourly"
+
+    def __init__(self):
+        self._routes: Dict[Tuple[str, str], LatencyHistogram] = {}
+        self._lock = threading.Lock()
+        self._since = datetime.now()
+        # Conteo y suma por hora aún no volcados a Redis
+        self._pending_hourly: Dict[str, List[float]] = {}
+        # Totales por hora de este proceso (respaldo si Redis no está disponible)
+        self._local_hourly: Dict[str, List[float]] = {}
+
+    @staticmethod
+    def _hour_key(moment: Optional[datetime] = None) -> str:
+        return (moment or datetime.now()).strftime("%Y-%m-%d:%H")
+
+    def record(self, method: str, route: str, status_code: int, duration_ms: float):
+        """Registra una petición terminada"""
+        hour = self._hour_key()
+        with self._lock:
+            histogram = self._routes.get((method, route))
+            if histogram is None:
+                histogram = self._routes[(method, route)] = LatencyHistogram()
+            histogram.observe(duration_ms, status_code >= 500)
+            for totals in (self._pending_hourly, self._local_hourly):
+                entry = totals.setdefault(hour, [0, 0.0])
+                entry[0] += 1
+                entry[1] += duration_ms
+
+    def snapshot(self, route_prefix: Optional[str] = None) -> Dict:
+        """Resumen por ruta, ordenado de mayor a menor p95"""
+        with self._lock:
+            routes = [
+                {"method": method, "route": route, **histogram.summary()}
+                for (method, route), histogram in self._routes.items()
+                if not route_prefix or route.startswith(route_prefix)
+            ]
+        routes.sort(key=lambda item: item["p95_ms"], reverse=True)
+        return {
+            "pid": os.getpid(),
+            "since": self._since.isoformat(),
+            "buckets_ms": [bound for bound in LATENCY_BUCKETS_MS if bound != float("inf")],
+            "routes": routes,
+        }
+
+    def flush_hourly(self, client) -> None:
+        """Vuelca a Redis el conteo y la suma por hora acumulados desde el último volcado"""
+        with self._lock:
+            pending, self._pending_hourly = self._pending_hourly, {}
+            current = self._hour_key()
+            # Los totales locales solo se necesitan para la hora en curso
+            self._local_hourly = {hour: totals for hour, totals in self._local_hourly.items() if hour == current}
+        if not pending:
+            return
+        try:
+            pipe = client.pipeline()
+            for hour, (count, sum_ms) in pending.items():
+                key = f"{self.HOURLY_KEY_PREFIX}:{hour}"
+                pipe.hincrby(key, "count", int(count))
+                pipe.hincrbyfloat(key, "sum_ms", sum_ms)
+                pipe.expire(key, 3 * 3600)
+            pipe.execute()
+        except Exception as e:
+            # Reincorporar lo pendiente para el próximo volcado
+            with self._lock:
+                for hour, (count, sum_ms) in pending.items():
+                    entry = self._pending_hourly.setdefault(hour, [0, 0.0])
+                    entry[0] += count
+                    entry[1] += sum_ms
+            logger.warning(f"Error volcando latencias por hora a Redis: {e}")
+
+    def hourly_average_ms(self, client, moment: Optional[datetime] = None) -> float:
+        """Promedio de la hora (todos los workers vía Redis, o solo este proceso sin Redis)"""
+        hour = self._hour_key(moment)
+        try:
+            totals = client.hgetall(f"{self.HOURLY_KEY_PREFIX}:{hour}")
+            count, sum_ms = int(totals.get("count", 0)), float(totals.get("sum_ms", 0.0))
+        except Exception as e:
+            logger.warning(f"Latencias por hora no disponibles en Redis: {e}")
+            with self._lock:
+                count, sum_ms = self._local_hourly.get(hour, [0, 0.0])
+        return round(sum_ms / count, 3) if count else 0.0
+
+
+# Instancia global del registro de latencias
+latency_recorder = LatencyRecorder()
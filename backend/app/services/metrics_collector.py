@@ -0,0 +1,118 @@
+"""
+Recolector periódico de métricas de seguridad para OneSite
+"""
+
+import asyncio
+import logging
+import uuid
+from typing import Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.redis_client import redis_client
+from app.services.latency_stats import latency_recorder
+from app.services.security_monitor import security_monitor
+
+logger = logging.getLogger(__name__)
+
+# Renueva el lock solo si sigue perteneciendo a este worker
+RENEW_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# Libera el lock solo si sigue perteneciendo a este worker
+RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class MetricsCollector:
+    """
+    Tarea asyncio que toma instantáneas de las métricas de seguridad cada `interval`.
+
+    Todos los workers corren la tarea, pero solo el que tiene el lock
+    `security:metrics:leader` en Redis recolecta, escribe en `security.security_metrics`
+    y publica la instantánea; los demás la sirven desde Redis. El líder renueva el
+    lock en cada ciclo y, si el proceso muere, el lock vence y otro worker lo toma.
+    Si Redis no está disponible no hay líder y nadie persiste: los endpoints
+    recolectan bajo demanda sin escribir en la tabla.
+    En cada ciclo, además, todos los workers vuelcan sus latencias por hora a Redis.
+    """
+
+    LEADER_KEY = "security:metrics:leader"
+
+    def __init__(self, client=redis_client, interval_seconds: int = settings.SECURITY_METRICS_INTERVAL_SECONDS):
+        self.client = client
+        self.interval_seconds = interval_seconds
+        self.lock_ttl_ms = interval_seconds * 2 * 1000
+        self.worker_id = uuid.uuid4().hex
+        self.is_leader = False
+        self._task: Optional[asyncio.Task] = None
+        self._renew_lock = client.register_script(RENEW_LOCK_SCRIPT)
+        self._release_lock = client.register_script(RELEASE_LOCK_SCRIPT)
+
+    def start(self):
+        """Inicia la tarea en el event loop actual (lifespan de la aplicación)"""
+        if self.interval_seconds <= 0 or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run(), name="security-metrics-collector")
+        logger.info(f"Recolector de métricas iniciado (intervalo {self.interval_seconds}s)")
+
+    async def stop(self):
+        """Cancela la tarea y libera el liderazgo"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        if self.is_leader:
+            await run_in_threadpool(self._release)
+
+    async def _run(self):
+        while True:
+            try:
+                # Cada worker aporta sus latencias de la hora al total compartido
+                await run_in_threadpool(latency_recorder.flush_hourly, self.client)
+                if await run_in_threadpool(self._try_lead):
+                    await security_monitor.refresh_snapshot()
+            except Exception as e:
+                logger.error(f"Error en el recolector de métricas: {e}")
+            await asyncio.sleep(self.interval_seconds)
+
+    def _try_lead(self) -> bool:
+        """Renueva o adquiere el liderazgo; retorna si este worker debe recolectar"""
+        try:
+            if self.is_leader and self._renew_lock(keys=[self.LEADER_KEY], args=[self.worker_id, self.lock_ttl_ms]):
+                return True
+            acquired = self.client.set(self.LEADER_KEY, self.worker_id, nx=True, px=self.lock_ttl_ms)
+        except Exception as e:
+            # Sin lock no hay forma de saber si otro worker ya persiste las métricas
+            logger.warning(f"Sin Redis para elegir líder de métricas, se omite la recolección: {e}")
+            self.is_leader = False
+            return False
+
+        if bool(acquired) != self.is_leader:
+            logger.info(f"Worker {self.worker_id[:8]} {'asume' if acquired else 'deja'} el liderazgo de métricas")
+        self.is_leader = bool(acquired)
+        return self.is_leader
+
+    def _release(self):
+        try:
+            self._release_lock(keys=[self.LEADER_KEY], args=[self.worker_id])
+        except Exception as e:
+            logger.warning(f"Error liberando liderazgo de métricas: {e}")
+        self.is_leader = False
+
+
+# Instancia global del recolector de métricas
+metrics_collector = MetricsCollector()
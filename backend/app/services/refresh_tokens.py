@@ -0,0 +1,160 @@
+"""
+Refresh tokens rotativos guardados en Redis para OneSite
+"""
+
+import hashlib
+import json
+import logging
+import secrets
+import uuid
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+from app.core.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+
+class RefreshTokenStore:
+    """
+    Refresh tokens opacos, de un solo uso y revocables.
+
+    Cada login abre una "familia" con vigencia absoluta de `REFRESH_TOKEN_EXPIRE_HOURS`;
+    cada refresh consume el token presentado y emite otro de la misma familia, que
+    hereda el tiempo restante. En Redis solo se guarda el hash SHA-256 del token:
+
+    - `refresh:<hash>`: username, familia y claims del access token
+    - `refresh_family:<familia>`: existe mientras la sesión esté vigente
+    - `refresh_used:<hash>`: tokens ya rotados; si uno se vuelve a presentar se
+      asume robo y se revoca la familia completa
+    - `refresh_user:<username>`: familias del usuario, para revocarlas en bloque
+    """
+
+    KEY_PREFIX = "refresh"
+
+    def __init__(self, client=redis_client, ttl_seconds: int = settings.REFRESH_TOKEN_EXPIRE_HOURS * 3600):
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0
+
+    @staticmethod
+    def _hash(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def _token_key(self, token_hash: str) -> str:
+        return f"{self.KEY_PREFIX}:{token_hash}"
+
+    def _used_key(self, token_hash: str) -> str:
+        return f"{self.KEY_PREFIX}_used:{token_hash}"
+
+    def _family_key(self, family: str) -> str:
+        return f"{self.KEY_PREFIX}_family:{family}"
+
+    def _user_key(self, username: str) -> str:
+        return f"{self.KEY_PREFIX}_user:{username.lower()}"
+
+    def _store(self, pipe, username: str, family: str, claims: Dict[str, Any], ttl: int) -> str:
+        token = secrets.token_urlsafe(48)
+        record = {"username": username, "family": family, "claims": claims}
+        pipe.setex(self._token_key(self._hash(token)), ttl, json.dumps(record))
+        return token
+
+    def issue(self, username: str, claims: Dict[str, Any]) -> Optional[str]:
+        """
+        Abre una familia nueva y retorna su primer refresh token.
+
+        Retorna None si el flujo está deshabilitado o Redis no está disponible; el
+        login sigue funcionando, solo que sin refresh.
+        """
+        if not self.enabled:
+            return None
+        family = uuid.uuid4().hex
+        try:
+            pipe = self.client.pipeline()
+            pipe.setex(self._family_key(family), self.ttl_seconds, username)
+            pipe.sadd(self._user_key(username), family)
+            pipe.expire(self._user_key(username), self.ttl_seconds)
+            token = self._store(pipe, username, family, claims, self.ttl_seconds)
+            pipe.execute()
+            return token
+        except Exception as e:
+            logger.error(f"Error emitiendo refresh token para {username}: {e}")
+            return None
+
+    def consume(self, token: str) -> Optional[Dict[str, Any]]:
+        """
+        Consume un refresh token (uso único).
+
+        Returns:
+            Registro del token (username, familia, claims y segundos restantes de la
+            familia) o None si el token no existe, ya se usó o su sesión fue revocada
+        """
+        if not self.enabled or not token:
+            return None
+        token_hash = self._hash(token)
+        try:
+            # GET + DEL en una transacción: dos peticiones concurrentes con el mismo
+            # token no pueden consumirlo ambas
+            pipe = self.client.pipeline(transaction=True)
+            pipe.get(self._token_key(token_hash))
+            pipe.delete(self._token_key(token_hash))
+            raw, _ = pipe.execute()
+
+            if raw is None:
+                family = self.client.get(self._used_key(token_hash))
+                if family:
+                    logger.warning(f"Reutilización de refresh token detectada; revocando familia {family}")
+                    self.client.delete(self._family_key(family))
+                return None
+
+            record = json.loads(raw)
+            remaining = self.client.ttl(self._family_key(record["family"]))
+            if remaining is None or remaining <= 0:
+                # Familia revocada (logout, reutilización o baja del usuario) o vencida
+                return None
+            self.client.setex(self._used_key(token_hash), remaining, record["family"])
+        except Exception as e:
+            logger.error(f"Error consumiendo refresh token: {e}")
+            return None
+
+        record["remaining_seconds"] = remaining
+        return record
+
+    def reissue(self, record: Dict[str, Any], claims: Dict[str, Any]) -> Optional[str]:
+        """Emite el reemplazo de un token consumido, en la misma familia y con el tiempo restante"""
+        try:
+            pipe = self.client.pipeline()
+            token = self._store(pipe, record["username"], record["family"], claims, record["remaining_seconds"])
+            pipe.execute()
+            return token
+        except Exception as e:
+            logger.error(f"Error emitiendo refresh token para {record['username']}: {e}")
+            return None
+
+    def revoke(self, token: str) -> None:
+        """Revoca la familia del refresh token indicado (logout)"""
+        if not self.enabled or not token:
+            return
+        try:
+            raw = self.client.get(self._token_key(self._hash(token)))
+            if raw:
+                self.client.delete(self._family_key(json.loads(raw)["family"]), self._token_key(self._hash(token)))
+        except Exception as e:
+            logger.error(f"Error revocando refresh token: {e}")
+
+    def revoke_user(self, *usernames: Optional[str]) -> None:
+        """Revoca todas las sesiones de refresh de los usuarios indicados"""
+        for username in filter(None, usernames):
+            try:
+                families = self.client.smembers(self._user_key(username))
+                keys = [self._family_key(family) for family in families]
+                self.client.delete(self._user_key(username), *keys)
+            except Exception as e:
+                logger.error(f"Error revocando refresh tokens de {username}: {e}")
+
+
+# Instancia global del almacén de refresh tokens
+refresh_token_store = RefreshTokenStore()
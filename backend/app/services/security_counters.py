@@ -0,0 +1,70 @@
+"""
+Contadores de seguridad en Redis para el monitoreo de OneSite
+"""
+
+import logging
+import time
+from typing import Dict
+
+from app.core.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+# Tipos de contador y la clave de métricas a la que corresponden
+COUNTER_KINDS: Dict[str, str] = {
+    "rate_limited:ip": "blocked_ips",
+    "rate_limited:user": "blocked_users",
+    "lockouts": "locked_accounts",
+    "blacklisted_tokens": "blacklisted_tokens",
+}
+
+
+class SecurityCounters:
+    """
+    Conteo de elementos activos (IPs/usuarios limitados, cuentas bloqueadas y tokens
+    revocados) sin recorrer el keyspace.
+
+    Cada tipo es un sorted set cuyo score es el momento en que el elemento deja de
+    estar activo: se actualiza donde se escriben los límites, bloqueos y entradas de
+    blacklist, y se cuenta con `ZCOUNT` (O(log N)). Las entradas vencidas se purgan
+    en cada escritura.
+    """
+
+    KEY_PREFIX = "security:active"
+
+    def __init__(self, client=redis_client):
+        self.client = client
+
+    def key(self, kind: str) -> str:
+        """Clave del sorted set de un tipo (también la usan los scripts Lua de bloqueo)"""
+        return f"{self.KEY_PREFIX}:{kind}"
+
+    def mark(self, kind: str, member: str, until: float) -> None:
+        """Registra `member` como activo hasta `until` (timestamp epoch)"""
+        key = self.key(kind)
+        try:
+            pipe = self.client.pipeline()
+            pipe.zremrangebyscore(key, "-inf", time.time())
+            pipe.zadd(key, {member: until})
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Error actualizando contador de seguridad {kind}: {e}")
+
+    def unmark(self, kind: str, member: str) -> None:
+        """Retira `member` antes de su vencimiento"""
+        try:
+            self.client.zrem(self.key(kind), member)
+        except Exception as e:
+            logger.warning(f"Error actualizando contador de seguridad {kind}: {e}")
+
+    def counts(self) -> Dict[str, int]:
+        """Elementos activos por tipo, en un solo round-trip"""
+        now = time.time()
+        pipe = self.client.pipeline(transaction=False)
+        for kind in COUNTER_KINDS:
+            pipe.zcount(self.key(kind), now, "+inf")
+        return {name: count for name, count in zip(COUNTER_KINDS.values(), pipe.execute())}
+
+
+# Instancia global de los contadores de seguridad
+security_counters = SecurityCounters()
@@ -2,275 +2,269 @@
 Servicio de monitoreo de métricas de seguridad para OneSite
 """
 
+import json
 import logging
 import asyncio
+import time
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
-import redis
 from sqlalchemy.orm import Session
 from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
 from app.core.config import settings
-from app.db.base import get_db
+from app.core.redis_client import async_redis_client, redis_client
+from app.db.databases import db_manager
+from app.services.security_counters import security_counters
+from app.services.latency_stats import latency_recorder
 
 logger = logging.getLogger(__name__)
 
+# Métricas de la última hora de las tres tablas de auditoría en un solo round-trip:
+# una agregación condicional por tabla, combinadas con CROSS JOIN
+SECURITY_METRICS_QUERY = text("""
+    SELECT
+        la.total_attempts, la.successful_attempts, la.failed_attempts,
+        la.unique_users, la.unique_ips,
+        lo.active_lockouts, lo.recent_lockouts,
+        bl.active_blacklist, bl.recent_blacklist
+    FROM (
+        SELECT
+            COUNT(*) AS total_attempts,
+            SUM(CASE WHEN success = 1 THEN 1 ELSE 0 END) AS successful_attempts,
+            SUM(CASE WHEN success = 0 THEN 1 ELSE 0 END) AS failed_attempts,
+            COUNT(DISTINCT username) AS unique_users,
+            COUNT(DISTINCT ip_address) AS unique_ips
+        FROM security.audit_login_attempts
+        WHERE attempt_time >= :one_hour_ago
+    ) la
+    CROSS JOIN (
+        SELECT
+            SUM(CASE WHEN is_active = 1 AND lockout_end > GETDATE() THEN 1 ELSE 0 END) AS active_lockouts,
+            SUM(CASE WHEN lockout_start >= :one_hour_ago THEN 1 ELSE 0 END) AS recent_lockouts
+        FROM security.account_lockouts
+        WHERE (is_active = 1 AND lockout_end > GETDATE()) OR lockout_start >= :one_hour_ago
+    ) lo
+    CROSS JOIN (
+        SELECT
+            SUM(CASE WHEN expires_at > GETDATE() THEN 1 ELSE 0 END) AS active_blacklist,
+            SUM(CASE WHEN blacklisted_at >= :one_hour_ago THEN 1 ELSE 0 END) AS recent_blacklist
+        FROM security.token_blacklist
+        WHERE expires_at > GETDATE() OR blacklisted_at >= :one_hour_ago
+    ) bl
+""")
+
+EMPTY_DB_METRICS = {
+    "login_attempts": {
+        "total_attempts": 0,
+        "successful_attempts": 0,
+        "failed_attempts": 0,
+        "success_rate": 0,
+        "unique_users": 0,
+        "unique_ips": 0
+    },
+    "account_lockouts": {"active_lockouts": 0, "recent_lockouts": 0},
+    "token_blacklist": {"active_blacklist": 0, "recent_blacklist": 0},
+}
+
 class SecurityMonitor:
     """Monitor de seguridad para OneSite"""
     
-    def __init__(self):
-        self.redis_client = None
-        self._init_redis()
+    SNAPSHOT_KEY = "security:metrics:snapshot"
     
-    def _init_redis(self):
-        """Inicializar conexión Redis"""
-        try:
-            self.redis_client = redis.Redis(
-                host=settings.REDIS_HOST,
-                port=settings.REDIS_PORT,
-                db=settings.REDIS_DB,
-                password=settings.REDIS_PASSWORD,
-                decode_responses=True
-            )
-            self.redis_client.ping()
-            logger.info("Conexion Redis establecida para monitoreo")
-        except Exception as e:
-            logger.error(f"Error conectando a Redis: {e}")
-            self.redis_client = None
+    def __init__(self, cache_seconds: int = settings.SECURITY_METRICS_CACHE_SECONDS,
+                 snapshot_ttl_seconds: int = settings.SECURITY_METRICS_INTERVAL_SECONDS * 3):
+        # Clientes compartidos: la conexión se establece al primer uso. Los endpoints
+        # leen la instantánea con el asíncrono; la recolección usa el síncrono en hilos
+        self.redis_client = redis_client
+        self.async_redis_client = async_redis_client
+        # Métricas memoizadas: /metrics, /alerts, /health y /summary comparten una
+        # misma lectura por intervalo
+        self.cache_seconds = cache_seconds
+        self.snapshot_ttl_seconds = snapshot_ttl_seconds
+        self._cached_metrics: Optional[Dict] = None
+        self._cached_at = 0.0
+        self._collect_lock = asyncio.Lock()
+        # Última instantánea tomada por este worker (respaldo si Redis no responde)
+        self._local_snapshot: Optional[Dict] = None
+        self._local_snapshot_at = 0.0
     
     async def collect_security_metrics(self) -> Dict:
-        """Recopilar métricas de seguridad"""
-        metrics = {
-            "timestamp": datetime.now().isoformat(),
-            "redis_connected": self.redis_client is not None,
-            "login_attempts": await self._get_login_attempts_metrics(),
-            "rate_limiting": await self._get_rate_limiting_metrics(),
-            "account_lockouts": await self._get_lockout_metrics(),
-            "token_blacklist": await self._get_blacklist_metrics(),
-            "system_health": await self._get_system_health()
-        }
+        """
+        Obtener las métricas de seguridad para los endpoints de monitoreo.
         
-        # Guardar métricas en base de datos
-        await self._save_metrics_to_db(metrics)
+        Sirve la última instantánea del recolector en segundo plano; solo si aún no
+        existe ninguna recolecta en el momento, sin escribir en `security_metrics`.
+        El resultado se memoiza durante `cache_seconds`.
+        """
+        if self._is_cache_fresh():
+            return self._cached_metrics
         
+        async with self._collect_lock:
+            # Otra petición pudo obtenerlas mientras se esperaba el lock
+            if self._is_cache_fresh():
+                return self._cached_metrics
+            
+            metrics = await self._read_snapshot()
+            if metrics is None:
+                metrics = await run_in_threadpool(self._collect_metrics, False)
+            self._cached_metrics = metrics
+            self._cached_at = time.monotonic()
+            return metrics
+    
+    async def refresh_snapshot(self) -> Dict:
+        """Recolecta, persiste y publica una instantánea (la invoca el recolector en segundo plano)"""
+        metrics = await run_in_threadpool(self._take_snapshot)
+        self._cached_metrics = metrics
+        self._cached_at = time.monotonic()
         return metrics
     
-    async def _get_login_attempts_metrics(self) -> Dict:
-        """Obtener métricas de intentos de login"""
+    def _is_cache_fresh(self) -> bool:
+        return self._cached_metrics is not None and time.monotonic() - self._cached_at < self.cache_seconds
+    
+    async def _read_snapshot(self) -> Optional[Dict]:
+        """Última instantánea publicada por el worker líder"""
         try:
-            db = next(get_db())
-            
-            # Métricas de la última hora
-            one_hour_ago = datetime.now() - timedelta(hours=1)
-            
-            # Total de intentos
-            total_attempts = db.execute(text("""
-                SELECT COUNT(*) FROM security.audit_login_attempts 
-                WHERE attempt_time >= :one_hour_ago
-            """), {"one_hour_ago": one_hour_ago}).scalar()
-            
-            # Intentos exitosos
-            successful_attempts = db.execute(text("""
-                SELECT COUNT(*) FROM security.audit_login_attempts 
-                WHERE attempt_time >= :one_hour_ago AND success = 1
-            """), {"one_hour_ago": one_hour_ago}).scalar()
-            
-            # Intentos fallidos
-            failed_attempts = db.execute(text("""
-                SELECT COUNT(*) FROM security.audit_login_attempts 
-                WHERE attempt_time >= :one_hour_ago AND success = 0
-            """), {"one_hour_ago": one_hour_ago}).scalar()
-            
-            # Usuarios únicos
-            unique_users = db.execute(text("""
-                SELECT COUNT(DISTINCT username) FROM security.audit_login_attempts 
-                WHERE attempt_time >= :one_hour_ago
-            """), {"one_hour_ago": one_hour_ago}).scalar()
-            
-            # IPs únicas
-            unique_ips = db.execute(text("""
-                SELECT COUNT(DISTINCT ip_address) FROM security.audit_login_attempts 
-                WHERE attempt_time >= :one_hour_ago
-            """), {"one_hour_ago": one_hour_ago}).scalar()
-            
-            return {
-                "total_attempts": total_attempts or 0,
-                "successful_attempts": successful_attempts or 0,
-                "failed_attempts": failed_attempts or 0,
-                "success_rate": (successful_attempts / total_attempts * 100) if total_attempts > 0 else 0,
-                "unique_users": unique_users or 0,
-                "unique_ips": unique_ips or 0
-            }
-            
+            cached = await self.async_redis_client.get(self.SNAPSHOT_KEY)
+            if cached:
+                return json.loads(cached)
         except Exception as e:
-            logger.error(f"Error obteniendo métricas de login: {e}")
-            return {
-                "total_attempts": 0,
-                "successful_attempts": 0,
-                "failed_attempts": 0,
-                "success_rate": 0,
-                "unique_users": 0,
-                "unique_ips": 0
-            }
+            logger.warning(f"Instantánea de métricas no disponible en Redis: {e}")
+        
+        if self._local_snapshot is not None and time.monotonic() - self._local_snapshot_at < self.snapshot_ttl_seconds:
+            return self._local_snapshot
+        return None
     
-    async def _get_rate_limiting_metrics(self) -> Dict:
-        """Obtener métricas de rate limiting"""
-        if not self.redis_client:
-            return {"active_limits": 0, "blocked_ips": 0, "blocked_users": 0}
+    def _take_snapshot(self) -> Dict:
+        metrics = self._collect_metrics(persist=True)
+        self._local_snapshot = metrics
+        self._local_snapshot_at = time.monotonic()
+        try:
+            self.redis_client.setex(self.SNAPSHOT_KEY, self.snapshot_ttl_seconds, json.dumps(metrics))
+        except Exception as e:
+            logger.warning(f"Error publicando instantánea de métricas: {e}")
+        return metrics
+    
+    def _collect_metrics(self, persist: bool) -> Dict:
+        """Recolección síncrona (Redis y base de datos); se ejecuta fuera del event loop"""
+        redis_health = self._check_redis()
         
+        db = db_manager.get_session('main')
         try:
-            # Contar claves de rate limiting activas
-            rate_limit_keys = self.redis_client.keys("rate_limit:*")
-            active_limits = len(rate_limit_keys)
-            
-            # Contar IPs bloqueadas
-            blocked_ip_keys = self.redis_client.keys("rate_limit:ip:*")
-            blocked_ips = len(blocked_ip_keys)
-            
-            # Contar usuarios bloqueados
-            blocked_user_keys = self.redis_client.keys("rate_limit:user:*")
-            blocked_users = len(blocked_user_keys)
-            
-            return {
-                "active_limits": active_limits,
-                "blocked_ips": blocked_ips,
-                "blocked_users": blocked_users
+            db_health = self._check_database(db)
+            db_metrics = self._get_db_metrics(db) if db_health else EMPTY_DB_METRICS
+            metrics = {
+                "timestamp": datetime.now().isoformat(),
+                "redis_connected": redis_health,
+                **db_metrics,
+                "avg_response_time_ms": latency_recorder.hourly_average_ms(self.redis_client),
+                "rate_limiting": self._get_rate_limiting_metrics(),
+                "system_health": {
+                    "redis_healthy": redis_health,
+                    "database_healthy": db_health,
+                    "overall_health": redis_health and db_health
+                }
             }
             
-        except Exception as e:
-            logger.error(f"Error obteniendo métricas de rate limiting: {e}")
-            return {"active_limits": 0, "blocked_ips": 0, "blocked_users": 0}
+            # Guardar métricas en base de datos
+            if persist and db_health:
+                self._save_metrics_to_db(db, metrics)
+        finally:
+            db.close()
+        
+        return metrics
     
-    async def _get_lockout_metrics(self) -> Dict:
-        """Obtener métricas de bloqueo de cuentas"""
+    def _get_db_metrics(self, db: Session) -> Dict:
+        """Obtener métricas de login, bloqueos y blacklist en una sola consulta"""
         try:
-            db = next(get_db())
-            
-            # Cuentas bloqueadas activas
-            active_lockouts = db.execute(text("""
-                SELECT COUNT(*) FROM security.account_lockouts 
-                WHERE is_active = 1 AND lockout_end > GETDATE()
-            """)).scalar()
-            
-            # Bloqueos en la última hora
             one_hour_ago = datetime.now() - timedelta(hours=1)
-            recent_lockouts = db.execute(text("""
-                SELECT COUNT(*) FROM security.account_lockouts 
-                WHERE lockout_start >= :one_hour_ago
-            """), {"one_hour_ago": one_hour_ago}).scalar()
+            row = db.execute(SECURITY_METRICS_QUERY, {"one_hour_ago": one_hour_ago}).mappings().one()
+            total_attempts = row["total_attempts"] or 0
+            successful_attempts = row["successful_attempts"] or 0
             
             return {
-                "active_lockouts": active_lockouts or 0,
-                "recent_lockouts": recent_lockouts or 0
+                "login_attempts": {
+                    "total_attempts": total_attempts,
+                    "successful_attempts": successful_attempts,
+                    "failed_attempts": row["failed_attempts"] or 0,
+                    "success_rate": (successful_attempts / total_attempts * 100) if total_attempts > 0 else 0,
+                    "unique_users": row["unique_users"] or 0,
+                    "unique_ips": row["unique_ips"] or 0
+                },
+                "account_lockouts": {
+                    "active_lockouts": row["active_lockouts"] or 0,
+                    "recent_lockouts": row["recent_lockouts"] or 0
+                },
+                "token_blacklist": {
+                    "active_blacklist": row["active_blacklist"] or 0,
+                    "recent_blacklist": row["recent_blacklist"] or 0
+                }
             }
             
         except Exception as e:
-            logger.error(f"Error obteniendo métricas de bloqueo: {e}")
-            return {"active_lockouts": 0, "recent_lockouts": 0}
+            logger.error(f"Error obteniendo métricas de seguridad: {e}")
+            db.rollback()
+            return EMPTY_DB_METRICS
     
-    async def _get_blacklist_metrics(self) -> Dict:
-        """Obtener métricas de blacklist de tokens"""
+    def _get_rate_limiting_metrics(self) -> Dict:
+        """Obtener métricas de rate limiting"""
         try:
-            db = next(get_db())
-            
-            # Tokens en blacklist activos
-            active_blacklist = db.execute(text("""
-                SELECT COUNT(*) FROM security.token_blacklist 
-                WHERE expires_at > GETDATE()
-            """)).scalar()
-            
-            # Tokens agregados en la última hora
-            one_hour_ago = datetime.now() - timedelta(hours=1)
-            recent_blacklist = db.execute(text("""
-                SELECT COUNT(*) FROM security.token_blacklist 
-                WHERE blacklisted_at >= :one_hour_ago
-            """), {"one_hour_ago": one_hour_ago}).scalar()
-            
+            # Contadores mantenidos al escribir límites, bloqueos y blacklist:
+            # un solo round-trip de ZCOUNTs, sin recorrer el keyspace
+            counts = security_counters.counts()
             return {
-                "active_blacklist": active_blacklist or 0,
-                "recent_blacklist": recent_blacklist or 0
+                "active_limits": counts["blocked_ips"] + counts["blocked_users"],
+                **counts
             }
             
         except Exception as e:
-            logger.error(f"Error obteniendo métricas de blacklist: {e}")
-            return {"active_blacklist": 0, "recent_blacklist": 0}
+            logger.error(f"Error obteniendo métricas de rate limiting: {e}")
+            return {"active_limits": 0, "blocked_ips": 0, "blocked_users": 0, "locked_accounts": 0, "blacklisted_tokens": 0}
     
-    async def _get_system_health(self) -> Dict:
-        """Obtener métricas de salud del sistema"""
+    def _check_redis(self) -> bool:
+        """Verificar Redis"""
         try:
-            # Verificar Redis
-            redis_health = False
-            if self.redis_client:
-                try:
-                    self.redis_client.ping()
-                    redis_health = True
-                except:
-                    redis_health = False
-            
-            # Verificar base de datos
-            db_health = False
-            try:
-                db = next(get_db())
-                db.execute(text("SELECT 1"))
-                db_health = True
-            except:
-                db_health = False
-            
-            return {
-                "redis_healthy": redis_health,
-                "database_healthy": db_health,
-                "overall_health": redis_health and db_health
-            }
-            
+            self.redis_client.ping()
+            return True
+        except Exception:
+            return False
+    
+    def _check_database(self, db: Session) -> bool:
+        """Verificar base de datos"""
+        try:
+            db.execute(text("SELECT 1"))
+            return True
         except Exception as e:
-            logger.error(f"Error obteniendo salud del sistema: {e}")
-            return {
-                "redis_healthy": False,
-                "database_healthy": False,
-                "overall_health": False
-            }
+            logger.error(f"Error verificando base de datos: {e}")
+            return False
     
-    async def _save_metrics_to_db(self, metrics: Dict):
-        """Guardar métricas en base de datos"""
+    def _save_metrics_to_db(self, db: Session, metrics: Dict):
+        """Guardar métricas de la hora actual en base de datos"""
         try:
-            db = next(get_db())
-            
-            # Insertar métricas en la tabla security_metrics
-            current_date = datetime.now().date()
-            current_hour = datetime.now().hour
+            params = {
+                "current_date": datetime.now().date(),
+                "current_hour": datetime.now().hour,
+                "total_logins": metrics["login_attempts"]["total_attempts"],
+                "successful_logins": metrics["login_attempts"]["successful_attempts"],
+                "failed_logins": metrics["login_attempts"]["failed_attempts"],
+                "account_lockouts": metrics["account_lockouts"]["active_lockouts"],
+                "unique_users": metrics["login_attempts"]["unique_users"],
+                "avg_response_time": round(metrics["avg_response_time_ms"])  # Columna INT
+            }
             
-            # Verificar si ya existe registro para esta hora
-            existing = db.execute(text("""
-                SELECT id FROM security.security_metrics 
+            # Actualizar el registro de la hora y crearlo solo si aún no existe
+            updated = db.execute(text("""
+                UPDATE security.security_metrics 
+                SET 
+                    total_logins = :total_logins,
+                    successful_logins = :successful_logins,
+                    failed_logins = :failed_logins,
+                    account_lockouts = :account_lockouts,
+                    unique_users = :unique_users,
+                    avg_response_time_ms = :avg_response_time
                 WHERE metric_date = :current_date AND metric_hour = :current_hour
-            """), {
-                "current_date": current_date,
-                "current_hour": current_hour
-            }).fetchone()
+            """), params)
             
-            if existing:
-                # Actualizar registro existente
-                db.execute(text("""
-                    UPDATE security.security_metrics 
-                    SET 
-                        total_logins = :total_logins,
-                        successful_logins = :successful_logins,
-                        failed_logins = :failed_logins,
-                        account_lockouts = :account_lockouts,
-                        unique_users = :unique_users,
-                        avg_response_time_ms = :avg_response_time
-                    WHERE metric_date = :current_date AND metric_hour = :current_hour
-                """), {
-                    "total_logins": metrics["login_attempts"]["total_attempts"],
-                    "successful_logins": metrics["login_attempts"]["successful_attempts"],
-                    "failed_logins": metrics["login_attempts"]["failed_attempts"],
-                    "account_lockouts": metrics["account_lockouts"]["active_lockouts"],
-                    "unique_users": metrics["login_attempts"]["unique_users"],
-                    "avg_response_time": 0,  # TODO: Implementar medición de tiempo de respuesta
-                    "current_date": current_date,
-                    "current_hour": current_hour
-                })
-            else:
-                # Crear nuevo registro
+            if updated.rowcount == 0:
                 db.execute(text("""
                     INSERT INTO security.security_metrics (
                         metric_date, metric_hour, total_logins, successful_logins,
@@ -279,22 +273,14 @@ class SecurityMonitor:
                         :current_date, :current_hour, :total_logins, :successful_logins,
                         :failed_logins, :account_lockouts, :unique_users, :avg_response_time
                     )
-                """), {
-                    "current_date": current_date,
-                    "current_hour": current_hour,
-                    "total_logins": metrics["login_attempts"]["total_attempts"],
-                    "successful_logins": metrics["login_attempts"]["successful_attempts"],
-                    "failed_logins": metrics["login_attempts"]["failed_attempts"],
-                    "account_lockouts": metrics["account_lockouts"]["active_lockouts"],
-                    "unique_users": metrics["login_attempts"]["unique_users"],
-                    "avg_response_time": 0
-                })
+                """), params)
             
             db.commit()
             logger.debug("Métricas guardadas en base de datos")
             
         except Exception as e:
             logger.error(f"Error guardando métricas en DB: {e}")
+            db.rollback()
     
     async def get_security_alerts(self) -> List[Dict]:
         """Obtener alertas de seguridad"""
@@ -361,9 +347,11 @@ class SecurityMonitor:
     
     async def cleanup_old_data(self, days_to_keep: int = 90):
         """Limpiar datos antiguos"""
+        await run_in_threadpool(self._cleanup_old_data, days_to_keep)
+    
+    def _cleanup_old_data(self, days_to_keep: int):
+        db = db_manager.get_session('main')
         try:
-            db = next(get_db())
-            
             # Ejecutar procedimiento de limpieza
             db.execute(text("EXEC security.sp_cleanup_old_records :days_to_keep"), {
                 "days_to_keep": days_to_keep
@@ -374,6 +362,8 @@ class SecurityMonitor:
             
         except Exception as e:
             logger.error(f"Error limpiando datos antiguos: {e}")
+        finally:
+            db.close()
 
 # Instancia global del monitor
 security_monitor = SecurityMonitor() 
\ No newline at end of file
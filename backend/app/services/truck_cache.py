@@ -0,0 +1,118 @@
+"""
+Caché de listados de trucks en Redis para OneSite
+"""
+
+import hashlib
+import json
+import logging
+from datetime import date
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from app.core.config import settings
+from app.core.redis_client import redis_client
+from app.core.telemetry import record_cache
+
+logger = logging.getLogger(__name__)
+
+
+class TruckListCache:
+    """
+    Caché read-through de `GET /trucks` con invalidación por versión.
+
+    Cada listado se guarda bajo una clave que incluye la versión del ámbito
+    (empresa, almacén) que consulta. Las escrituras incrementan la versión de los
+    ámbitos afectados, lo que deja obsoletas todas sus claves en O(1) sin recorrer
+    el keyspace; las entradas viejas expiran solas por TTL.
+    """
+
+    VERSION_PREFIX = "trucks:ver"
+    LIST_PREFIX = "trucks:list"
+
+    def __init__(self, client=redis_client, ttl_seconds: int = settings.TRUCKS_CACHE_TTL_SECONDS):
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0
+
+    @staticmethod
+    def _scope(id_empresa: Optional[int], id_warehouse: Optional[int]) -> str:
+        """Ámbito de versión: '*' representa 'cualquier valor'"""
+        return f"{id_empresa or '*'}:{id_warehouse or '*'}"
+
+    def build_key(self, filters: Dict[str, Any], page: Dict[str, Any]) -> Optional[str]:
+        """
+        Construye la clave de caché para los filtros y la página solicitada.
+
+        Returns:
+            La clave, o None si la caché está deshabilitada o Redis no responde
+        """
+        if not self.enabled:
+            return None
+        scope = self._scope(filters.get("id_empresa"), filters.get("id_warehouse"))
+        try:
+            version = self.client.get(f"{self.VERSION_PREFIX}:{scope}") or "0"
+        except Exception as e:
+            logger.warning(f"Caché de trucks no disponible: {e}")
+            return None
+
+        normalized = {
+            key: value.isoformat() if isinstance(value, date) else value
+            for key, value in {**filters, **page}.items()
+            if value is not None
+        }
+        digest = hashlib.sha1(json.dumps(normalized, sort_keys=True).encode("utf-8")).hexdigest()
+        return f"{self.LIST_PREFIX}:{scope}:v{version}:{digest}"
+
+    def get(self, key: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Obtiene un listado cacheado ({"items": ..., "next_cursor": ...})"""
+        if not key:
+            return None
+        try:
+            cached = self.client.get(key)
+        except Exception as e:
+            logger.warning(f"Error leyendo caché de trucks: {e}")
+            return None
+        record_cache("trucks_list", cached is not None)
+        return json.loads(cached) if cached else None
+
+    def set(self, key: Optional[str], value: Dict[str, Any]) -> None:
+        """Guarda un listado serializado con el TTL configurado"""
+        if not key:
+            return
+        try:
+            self.client.setex(key, self.ttl_seconds, json.dumps(value, separators=(",", ":")))
+        except Exception as e:
+            logger.warning(f"Error guardando caché de trucks: {e}")
+
+    def invalidate(self, pairs: Iterable[Tuple[Optional[int], Optional[int]]]) -> None:
+        """
+        Invalida los listados afectados por escrituras en los pares (empresa, almacén).
+
+        Se incrementan las versiones del par exacto, de la empresa, del almacén y
+        la global, que son los únicos ámbitos cuyas consultas pueden incluir la fila.
+        """
+        if not self.enabled:
+            return
+        scopes = set()
+        for id_empresa, id_warehouse in pairs:
+            scopes.update({
+                self._scope(id_empresa, id_warehouse),
+                self._scope(id_empresa, None),
+                self._scope(None, id_warehouse),
+                self._scope(None, None),
+            })
+        if not scopes:
+            return
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            for scope in scopes:
+                pipe.incr(f"{self.VERSION_PREFIX}:{scope}")
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Error invalidando caché de trucks: {e}")
+
+
+# Instancia global de la caché de listados de trucks
+truck_list_cache = TruckListCache()
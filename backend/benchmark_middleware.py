@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Benchmark del costo por petición de los middlewares de OneSite
+
+Compara, sobre una aplicación mínima y en el mismo proceso (sin red):
+  - sin middleware (línea base)
+  - antes: las tres capas `@app.middleware("http")` (CORS, headers de seguridad y logging)
+  - después: `OneSiteMiddleware` (ASGI puro)
+
+Uso: python benchmark_middleware.py [peticiones]
+"""
+
+import asyncio
+import contextlib
+import logging
+import os
+import sys
+import tempfile
+import time
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import Response, StreamingResponse
+
+from app.core.config import settings
+from app.core.logging_config import setup_logging, stop_logging
+from app.core.middleware import OneSiteMiddleware, record_latency
+
+REQUESTS = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def read_item(item_id: int):
+        return {"id": item_id, "name": "truck"}
+
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            for _ in range(10):
+                yield b"x" * 1024
+        return StreamingResponse(chunks(), media_type="application/octet-stream")
+
+    return app
+
+
+def build_legacy_app() -> FastAPI:
+    """Réplica de las tres capas BaseHTTPMiddleware que tenía main.py"""
+    app = build_app()
+
+    @app.middleware("http")
+    async def ultra_simple_cors(request: Request, call_next):
+        if request.method == "OPTIONS":
+            response = Response(status_code=200, content="")
+            response.headers["Access-Control-Allow-Origin"] = "*"
+            response.headers["Access-Control-Allow-Methods"] = "*"
+            response.headers["Access-Control-Allow-Headers"] = "*"
+            response.headers["Access-Control-Allow-Credentials"] = "true"
+            response.headers["Access-Control-Max-Age"] = "86400"
+            return response
+        response = await call_next(request)
+        response.headers["Access-Control-Allow-Origin"] = "*"
+        response.headers["Access-Control-Allow-Credentials"] = "true"
+        response.headers["Access-Control-Expose-Headers"] = "X-Next-Cursor, X-Total-Count, X-RateLimit-Remaining, Retry-After"
+        return response
+
+    @app.middleware("http")
+    async def add_security_headers(request: Request, call_next):
+        start_time = time.time()
+        response = await call_next(request)
+        response.headers["X-Frame-Options"] = "DENY"
+        response.headers["X-Content-Type-Options"] = "nosniff"
+        response.headers["X-XSS-Protection"] = "1; mode=block"
+        response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
+        response.headers["Content-Security-Policy"] = "default-src 'self'; script-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net; style-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net; img-src 'self' data: https://fastapi.tiangolo.com; font-src 'self' https://cdn.jsdelivr.net"
+        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
+        response.headers["Permissions-Policy"] = "geolocation=(), microphone=(), camera=()"
+        response.headers["X-Process-Time"] = str(time.time() - start_time)
+        return response
+
+    @app.middleware("http")
+    async def log_requests(request: Request, call_next):
+        start_time = time.time()
+        client_ip = request.client.host if request.client else "unknown"
+        try:
+            response = await call_next(request)
+        except Exception:
+            record_latency(request.scope, 500, time.time() - start_time)
+            raise
+        process_time = time.time() - start_time
+        record_latency(request.scope, response.status_code, process_time)
+        print(f"{client_ip} - {request.method} {request.url.path} - {response.status_code} - {process_time:.3f}s")
+        return response
+
+    return app
+
+
+def build_asgi_app() -> FastAPI:
+    app = build_app()
+    app.add_middleware(OneSiteMiddleware)
+    return app
+
+
+async def measure(app, path: str, requests: int) -> float:
+    """Microsegundos promedio por petición"""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(200):
+            await client.get(path)
+        started = time.perf_counter()
+        for _ in range(requests):
+            response = await client.get(path)
+            assert response.status_code == 200
+        return (time.perf_counter() - started) / requests * 1_000_000
+
+
+async def main():
+    # El access log de OneSiteMiddleware pasa por la cola de logging, como en producción
+    log_dir = tempfile.mkdtemp(prefix="onesite-bench-")
+    settings.LOG_FILE = os.path.join(log_dir, "onesite.log")
+    settings.ACCESS_LOG_FILE = os.path.join(log_dir, "onesite-access.log")
+    setup_logging()
+    # Los registros de httpx (cliente del benchmark) no forman parte de la medición
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    variants = [
+        ("sin middleware", build_app()),
+        ("antes (3 x BaseHTTPMiddleware)", build_legacy_app()),
+        ("después (OneSiteMiddleware)", build_asgi_app()),
+    ]
+    print(f"{REQUESTS} peticiones por caso\n")
+    for path in ("/items/7", "/stream"):
+        print(f"GET {path}")
+        baseline = None
+        for name, app in variants:
+            # La variante anterior imprime una línea por petición: se descarta
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                per_request = await measure(app, path, REQUESTS)
+            if baseline is None:
+                baseline = per_request
+                print(f"  {name:<32} {per_request:8.1f} µs/petición")
+            else:
+                print(f"  {name:<32} {per_request:8.1f} µs/petición  (+{per_request - baseline:.1f} µs)")
+        print()
+    stop_logging()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
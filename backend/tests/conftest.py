@@ -0,0 +1,78 @@
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+import fakeredis
+import pytest
+from sqlalchemy import BigInteger, Values, create_engine, event
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# Añadir el directorio raíz del proyecto al sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Configuración mínima para importar la aplicación sin un archivo .env
+# (no se abre ninguna conexión real a SQL Server, Redis ni AD)
+for name, value in {
+    "SECRET_KEY": "onesite-tests-secret-key-onesite-tests",
+    "DB_SERVER": "localhost", "DB_NAME": "onesite", "DB_USER": "test", "DB_PASSWORD": "test",
+    "SATURNO13_SERVER": "localhost", "SATURNO13_DB": "saturno13",
+    "SATURNO13_USER": "test", "SATURNO13_PASSWORD": "test",
+    "JUPITER12MIA_SERVER": "localhost", "JUPITER12MIA_DB": "jupiter12mia",
+    "JUPITER12MIA_USER": "test", "JUPITER12MIA_PASSWORD": "test",
+    "LOG_FILE": os.path.join(tempfile.gettempdir(), "onesite-tests.log"),
+    "ACCESS_LOG_FILE": os.path.join(tempfile.gettempdir(), "onesite-tests-access.log"),
+}.items():
+    os.environ.setdefault(name, value)
+
+# Los modelos se registran en el orden de la aplicación (app.db.base importa todos)
+from app.db.base import Base  # noqa: E402
+
+
+@pytest.fixture
+def fake_redis():
+    """Redis en memoria (fakeredis con soporte de scripts Lua)"""
+    client = fakeredis.FakeRedis(decode_responses=True)
+    yield client
+    client.flushall()
+
+
+@compiles(BigInteger, "sqlite")
+def _sqlite_big_integer(type_, compiler, **kw):
+    # SQLite solo autoincrementa columnas INTEGER PRIMARY KEY
+    return "INTEGER"
+
+
+@compiles(Values, "sqlite")
+def _sqlite_values(element, compiler, asfrom=False, from_linter=None, **kw):
+    # SQLite no admite `(VALUES ...) AS v (columnas)`: se nombran las columnas con un SELECT
+    rendered = compiler._render_values(element, **kw)
+    if not asfrom:
+        return rendered
+    columns = ", ".join(f"column{position} AS {compiler.preparer.quote(c.name)}" for position, c in enumerate(element.columns, 1))
+    return f"(SELECT {columns} FROM ({rendered})) AS {compiler.preparer.quote(element.name)}"
+
+
+@pytest.fixture
+def db_session():
+    """Sesión sobre SQLite en memoria con las tablas de los modelos (sin esquemas de SQL Server)"""
+    schemas = {table.schema for table in Base.metadata.tables.values() if table.schema}
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+        execution_options={"schema_translate_map": {schema: None for schema in schemas}},
+    )
+
+    @event.listens_for(engine, "connect")
+    def _register_functions(dbapi_connection, connection_record):
+        # Función de SQL Server usada en los valores por defecto de OneSite
+        dbapi_connection.create_function("getutcdate", 0, lambda: datetime.utcnow().isoformat(" "))
+
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
@@ -0,0 +1,126 @@
+import pytest
+import redis
+
+from app.core import security
+from app.core.security import AccountLockout
+from app.services.security_counters import security_counters
+
+
+@pytest.fixture
+def lockout(fake_redis, monkeypatch):
+    monkeypatch.setattr(security, "redis_client", fake_redis)
+    monkeypatch.setattr(security_counters, "client", fake_redis)
+    monkeypatch.setattr(security.settings, "MAX_LOGIN_ATTEMPTS", 3)
+    monkeypatch.setattr(security.settings, "ACCOUNT_LOCKOUT_MINUTES", 30)
+    return AccountLockout()
+
+
+def test_locks_at_threshold_with_lockout_ttl(lockout, fake_redis):
+    assert lockout.record_failed_attempt("ana") is False
+    assert lockout.record_failed_attempt("ana") is False
+    assert fake_redis.get("attempts:ana") == "2"
+    assert 0 < fake_redis.ttl("attempts:ana") <= AccountLockout.ATTEMPTS_TTL_SECONDS
+
+    # El intento que alcanza el máximo bloquea, pero aún no encontró la cuenta bloqueada
+    assert lockout.record_failed_attempt("ana") is False
+
+    assert lockout.is_account_locked("ana")
+    assert 30 * 60 - 5 <= fake_redis.ttl("lockout:ana") <= 30 * 60
+    assert not fake_redis.exists("attempts:ana")
+    assert security_counters.counts()["locked_accounts"] == 1
+
+
+def test_locked_account_is_not_counted_again(lockout, fake_redis):
+    fake_redis.set("lockout:ana", "locked", ex=60)
+
+    assert lockout.record_failed_attempt("ana") is True
+
+    assert not fake_redis.exists("attempts:ana")
+    assert security_counters.counts()["locked_accounts"] == 0
+
+
+def test_reset_clears_attempts_unless_locked(lockout, fake_redis):
+    lockout.record_failed_attempt("ana")
+
+    assert lockout.reset_failed_attempts("ana") is False
+    assert not fake_redis.exists("attempts:ana")
+
+    fake_redis.set("lockout:ana", "locked", ex=60)
+    fake_redis.set("attempts:ana", 1)
+
+    assert lockout.reset_failed_attempts("ana") is True
+    assert fake_redis.get("attempts:ana") == "1"
+
+
+def test_redis_errors_fail_open(lockout, monkeypatch):
+    def unavailable(*args, **kwargs):
+        raise redis.ConnectionError("sin redis")
+
+    monkeypatch.setattr(lockout, "_record_failed_attempt", unavailable)
+    monkeypatch.setattr(lockout, "_reset_failed_attempts", unavailable)
+
+    assert lockout.record_failed_attempt("ana") is False
+    assert lockout.reset_failed_attempts("ana") is False
+
+
+def test_lockout_info_reads_state_in_one_pipeline(lockout, fake_redis):
+    assert lockout.get_account_lockout_info("ana") == {
+        "is_locked": False, "failed_attempts": 0, "lock_remaining_seconds": 0,
+        "attempts_remaining_seconds": 0, "max_attempts": 3, "lockout_duration_minutes": 30,
+    }
+
+    lockout.record_failed_attempt("ana")
+    info = lockout.get_account_lockout_info("ana")
+    assert (info["is_locked"], info["failed_attempts"]) == (False, 1)
+    assert info["attempts_remaining_seconds"] > 0
+
+    lockout.record_failed_attempt("ana")
+    lockout.record_failed_attempt("ana")
+    info = lockout.get_account_lockout_info("ana")
+    assert (info["is_locked"], info["failed_attempts"]) == (True, 0)
+    assert info["lock_remaining_seconds"] > 0
+
+
+class CountingLockout:
+    """Envuelve el AccountLockout real contando los round-trips por login"""
+
+    def __init__(self, lockout):
+        self.lockout = lockout
+        self.calls = []
+
+    def __getattr__(self, name):
+        self.calls.append(name)
+        return getattr(self.lockout, name)
+
+
+@pytest.fixture
+def ldap_auth(lockout, monkeypatch):
+    auth = security.LDAPAuth.__new__(security.LDAPAuth)
+    auth.account_lockout = CountingLockout(lockout)
+    auth.secure_logger = security.SecureLogger()
+    monkeypatch.setattr(security.ad_profile_cache, "get", lambda username: {"roles": []})
+    monkeypatch.setattr(auth, "_close_connection", lambda conn: None)
+    return auth
+
+
+def test_authenticate_uses_one_lockout_call_per_login(ldap_auth, monkeypatch):
+    monkeypatch.setattr(ldap_auth, "_bind_user", lambda user_dn, password: None)
+
+    for _ in range(3):
+        assert ldap_auth.authenticate("ana", "mala")["error"] == "invalid_credentials"
+    assert ldap_auth.authenticate("ana", "mala")["error"] == "account_locked"
+    assert ldap_auth.account_lockout.calls == ["record_failed_attempt"] * 4
+
+    # Con la cuenta bloqueada, ni siquiera la contraseña correcta entra
+    monkeypatch.setattr(ldap_auth, "_bind_user", lambda user_dn, password: object())
+    assert ldap_auth.authenticate("ana", "buena")["error"] == "account_locked"
+    assert ldap_auth.account_lockout.calls[-1] == "reset_failed_attempts"
+
+
+def test_authenticate_success_resets_attempts(ldap_auth, fake_redis, monkeypatch):
+    monkeypatch.setattr(ldap_auth, "_bind_user", lambda user_dn, password: None)
+    ldap_auth.authenticate("ana", "mala")
+    monkeypatch.setattr(ldap_auth, "_bind_user", lambda user_dn, password: object())
+
+    assert ldap_auth.authenticate("ana", "buena") == {"roles": [], "username": "ana"}
+    assert not fake_redis.exists("attempts:ana")
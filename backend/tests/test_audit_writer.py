@@ -0,0 +1,148 @@
+import asyncio
+
+import pytest
+
+from app.services import audit_writer as audit_writer_module
+from app.services.audit_writer import AuditWriter
+
+
+class FakeDatabase:
+    """Sesiones falsas que registran los lotes insertados; `failures` lotes fallan primero"""
+
+    def __init__(self):
+        self.batches = []
+        self.failures = 0
+
+    def get_session(self, name):
+        return self
+
+    def execute(self, statement, rows):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("base de datos caída")
+        self.batches.append([row["username"] for row in rows])
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def database(monkeypatch):
+    database = FakeDatabase()
+    monkeypatch.setattr(audit_writer_module, "db_manager", database)
+    return database
+
+
+def record(writer, *usernames):
+    for username in usernames:
+        writer.record_login_attempt(username, False, "10.0.0.1")
+
+
+def run_writer(writer, scenario):
+    async def main():
+        writer.start()
+        try:
+            await scenario()
+        finally:
+            await writer.stop()
+    asyncio.run(main())
+
+
+def test_full_batch_is_flushed_before_the_interval(database):
+    writer = AuditWriter(batch_size=3, flush_interval_seconds=30, max_queue_size=10)
+
+    async def scenario():
+        record(writer, "a", "b", "c")
+        await asyncio.sleep(0.2)
+        assert database.batches == [["a", "b", "c"]]
+        # Un lote incompleto espera al intervalo
+        record(writer, "d")
+        await asyncio.sleep(0.2)
+        assert database.batches == [["a", "b", "c"]]
+
+    run_writer(writer, scenario)
+    # Al detenerse se vuelca lo pendiente
+    assert database.batches == [["a", "b", "c"], ["d"]]
+    assert writer.stats()["written"] == 4
+
+
+def test_partial_batch_is_flushed_after_the_interval(database):
+    writer = AuditWriter(batch_size=100, flush_interval_seconds=0.05, max_queue_size=10)
+
+    async def scenario():
+        record(writer, "a")
+        await asyncio.sleep(0.2)
+        assert database.batches == [["a"]]
+
+    run_writer(writer, scenario)
+
+
+def test_full_queue_drops_new_events(database):
+    writer = AuditWriter(batch_size=10, flush_interval_seconds=30, max_queue_size=2)
+
+    record(writer, "a", "b", "c")
+
+    assert writer.stats()["queued"] == 2
+    assert writer.dropped == 1
+    writer.flush()
+    assert database.batches == [["a", "b"]]
+
+
+def test_failed_batch_is_requeued_within_capacity(database):
+    writer = AuditWriter(batch_size=2, flush_interval_seconds=30, max_queue_size=3)
+    record(writer, "a", "b", "c")
+    database.failures = 1
+
+    assert writer.flush() is False
+
+    # El lote vuelve al inicio; no se pierde nada mientras haya capacidad
+    assert writer.stats()["queued"] == 3
+    record(writer, "d")
+    assert writer.dropped == 1
+
+    assert writer.flush() is True
+    assert database.batches == [["a", "b"], ["c"]]
+    stats = writer.stats()
+    assert (stats["queued"], stats["written"], stats["dropped"], stats["failed"]) == (0, 3, 1, 2)
+
+
+def test_requeue_overflow_is_counted_as_dropped(database):
+    writer = AuditWriter(batch_size=2, flush_interval_seconds=30, max_queue_size=3)
+    record(writer, "a", "b", "c")
+    batch = writer._take_batch()
+    record(writer, "d", "e")
+
+    writer._requeue(batch)
+
+    assert [event["username"] for event in writer._buffer] == ["a", "b", "c"]
+    assert writer.dropped == 2
+
+
+def test_writer_retries_with_backoff(database, monkeypatch):
+    writer = AuditWriter(batch_size=1, flush_interval_seconds=0.01, max_queue_size=10)
+    database.failures = 3
+    delays = []
+    sleep = asyncio.sleep
+
+    async def recording_sleep(delay):
+        delays.append(delay)
+        await sleep(0)
+    monkeypatch.setattr(audit_writer_module.asyncio, "sleep", recording_sleep)
+
+    async def scenario():
+        record(writer, "a")
+        for _ in range(100):
+            if database.batches:
+                break
+            await sleep(0.01)
+        assert database.batches == [["a"]]
+
+    run_writer(writer, scenario)
+    assert delays == [0.01, 0.02, 0.04]
+    assert writer.failed == 3
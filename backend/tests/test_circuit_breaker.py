@@ -0,0 +1,115 @@
+import pytest
+
+from app.core import circuit_breaker as circuit_breaker_module
+from app.core.circuit_breaker import CircuitBreaker
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(circuit_breaker_module.time, "monotonic", clock)
+    return clock
+
+
+@pytest.fixture
+def breaker(clock):
+    return CircuitBreaker("test", failure_threshold=2, reset_seconds=10)
+
+
+def fail(breaker):
+    breaker.record(breaker.allow(), 1.0, failed=True)
+
+
+def open_circuit(breaker):
+    fail(breaker)
+    fail(breaker)
+    assert breaker.state == "open"
+
+
+def test_opens_after_consecutive_failures(breaker):
+    fail(breaker)
+    breaker.record(breaker.allow(), 1.0, failed=False)
+    fail(breaker)
+    assert breaker.state == "closed"
+
+    fail(breaker)
+
+    assert breaker.state == "open"
+    assert breaker.allow() is None
+    assert breaker.stats()["short_circuited"] == 1
+
+
+def test_half_open_trial_success_closes(breaker, clock):
+    open_circuit(breaker)
+    clock.now += 10
+
+    trial = breaker.allow()
+    assert trial is not None
+    assert breaker.state == "half_open"
+    # Solo una llamada de prueba a la vez
+    assert breaker.allow() is None
+
+    breaker.record(trial, 1.0, failed=False)
+
+    assert breaker.state == "closed"
+    assert breaker.allow() is not None
+
+
+def test_half_open_trial_failure_reopens(breaker, clock):
+    open_circuit(breaker)
+    clock.now += 10
+
+    breaker.record(breaker.allow(), 1.0, failed=True)
+
+    assert breaker.state == "open"
+    assert breaker.allow() is None
+    assert breaker.stats()["opened_count"] == 2
+
+
+def test_stale_success_does_not_close_open_circuit(breaker):
+    in_flight = breaker.allow()
+    open_circuit(breaker)
+
+    breaker.record(in_flight, 1.0, failed=False)
+
+    assert breaker.state == "open"
+    assert breaker.allow() is None
+    assert breaker.stats()["calls"] == 3
+
+
+def test_stale_success_does_not_release_trial_slot(breaker, clock):
+    in_flight = breaker.allow()
+    open_circuit(breaker)
+    clock.now += 10
+    trial = breaker.allow()
+
+    breaker.record(in_flight, 1.0, failed=False)
+
+    assert breaker.state == "half_open"
+    assert breaker.allow() is None
+
+    breaker.record(trial, 1.0, failed=True)
+    assert breaker.state == "open"
+
+
+def test_stuck_trial_gives_up_its_slot(breaker, clock):
+    open_circuit(breaker)
+    clock.now += 10
+    stuck = breaker.allow()
+    clock.now += 10
+
+    trial = breaker.allow()
+
+    assert trial is not None and trial != stuck
+    breaker.record(stuck, 1.0, failed=False)
+    assert breaker.state == "half_open"
+    breaker.record(trial, 1.0, failed=False)
+    assert breaker.state == "closed"
@@ -0,0 +1,63 @@
+import pytest
+
+from app.crud.crud_company import CRUDCompany
+from app.models.company import Company
+from app.schemas.company import CompanyCreate, CompanyUpdate
+
+
+@pytest.fixture
+def crud(db_session):
+    db_session.add_all([
+        Company(id_Company=1, BU="Norte", Company="Alfa", id_Oracle="ORA1", Estado_Cargue=1),
+        Company(id_Company=2, BU="Sur", Company="Beta", id_Oracle="ORA2", Estado_Cargue=1),
+        Company(id_Company=3, BU="Este", Company="Gamma", Estado_Cargue=0),
+    ])
+    db_session.commit()
+    return CRUDCompany()
+
+
+def names(companies):
+    return [obj.Company for obj in companies]
+
+
+def test_active_reads_use_snapshot(crud, db_session):
+    assert names(crud.get_multi(db_session)) == ["Alfa", "Beta"]
+    assert crud.count(db_session) == 2
+    assert names(crud.get_companies_by_codes(db_session, ["ORA2", "1", "3"])) == ["Alfa", "Beta"]
+    assert names(crud.get_multi_by_ids(db_session, [2, 3])) == ["Beta"]
+
+    # Un cambio hecho por fuera de CRUDCompany no se ve hasta que vence el snapshot
+    db_session.query(Company).filter(Company.id_Company == 3).update({"Estado_Cargue": 1})
+    db_session.commit()
+    assert crud.count(db_session) == 2
+
+
+def test_inactive_reads_query_the_database(crud, db_session):
+    assert names(crud.get_multi(db_session, active_only=False)) == ["Alfa", "Beta", "Gamma"]
+    assert crud.count(db_session, active_only=False) == 3
+    assert names(crud.get_multi_by_ids(db_session, [2, 3], active_only=False)) == ["Beta", "Gamma"]
+
+
+def test_snapshot_reloads_after_ttl(crud, db_session):
+    assert crud.count(db_session) == 2
+    db_session.query(Company).filter(Company.id_Company == 3).update({"Estado_Cargue": 1})
+    db_session.commit()
+
+    crud.catalog._loaded_at -= crud.catalog.ttl_seconds
+
+    assert not crud.catalog.is_fresh()
+    assert crud.count(db_session) == 3
+
+
+def test_snapshot_reloads_after_writes(crud, db_session):
+    assert crud.count(db_session) == 2
+
+    created = crud.create(db_session, CompanyCreate(BU="Oeste", Company="Delta", id_Oracle="ORA4"))
+    assert names(crud.get_active_companies(db_session)) == ["Alfa", "Beta", "Delta"]
+
+    crud.update(db_session, created, CompanyUpdate(Company="Aaa"))
+    assert names(crud.get_active_companies(db_session)) == ["Aaa", "Alfa", "Beta"]
+
+    crud.delete(db_session, created.id_Company)
+    assert names(crud.get_active_companies(db_session)) == ["Alfa", "Beta"]
+    assert crud.get(db_session, created.id_Company).is_active is False
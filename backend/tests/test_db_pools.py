@@ -0,0 +1,98 @@
+import asyncio
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.db.databases import DatabaseManager
+from app.db.pool_stats import InstrumentedQueuePool, instrument_engine, pool_status
+
+
+@pytest.fixture
+def pool_defaults(monkeypatch):
+    for name, value in {"DB_POOL_SIZE": 5, "DB_MAX_OVERFLOW": 10, "DB_POOL_TIMEOUT": 30,
+                        "DB_POOL_RECYCLE": 300, "DB_POOL_PRE_PING": True}.items():
+        monkeypatch.setattr(settings, name, value)
+    for prefix in ("SATURNO13", "JUPITER12MIA", "MAIN"):
+        for key in ("POOL_SIZE", "MAX_OVERFLOW", "POOL_TIMEOUT", "POOL_RECYCLE", "POOL_PRE_PING"):
+            monkeypatch.delenv(f"{prefix}_{key}", raising=False)
+    return monkeypatch
+
+
+def test_pool_options_default_to_db_settings(pool_defaults):
+    assert settings.get_pool_options("main") == {
+        "pool_size": 5, "max_overflow": 10, "pool_timeout": 30, "pool_recycle": 300, "pool_pre_ping": True,
+    }
+
+
+def test_pool_options_per_database_overrides(pool_defaults):
+    pool_defaults.setenv("SATURNO13_POOL_SIZE", "10")
+    pool_defaults.setenv("SATURNO13_POOL_PRE_PING", "false")
+    pool_defaults.setenv("JUPITER12MIA_MAX_OVERFLOW", "0")
+    # La base principal solo usa los valores DB_*
+    pool_defaults.setenv("MAIN_POOL_SIZE", "99")
+
+    saturno13 = settings.get_pool_options("saturno13")
+    assert (saturno13["pool_size"], saturno13["pool_pre_ping"], saturno13["max_overflow"]) == (10, False, 10)
+    assert settings.get_pool_options("jupiter12mia")["max_overflow"] == 0
+    assert settings.get_pool_options("main")["pool_size"] == 5
+
+
+def test_async_capacity_matches_pool_capacity(pool_defaults):
+    pool_defaults.setenv("SATURNO13_POOL_SIZE", "3")
+    pool_defaults.setenv("SATURNO13_MAX_OVERFLOW", "2")
+    pool_defaults.setenv("JUPITER12MIA_MAX_OVERFLOW", "-1")
+
+    assert DatabaseManager.async_capacity("main") == 15
+    assert DatabaseManager.async_capacity("saturno13") == 5
+    # Overflow ilimitado: se acota al pool base
+    assert DatabaseManager.async_capacity("jupiter12mia") == 5
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://", poolclass=InstrumentedQueuePool, pool_size=2, max_overflow=1, pool_timeout=0.05)
+    yield engine
+    engine.dispose()
+
+
+def test_pool_status_reports_state_and_counters(engine):
+    stats = instrument_engine(engine, "test")
+    connections = [engine.connect() for _ in range(3)]
+
+    status = pool_status(engine, stats)
+    assert status["pool_class"] == "InstrumentedQueuePool"
+    assert (status["size"], status["checked_out"], status["overflow"], status["max_overflow"]) == (2, 3, 1, 1)
+    assert (status["checkouts"], status["checked_out_peak"], status["connects"]) == (3, 3, 3)
+
+    with pytest.raises(PoolTimeoutError):
+        engine.connect()
+    for connection in connections:
+        connection.close()
+
+    status = pool_status(engine, stats)
+    assert status["checked_out"] == 0
+    assert status["checkins"] == 3
+    assert status["timeouts"] == 1
+    assert status["wait_max_ms"] >= 40
+
+
+def test_manager_pool_status_includes_async_limiter(engine, pool_defaults):
+    manager = DatabaseManager.__new__(DatabaseManager)
+    manager._engines = {"main": engine}
+    manager._sessions = {"main": sessionmaker(bind=engine)}
+    manager._pool_stats = {"main": instrument_engine(engine, "main")}
+    manager._async_limiters = {}
+
+    async def query():
+        async with manager.get_async_session("main") as db:
+            return await db.run_sync(lambda session: session.execute(text("SELECT 1")).scalar())
+
+    assert asyncio.run(query()) == 1
+
+    status = manager.get_pool_status()["main"]
+    assert status["async_capacity"] == 15
+    assert (status["async_in_flight"], status["async_waiting"]) == (0, 0)
+    assert status["checkouts"] == 1
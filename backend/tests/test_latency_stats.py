@@ -0,0 +1,111 @@
+from datetime import datetime, timedelta
+
+import fakeredis
+import pytest
+
+from app.services.latency_stats import LATENCY_BUCKETS_MS, LatencyHistogram, LatencyRecorder
+
+
+def histogram(*durations):
+    result = LatencyHistogram()
+    for duration in durations:
+        result.observe(duration, error=False)
+    return result
+
+
+def test_empty_histogram():
+    assert histogram().percentile(0.99) == 0.0
+    assert histogram().summary()["avg_ms"] == 0.0
+
+
+def test_bucket_upper_bound_is_inclusive():
+    result = histogram(5, 5.001, 10000, 10000.5)
+
+    assert result.buckets[0] == 1
+    assert result.buckets[1] == 1
+    assert result.buckets[LATENCY_BUCKETS_MS.index(10000)] == 1
+    assert result.buckets[-1] == 1
+
+
+def test_percentiles_of_values_on_a_bucket_boundary_are_exact():
+    result = histogram(*[10] * 20)
+
+    assert result.percentile(0.5) == pytest.approx(10)
+    assert result.percentile(0.99) == pytest.approx(10)
+
+
+def test_percentiles_interpolate_within_buckets():
+    # 1..100 ms: reparto uniforme, los percentiles interpolados coinciden con los reales
+    result = histogram(*range(1, 101))
+
+    assert result.percentile(0.50) == pytest.approx(50)
+    assert result.percentile(0.95) == pytest.approx(95)
+    assert result.percentile(0.99) == pytest.approx(99)
+    assert result.percentile(1.0) == pytest.approx(100)
+
+
+def test_percentile_in_overflow_bucket_is_capped_by_max():
+    result = histogram(*[20] * 98, 15000, 30000)
+
+    # Nunca por debajo del mínimo observado ni por encima del límite del bucket
+    assert 20 <= result.percentile(0.5) <= 25
+    assert 10000 < result.percentile(0.99) <= 30000
+    assert result.percentile(1.0) == pytest.approx(30000)
+    assert result.summary()["max_ms"] == 30000
+
+
+def test_summary_counts_errors():
+    recorder = LatencyRecorder()
+    recorder.record("GET", "/trucks", 200, 12.0)
+    recorder.record("GET", "/trucks", 503, 30.0)
+    recorder.record("POST", "/trucks", 201, 100.0)
+
+    routes = {(item["method"], item["route"]): item for item in recorder.snapshot()["routes"]}
+
+    assert routes[("GET", "/trucks")]["count"] == 2
+    assert routes[("GET", "/trucks")]["errors"] == 1
+    assert routes[("GET", "/trucks")]["avg_ms"] == 21.0
+    assert [item["method"] for item in recorder.snapshot()["routes"]] == ["POST", "GET"]
+
+
+def test_hourly_average_of_empty_hour_is_zero(fake_redis):
+    recorder = LatencyRecorder()
+
+    assert recorder.hourly_average_ms(fake_redis) == 0.0
+
+    recorder.record("GET", "/trucks", 200, 10.0)
+    recorder.flush_hourly(fake_redis)
+    # Otra hora sin peticiones
+    assert recorder.hourly_average_ms(fake_redis, datetime.now() - timedelta(hours=2)) == 0.0
+
+
+def test_hourly_average_combines_workers(fake_redis):
+    workers = [LatencyRecorder(), LatencyRecorder()]
+    workers[0].record("GET", "/trucks", 200, 10.0)
+    workers[1].record("GET", "/trucks", 200, 20.0)
+    workers[1].record("GET", "/trucks", 200, 30.0)
+
+    for worker in workers:
+        worker.flush_hourly(fake_redis)
+        worker.flush_hourly(fake_redis)
+
+    assert workers[0].hourly_average_ms(fake_redis) == 20.0
+
+
+def test_hourly_average_without_redis_uses_local_totals():
+    server = fakeredis.FakeServer()
+    client = fakeredis.FakeRedis(server=server, decode_responses=True)
+    recorder = LatencyRecorder()
+    server.connected = False
+
+    assert recorder.hourly_average_ms(client) == 0.0
+
+    recorder.record("GET", "/trucks", 200, 10.0)
+    recorder.record("GET", "/trucks", 200, 30.0)
+    recorder.flush_hourly(client)
+
+    assert recorder.hourly_average_ms(client) == 20.0
+    # Lo no volcado se reintenta cuando Redis vuelve
+    server.connected = True
+    recorder.flush_hourly(client)
+    assert recorder.hourly_average_ms(client) == 20.0
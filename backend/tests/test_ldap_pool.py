@@ -0,0 +1,164 @@
+import pytest
+
+from app.core import ldap_pool as ldap_pool_module
+from app.core import security
+from app.core.ldap_pool import LDAPConnectionPool, LDAPPoolBindError, LDAPPoolTimeoutError
+
+
+class FakeConnection:
+    """Conexión ldap3 mínima: acepta solo las credenciales de `passwords`"""
+
+    passwords = {"svc@elite.local": "svc-secreta", "luis@elite.local": "clave"}
+    opened = []
+
+    def __init__(self, server, user=None, password=None, **kwargs):
+        self.user = user
+        self.password = password
+        self.closed = True
+        self.bound = False
+        self.result = None
+        self.entries = []
+        FakeConnection.opened.append(self)
+
+    def open(self):
+        self.closed = False
+
+    def bind(self):
+        self.bound = self.passwords.get(self.user) == self.password
+        self.result = {"result": 0 if self.bound else 49}
+        return self.bound
+
+    def search(self, **kwargs):
+        self.result = {"result": 0}
+
+    def unbind(self):
+        self.closed = True
+        self.bound = False
+
+
+@pytest.fixture(autouse=True)
+def fake_connection(monkeypatch):
+    FakeConnection.opened = []
+    monkeypatch.setattr(ldap_pool_module, "Connection", FakeConnection)
+    monkeypatch.setattr(security, "Connection", FakeConnection)
+
+
+def make_pool(size=2, password="svc-secreta", **overrides):
+    options = {"max_idle_seconds": 60, "acquire_timeout": 0.05}
+    options.update(overrides)
+    return LDAPConnectionPool(None, "svc@elite.local", password, size, **options)
+
+
+def test_acquire_is_bounded_by_pool_size():
+    pool = make_pool(size=1)
+    conn = pool.acquire()
+
+    with pytest.raises(LDAPPoolTimeoutError):
+        pool.acquire()
+
+    pool.release(conn)
+    assert pool.acquire() is conn
+
+
+def test_released_connection_is_reused_until_idle_expiry(monkeypatch):
+    pool = make_pool()
+    clock = [1000.0]
+    monkeypatch.setattr(ldap_pool_module.time, "monotonic", lambda: clock[0])
+
+    conn = pool.acquire()
+    pool.release(conn)
+    assert pool.acquire() is conn
+    pool.release(conn)
+
+    clock[0] += 60
+    fresh = pool.acquire()
+
+    assert fresh is not conn
+    assert conn.closed
+    assert pool.idle_count() == 0
+
+
+def test_failed_service_bind_is_discarded_and_frees_the_slot():
+    pool = make_pool(size=1, password="incorrecta")
+
+    with pytest.raises(LDAPPoolBindError):
+        pool.acquire()
+    assert FakeConnection.opened[0].closed
+
+    pool.bind_password = "svc-secreta"
+    assert pool.acquire().bound
+
+
+def test_release_discards_connections_not_bound_as_service_account():
+    pool = make_pool()
+    conn = pool.acquire()
+    conn.user, conn.password = "luis@elite.local", "clave"
+    conn.bind()
+
+    pool.release(conn)
+
+    assert conn.closed
+    assert pool.idle_count() == 0
+
+
+def test_failed_search_discards_connection():
+    pool = make_pool()
+    conn = pool.acquire()
+
+    pool.release(conn, reusable=False)
+
+    assert conn.closed
+    assert pool.idle_count() == 0
+
+
+class NoLockout:
+    def is_account_locked(self, username):
+        return False
+
+    def record_failed_attempt(self, username):
+        pass
+
+    def reset_failed_attempts(self, username):
+        pass
+
+
+@pytest.fixture
+def ldap_auth(monkeypatch):
+    auth = security.LDAPAuth.__new__(security.LDAPAuth)
+    auth.server = None
+    auth.search_base = "DC=ELITE,DC=local"
+    auth.connection_pool = make_pool()
+    auth.account_lockout = NoLockout()
+    auth.secure_logger = security.SecureLogger()
+    monkeypatch.setattr(security.ad_profile_cache, "get", lambda username: None)
+    monkeypatch.setattr(security.ad_profile_cache, "set", lambda username, profile: None)
+    monkeypatch.setattr(security.settings, "AD_DOMAIN", "elite.local")
+    monkeypatch.setattr(auth, "_get_user_info", lambda conn, username: {"username": username, "searched_as": conn.user})
+    return auth
+
+
+def test_authenticate_keeps_user_credentials_out_of_the_pool(ldap_auth):
+    result = ldap_auth.authenticate("luis", "clave")
+
+    assert result == {"username": "luis", "searched_as": "svc@elite.local"}
+    user_conn = next(conn for conn in FakeConnection.opened if conn.user == "luis@elite.local")
+    assert user_conn.closed
+    idle = [conn for conn, _ in ldap_auth.connection_pool._idle]
+    assert [conn.user for conn in idle] == ["svc@elite.local"]
+
+
+def test_authenticate_rejects_bad_password_without_touching_the_pool(ldap_auth):
+    result = ldap_auth.authenticate("luis", "otra")
+
+    assert result["error"] == "invalid_credentials"
+    assert [conn.user for conn in FakeConnection.opened] == ["luis@elite.local"]
+    assert FakeConnection.opened[0].closed
+
+
+def test_authenticate_without_service_account_searches_as_user(ldap_auth):
+    ldap_auth.connection_pool = LDAPConnectionPool(None, None, None, 2, 60, 0.05)
+
+    result = ldap_auth.authenticate("luis", "clave")
+
+    assert result["searched_as"] == "luis@elite.local"
+    assert all(conn.closed for conn in FakeConnection.opened)
@@ -0,0 +1,127 @@
+import gzip
+import json
+import logging
+import queue
+import sys
+
+import pytest
+
+from app.core import logging_config
+from app.core.logging_config import (
+    ACCESS_LOGGER_NAME, SLOW_REQUEST_MS, CompressedRotatingFileHandler, DroppingQueueHandler,
+    JsonFormatter, SamplingFilter, should_log_access,
+)
+
+
+def make_record(name="app.test", level=logging.INFO, message="mensaje", exc_info=None, **extra):
+    record = logging.LogRecord(name, level, __file__, 1, message, None, exc_info)
+    for field, value in extra.items():
+        setattr(record, field, value)
+    return record
+
+
+@pytest.fixture
+def random_value(monkeypatch):
+    value = {"next": 0.5}
+    monkeypatch.setattr(logging_config.random, "random", lambda: value["next"])
+    return value
+
+
+def test_sampling_filter_keeps_a_fraction_of_info(random_value):
+    sampling = SamplingFilter(0.3)
+
+    random_value["next"] = 0.29
+    assert sampling.filter(make_record())
+    random_value["next"] = 0.3
+    assert not sampling.filter(make_record())
+    assert not sampling.filter(make_record(level=logging.DEBUG))
+
+
+def test_sampling_filter_always_keeps_warnings_and_access_log(random_value):
+    sampling = SamplingFilter(0)
+    random_value["next"] = 0.99
+
+    assert sampling.filter(make_record(level=logging.WARNING))
+    assert sampling.filter(make_record(level=logging.ERROR))
+    # El access log tiene su propio muestreo (`should_log_access`)
+    assert sampling.filter(make_record(name=ACCESS_LOGGER_NAME))
+    assert SamplingFilter(1.0).filter(make_record())
+
+
+def test_access_log_sampling_never_drops_errors_or_slow_requests(random_value, monkeypatch):
+    monkeypatch.setattr(logging_config.settings, "ACCESS_LOG_SAMPLE_RATE", 0.2)
+    random_value["next"] = 0.99
+
+    assert not should_log_access(200, 12.0)
+    assert should_log_access(404, 12.0)
+    assert should_log_access(500, 12.0)
+    assert should_log_access(200, SLOW_REQUEST_MS)
+
+    random_value["next"] = 0.1
+    assert should_log_access(200, 12.0)
+
+    monkeypatch.setattr(logging_config.settings, "ACCESS_LOG_SAMPLE_RATE", 1.0)
+    random_value["next"] = 0.99
+    assert should_log_access(200, 12.0)
+
+
+def test_json_formatter_fields():
+    record = make_record(
+        name=ACCESS_LOGGER_NAME, message="GET /trucks 200", request_id="abc123", method="GET",
+        path="/trucks", status=200, duration_ms=12.5, client_ip="10.0.0.1", user_agent="ñandú/1.0",
+    )
+
+    entry = json.loads(JsonFormatter().format(record))
+
+    assert entry["level"] == "INFO"
+    assert entry["logger"] == ACCESS_LOGGER_NAME
+    assert entry["message"] == "GET /trucks 200"
+    assert (entry["request_id"], entry["status"], entry["duration_ms"]) == ("abc123", 200, 12.5)
+    assert entry["user_agent"] == "ñandú/1.0"
+    # Los campos ausentes no se emiten
+    assert "route" not in entry
+    assert "exception" not in entry
+
+
+def test_json_formatter_includes_exception():
+    try:
+        raise ValueError("falló")
+    except ValueError:
+        record = make_record(level=logging.ERROR, exc_info=sys.exc_info())
+
+    entry = json.loads(JsonFormatter().format(record))
+
+    assert "ValueError: falló" in entry["exception"]
+
+
+def test_rotated_files_are_gzipped(tmp_path):
+    log_file = tmp_path / "logs" / "onesite.log"
+    handler = CompressedRotatingFileHandler(str(log_file), max_bytes=200, backup_count=2)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    try:
+        for index in range(30):
+            handler.emit(make_record(message=f"registro {index:02d} " + "x" * 40))
+    finally:
+        handler.close()
+
+    rotated = sorted(path.name for path in log_file.parent.iterdir())
+    assert rotated == ["onesite.log", "onesite.log.1.gz", "onesite.log.2.gz"]
+    with gzip.open(log_file.parent / "onesite.log.1.gz", "rt", encoding="utf-8") as newest:
+        lines = newest.read().splitlines()
+    assert lines and all(line.startswith("registro ") for line in lines)
+    assert "registro 29" in log_file.read_text(encoding="utf-8")
+
+
+def test_full_queue_drops_and_counts_records(monkeypatch, capsys):
+    handler = DroppingQueueHandler(queue.Queue(2))
+
+    for index in range(5):
+        handler.handle(make_record(message=f"registro {index}"))
+
+    assert handler.queue.qsize() == 2
+    assert handler.dropped == 3
+    # Sin trazas de `handleError` en stderr
+    assert capsys.readouterr().err == ""
+
+    monkeypatch.setattr(logging_config, "_queue_handler", handler)
+    assert logging_config.logging_stats() == {"queued": 2, "dropped": 3, "max_queue_size": 2}
@@ -0,0 +1,64 @@
+import fakeredis
+import pytest
+
+from app.services.metrics_collector import MetricsCollector
+
+
+@pytest.fixture
+def workers(fake_redis):
+    return MetricsCollector(fake_redis, interval_seconds=60), MetricsCollector(fake_redis, interval_seconds=60)
+
+
+def test_only_one_worker_acquires_leadership(workers, fake_redis):
+    first, second = workers
+
+    assert first._try_lead() is True
+    assert second._try_lead() is False
+    assert fake_redis.get(MetricsCollector.LEADER_KEY) == first.worker_id
+    assert 0 < fake_redis.pttl(MetricsCollector.LEADER_KEY) <= first.lock_ttl_ms
+
+
+def test_leader_renews_its_lock(workers, fake_redis):
+    first, second = workers
+    first._try_lead()
+    fake_redis.pexpire(MetricsCollector.LEADER_KEY, 1000)
+
+    assert first._try_lead() is True
+
+    assert fake_redis.pttl(MetricsCollector.LEADER_KEY) > 1000
+    assert second._try_lead() is False
+
+
+def test_expired_lock_fails_over_to_another_worker(workers, fake_redis):
+    first, second = workers
+    first._try_lead()
+
+    # El líder murió sin liberar: el lock vence
+    fake_redis.delete(MetricsCollector.LEADER_KEY)
+    assert second._try_lead() is True
+
+    # El antiguo líder no puede renovar un lock que ya no es suyo
+    assert first._try_lead() is False
+    assert first.is_leader is False
+    assert fake_redis.get(MetricsCollector.LEADER_KEY) == second.worker_id
+
+
+def test_release_hands_over_leadership(workers, fake_redis):
+    first, second = workers
+    first._try_lead()
+
+    second._release()
+    assert fake_redis.get(MetricsCollector.LEADER_KEY) == first.worker_id
+
+    first._release()
+    assert second._try_lead() is True
+
+
+def test_no_worker_collects_without_redis():
+    server = fakeredis.FakeServer()
+    collectors = [MetricsCollector(fakeredis.FakeRedis(server=server), interval_seconds=60) for _ in range(2)]
+    collectors[0]._try_lead()
+    server.connected = False
+
+    assert [collector._try_lead() for collector in collectors] == [False, False]
+    assert not any(collector.is_leader for collector in collectors)
@@ -0,0 +1,106 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.core import middleware
+from app.core.middleware import OneSiteMiddleware
+from app.core.telemetry import HTTP_REQUESTS
+
+
+@pytest.fixture
+def finished(monkeypatch):
+    """Registra cada llamada a `OneSiteMiddleware._finish` (estado y ruta)"""
+    calls = []
+    original = OneSiteMiddleware._finish
+
+    def spy(scope, status_code, started, request_id):
+        calls.append((scope["method"], status_code, request_id))
+        original(scope, status_code, started, request_id)
+
+    monkeypatch.setattr(OneSiteMiddleware, "_finish", staticmethod(spy))
+    return calls
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    def read_item(item_id: int):
+        return JSONResponse(
+            {"id": item_id},
+            headers={"X-Frame-Options": "SAMEORIGIN", "Access-Control-Allow-Origin": "https://otro.example"},
+        )
+
+    @app.get("/stream")
+    def stream():
+        def chunks():
+            for _ in range(5):
+                yield b"x" * 100
+        return StreamingResponse(chunks(), media_type="application/octet-stream")
+
+    @app.get("/boom")
+    def boom():
+        raise RuntimeError("falla")
+
+    app.add_middleware(OneSiteMiddleware)
+    return TestClient(app, raise_server_exceptions=False)
+
+
+def test_preflight_is_answered_by_middleware(client, finished):
+    response = client.options("/items/1", headers={"Origin": "https://app.example", "Access-Control-Request-Method": "GET"})
+
+    assert response.status_code == 200
+    assert response.content == b""
+    assert response.headers["access-control-allow-methods"] == "*"
+    assert response.headers["access-control-max-age"] == "86400"
+    assert response.headers["x-frame-options"] == "DENY"
+    assert response.headers["strict-transport-security"].startswith("max-age=")
+    assert finished == [("OPTIONS", 200, response.headers["x-request-id"])]
+
+
+def test_valid_request_id_is_echoed(client):
+    response = client.get("/items/1", headers={"X-Request-ID": "abc-123.x_y"})
+
+    assert response.headers["x-request-id"] == "abc-123.x_y"
+
+
+@pytest.mark.parametrize("request_id", ["con espacios", "a" * 65, "<script>"])
+def test_invalid_request_id_is_replaced(client, request_id):
+    response = client.get("/items/1", headers={"X-Request-ID": request_id})
+
+    assert response.headers["x-request-id"] != request_id
+    assert len(response.headers["x-request-id"]) == 32
+
+
+def test_app_headers_are_replaced_not_duplicated(client):
+    response = client.get("/items/1")
+
+    assert response.headers.get_list("x-frame-options") == ["DENY"]
+    assert response.headers.get_list("access-control-allow-origin") == ["*"]
+    assert "X-Request-ID" in response.headers["access-control-expose-headers"]
+    assert float(response.headers["x-process-time"]) >= 0
+
+
+def test_streaming_response_is_finished_once(client, finished):
+    response = client.get("/stream")
+
+    assert response.status_code == 200
+    assert len(response.content) == 500
+    assert response.headers["x-content-type-options"] == "nosniff"
+    assert finished == [("GET", 200, response.headers["x-request-id"])]
+
+
+def test_exception_is_recorded_as_500(client, finished):
+    before = HTTP_REQUESTS.labels("GET", "/boom", "500")._value.get()
+
+    response = client.get("/boom")
+
+    assert response.status_code == 500
+    assert [status_code for _, status_code, _ in finished] == [500]
+    assert HTTP_REQUESTS.labels("GET", "/boom", "500")._value.get() == before + 1
+
+
+def test_route_template_groups_unmatched_paths():
+    assert middleware.route_template({"path": "/no/existe"}) == "unmatched"
@@ -0,0 +1,106 @@
+import base64
+from datetime import date
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.v1.endpoints import trucks
+from app.core.pagination import InvalidCursorError, decode_cursor, encode_cursor, merge_cursor_filters, next_cursor_for
+from app.db.base import get_db
+from app.models.trucks import Truck
+from app.services.truck_cache import truck_list_cache
+
+
+def test_cursor_round_trip():
+    filters = {"id_empresa": 3, "date_from": date(2024, 1, 31), "carrier": None}
+
+    last_id, decoded = decode_cursor(encode_cursor(125, filters))
+
+    assert last_id == 125
+    # Los filtros vacíos no viajan en el cursor y las fechas vuelven como `date`
+    assert decoded == {"id_empresa": 3, "date_from": date(2024, 1, 31)}
+
+
+@pytest.mark.parametrize("cursor", [
+    "no-es-base64!",
+    "//79",  # bytes que no son UTF-8
+    base64.urlsafe_b64encode(b"[1, 2]").decode(),
+    base64.urlsafe_b64encode(b'{"f": {}}').decode(),
+    base64.urlsafe_b64encode(b'{"id": "x"}').decode(),
+    base64.urlsafe_b64encode(b'{"id": 1e999}').decode(),
+    base64.urlsafe_b64encode(b'{"id": 1, "f": {"date_from": "ayer"}}').decode(),
+    "ñ",
+])
+def test_invalid_cursor_has_fixed_message(cursor):
+    with pytest.raises(InvalidCursorError) as exc_info:
+        decode_cursor(cursor)
+
+    assert str(exc_info.value) == "Cursor inválido"
+
+
+def test_merge_cursor_filters():
+    _, cursor_filters = decode_cursor(encode_cursor(10, {"id_empresa": 3, "date_from": date(2024, 1, 31)}))
+    request_filters = {"id_empresa": None, "date_from": date(2024, 1, 31), "estatus": None}
+
+    merged = merge_cursor_filters(cursor_filters, request_filters)
+
+    assert merged == {"id_empresa": 3, "date_from": date(2024, 1, 31), "estatus": None}
+
+
+def test_merge_cursor_filters_rejects_conflict():
+    _, cursor_filters = decode_cursor(encode_cursor(10, {"id_empresa": 3}))
+
+    with pytest.raises(InvalidCursorError, match="id_empresa"):
+        merge_cursor_filters(cursor_filters, {"id_empresa": 4})
+
+
+def test_next_cursor_only_for_full_pages():
+    items = [Truck(id=9), Truck(id=8)]
+
+    assert next_cursor_for(items, 3, {}) is None
+    assert next_cursor_for([], 0, {}) is None
+    assert decode_cursor(next_cursor_for(items, 2, {}))[0] == 8
+
+
+@pytest.fixture
+def trucks_client(db_session, monkeypatch):
+    monkeypatch.setattr(truck_list_cache, "ttl_seconds", 0)
+    db_session.add_all([Truck(id=truck_id, id_empresa=1 + truck_id % 2, load_number=f"L{truck_id}") for truck_id in range(1, 6)])
+    db_session.commit()
+
+    app = FastAPI()
+    app.include_router(trucks.router)
+    app.dependency_overrides[get_db] = lambda: db_session
+    return TestClient(app)
+
+
+def test_trucks_cursor_pages(trucks_client):
+    first = trucks_client.get("/trucks", params={"limit": 2})
+    assert [item["id"] for item in first.json()] == [5, 4]
+
+    second = trucks_client.get("/trucks", params={"limit": 2, "cursor": first.headers["X-Next-Cursor"]})
+    assert [item["id"] for item in second.json()] == [3, 2]
+
+    last = trucks_client.get("/trucks", params={"limit": 2, "cursor": second.headers["X-Next-Cursor"]})
+    assert [item["id"] for item in last.json()] == [1]
+    # Última página incompleta: no hay siguiente cursor
+    assert "X-Next-Cursor" not in last.headers
+
+
+def test_trucks_cursor_keeps_filters(trucks_client):
+    first = trucks_client.get("/trucks", params={"limit": 1, "id_empresa": 2})
+    cursor = first.headers["X-Next-Cursor"]
+
+    second = trucks_client.get("/trucks", params={"limit": 1, "cursor": cursor})
+    assert [item["id"] for item in second.json()] == [3]
+
+    conflict = trucks_client.get("/trucks", params={"limit": 1, "cursor": cursor, "id_empresa": 1})
+    assert conflict.status_code == 400
+
+
+def test_trucks_invalid_cursor_returns_400(trucks_client):
+    response = trucks_client.get("/trucks", params={"cursor": "//79"})
+
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Cursor inválido"}
@@ -0,0 +1,114 @@
+import fakeredis
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from app.core import rate_limiter as rate_limiter_module
+from app.core.config import settings
+from app.core.rate_limiter import ROUTE_COSTS, RateLimiter, enforce_rate_limit
+from app.core.security import create_access_token
+from app.services.security_counters import security_counters
+
+
+@pytest.fixture
+def limiter(fake_redis):
+    return RateLimiter(fake_redis)
+
+
+def tokens(client, key: str) -> float:
+    return float(client.hget(key, "tokens"))
+
+
+def test_hit_consumes_all_buckets(limiter, fake_redis):
+    result = limiter.hit("api", [("ip", "10.0.0.1", 10), ("user", "ana", 5)])
+
+    assert result == {"allowed": True, "remaining": 4}
+    assert tokens(fake_redis, "ratelimit:api:ip:10.0.0.1") == pytest.approx(9, abs=0.01)
+    assert tokens(fake_redis, "ratelimit:api:user:ana") == pytest.approx(4, abs=0.01)
+
+
+def test_hit_consumes_nothing_when_one_bucket_is_empty(limiter, fake_redis):
+    for _ in range(2):
+        assert limiter.hit("api", [("user", "ana", 2)])["allowed"]
+
+    result = limiter.hit("api", [("ip", "10.0.0.1", 10), ("user", "ana", 2)])
+
+    assert result["allowed"] is False
+    assert result["blocked_by"] == "user"
+    assert result["retry_after_seconds"] >= 1
+    # El bucket de la IP no se tocó: la petición rechazada no consume nada
+    assert not fake_redis.exists("ratelimit:api:ip:10.0.0.1")
+    assert tokens(fake_redis, "ratelimit:api:user:ana") == pytest.approx(0, abs=0.01)
+
+
+def test_blocked_by_reports_the_exhausted_identity(limiter):
+    assert limiter.hit("api", [("ip", "10.0.0.1", 1)])["allowed"]
+
+    result = limiter.hit("api", [("ip", "10.0.0.1", 1), ("user", "ana", 100)])
+
+    assert result["blocked_by"] == "ip"
+    # Con capacidad 1 por minuto, recuperar una unidad toma hasta 60 segundos
+    assert 1 <= result["retry_after_seconds"] <= 60
+
+
+def test_route_cost_is_weighted(limiter, fake_redis):
+    cost = ROUTE_COSTS["export_trucks"]
+
+    result = limiter.hit("api", [("ip", "10.0.0.1", 100)], cost)
+
+    assert result == {"allowed": True, "remaining": 100 - cost}
+    # Un costo mayor que el presupuesto no bloquea la ruta para siempre
+    assert limiter.hit("api", [("ip", "10.0.0.2", 5)], cost)["allowed"]
+
+
+def test_fails_open_when_redis_is_down():
+    server = fakeredis.FakeServer()
+    server.connected = False
+    limiter = RateLimiter(fakeredis.FakeRedis(server=server, decode_responses=True))
+
+    assert limiter.hit("api", [("ip", "10.0.0.1", 1)]) == {"allowed": True, "remaining": -1}
+
+
+@pytest.fixture
+def limited_client(fake_redis, monkeypatch):
+    monkeypatch.setattr(rate_limiter_module, "rate_limiter", RateLimiter(fake_redis))
+    monkeypatch.setattr(security_counters, "client", fake_redis)
+    monkeypatch.setattr(settings, "RATE_LIMIT_IP_PER_MINUTE", 3)
+    monkeypatch.setattr(settings, "RATE_LIMIT_USER_PER_MINUTE", 2)
+
+    app = FastAPI(dependencies=[Depends(enforce_rate_limit)])
+
+    @app.get("/trucks")
+    def read_trucks():
+        return {"ok": True}
+
+    @app.get("/ping")
+    def ping():
+        return {"ok": True}
+
+    return TestClient(app)
+
+
+def test_enforce_rate_limit_returns_429(limited_client, fake_redis):
+    assert limited_client.get("/ping").headers["X-RateLimit-Remaining"] == "2"
+    # read_trucks cuesta 2: agota el presupuesto de la IP
+    assert limited_client.get("/trucks").headers["X-RateLimit-Remaining"] == "0"
+
+    response = limited_client.get("/ping")
+
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    assert fake_redis.zscore(security_counters.key("rate_limited:ip"), "testclient") is not None
+
+
+def test_enforce_rate_limit_applies_user_budget(limited_client, fake_redis):
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'Ana'})}"}
+    for _ in range(2):
+        assert limited_client.get("/ping", headers=headers).status_code == 200
+
+    response = limited_client.get("/ping", headers=headers)
+
+    assert response.status_code == 429
+    assert fake_redis.zscore(security_counters.key("rate_limited:user"), "ana") is not None
+    # Sin token la IP todavía tiene saldo
+    assert limited_client.get("/ping").status_code == 200
@@ -0,0 +1,138 @@
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.v1.endpoints import auth
+from app.core.security import create_access_token
+from app.core.token_blacklist import token_blacklist
+from app.services.ad_profile_cache import ad_profile_cache
+from app.services.auth_context import auth_context_cache
+from app.services.refresh_tokens import RefreshTokenStore, refresh_token_store
+from app.services.security_counters import security_counters
+
+CLAIMS = {
+    "sub": "ana",
+    "email": "ana@example.com",
+    "full_name": "Ana Pérez",
+    "roles": ["User"],
+    "permissions": ["read"],
+}
+
+
+@pytest.fixture
+def store(fake_redis):
+    return RefreshTokenStore(fake_redis, ttl_seconds=3600)
+
+
+def test_token_is_single_use(store):
+    token = store.issue("ana", CLAIMS)
+
+    record = store.consume(token)
+
+    assert record["username"] == "ana"
+    assert record["claims"] == CLAIMS
+    assert store.consume(token) is None
+
+
+def test_reused_token_revokes_family(store):
+    first = store.issue("ana", CLAIMS)
+    second = store.reissue(store.consume(first), CLAIMS)
+
+    # Presentar de nuevo el token ya rotado revoca la familia: su reemplazo deja de servir
+    assert store.consume(first) is None
+    assert store.consume(second) is None
+
+
+def test_reissue_keeps_family_remaining_ttl(store, fake_redis):
+    token = store.issue("ana", CLAIMS)
+    family = json.loads(fake_redis.get(store._token_key(store._hash(token))))["family"]
+    fake_redis.expire(store._family_key(family), 120)
+
+    record = store.consume(token)
+    reissued = store.consume(store.reissue(record, CLAIMS))
+
+    assert 0 < record["remaining_seconds"] <= 120
+    assert reissued["family"] == family
+    assert 0 < reissued["remaining_seconds"] <= record["remaining_seconds"]
+
+
+def test_reissued_token_expires_with_family(store, fake_redis):
+    record = store.consume(store.issue("ana", CLAIMS))
+    record["remaining_seconds"] = 90
+
+    token = store.reissue(record, CLAIMS)
+
+    assert 0 < fake_redis.ttl(store._token_key(store._hash(token))) <= 90
+
+
+def test_revoke_and_revoke_user(store):
+    token = store.issue("ana", CLAIMS)
+    other = store.issue("ana", CLAIMS)
+    unrelated = store.issue("luis", CLAIMS)
+
+    store.revoke(token)
+    assert store.consume(token) is None
+    assert store.consume(other) is not None
+
+    another = store.issue("ana", CLAIMS)
+    store.revoke_user("Ana")
+    assert store.consume(another) is None
+    assert store.consume(unrelated) is not None
+
+
+@pytest.fixture
+def auth_client(fake_redis, monkeypatch):
+    for service in (refresh_token_store, auth_context_cache, ad_profile_cache, token_blacklist, security_counters):
+        monkeypatch.setattr(service, "client", fake_redis)
+    monkeypatch.setattr(refresh_token_store, "ttl_seconds", 3600)
+    monkeypatch.setattr(auth_context_cache, "ttl_seconds", 300)
+    fake_redis.set(auth_context_cache._key("ana"), json.dumps({
+        "username": "ana", "registered": True, "user_id": 1,
+        "is_active": True, "is_superuser": False, "company_codes": [],
+    }))
+
+    app = FastAPI()
+    app.include_router(auth.router, prefix="/auth")
+    return TestClient(app)
+
+
+def test_refresh_endpoint_rotates_token(auth_client):
+    token = refresh_token_store.issue("ana", CLAIMS)
+
+    response = auth_client.post("/auth/refresh", json={"refresh_token": token})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["user"]["username"] == "ana"
+    assert body["refresh_token"] and body["refresh_token"] != token
+    assert 0 < body["refresh_expires_in"] <= 3600
+
+    reused = auth_client.post("/auth/refresh", json={"refresh_token": token})
+    assert reused.status_code == 401
+    # La reutilización revocó la familia, incluido el token recién emitido
+    assert auth_client.post("/auth/refresh", json={"refresh_token": body["refresh_token"]}).status_code == 401
+
+
+def test_refresh_endpoint_rejects_inactive_user(auth_client, fake_redis):
+    token = refresh_token_store.issue("ana", CLAIMS)
+    fake_redis.set(auth_context_cache._key("ana"), json.dumps({
+        "username": "ana", "registered": True, "user_id": 1,
+        "is_active": False, "is_superuser": False, "company_codes": [],
+    }))
+
+    assert auth_client.post("/auth/refresh", json={"refresh_token": token}).status_code == 403
+
+
+def test_logout_revokes_refresh_session(auth_client):
+    token = refresh_token_store.issue("ana", CLAIMS)
+    access_token = create_access_token(CLAIMS)
+    headers = {"Authorization": f"Bearer {access_token}"}
+
+    response = auth_client.post("/auth/logout", json={"refresh_token": token}, headers=headers)
+
+    assert response.status_code == 200
+    assert auth_client.post("/auth/refresh", json={"refresh_token": token}).status_code == 401
+    # El access token queda en la blacklist
+    assert auth_client.get("/auth/me", headers=headers).status_code == 401
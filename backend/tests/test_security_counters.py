@@ -0,0 +1,78 @@
+import fakeredis
+import pytest
+import redis
+
+from app.services import security_counters as security_counters_module
+from app.services.security_counters import SecurityCounters
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(security_counters_module.time, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def counters(fake_redis, clock):
+    return SecurityCounters(fake_redis)
+
+
+def test_counts_only_members_still_active(counters, clock):
+    counters.mark("rate_limited:ip", "10.0.0.1", clock.now + 60)
+    counters.mark("rate_limited:ip", "10.0.0.2", clock.now + 120)
+    counters.mark("rate_limited:user", "ana", clock.now + 60)
+    counters.mark("lockouts", "luis", clock.now + 1800)
+
+    assert counters.counts() == {"blocked_ips": 2, "blocked_users": 1, "locked_accounts": 1, "blacklisted_tokens": 0}
+
+    clock.now += 60
+    # El límite vence justo en `until`: sigue contando hasta ese instante inclusive
+    assert counters.counts()["blocked_ips"] == 2
+
+    clock.now += 1
+    assert counters.counts() == {"blocked_ips": 1, "blocked_users": 0, "locked_accounts": 1, "blacklisted_tokens": 0}
+
+
+def test_mark_extends_window_and_purges_expired(counters, clock, fake_redis):
+    counters.mark("rate_limited:ip", "10.0.0.1", clock.now + 10)
+    counters.mark("rate_limited:ip", "10.0.0.2", clock.now + 10)
+    counters.mark("rate_limited:ip", "10.0.0.1", clock.now + 100)
+
+    clock.now += 50
+    counters.mark("rate_limited:ip", "10.0.0.3", clock.now + 10)
+
+    # El vencido se purga en la escritura; el renovado conserva su nuevo vencimiento
+    assert fake_redis.zrange(counters.key("rate_limited:ip"), 0, -1) == ["10.0.0.3", "10.0.0.1"]
+    assert counters.counts()["blocked_ips"] == 2
+
+
+def test_unmark_removes_before_expiry(counters, clock):
+    counters.mark("blacklisted_tokens", "jti1", clock.now + 60)
+    counters.mark("blacklisted_tokens", "jti2", clock.now + 60)
+
+    counters.unmark("blacklisted_tokens", "jti1")
+    counters.unmark("blacklisted_tokens", "desconocido")
+
+    assert counters.counts()["blacklisted_tokens"] == 1
+
+
+def test_writes_do_not_raise_without_redis(clock):
+    server = fakeredis.FakeServer()
+    counters = SecurityCounters(fakeredis.FakeRedis(server=server, decode_responses=True))
+    server.connected = False
+
+    counters.mark("lockouts", "ana", clock.now + 60)
+    counters.unmark("lockouts", "ana")
+
+    # La lectura sí propaga el error: quien la usa decide el valor de respaldo
+    with pytest.raises(redis.ConnectionError):
+        counters.counts()
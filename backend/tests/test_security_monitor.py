@@ -0,0 +1,148 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import fakeredis
+import pytest
+from sqlalchemy import text
+
+from app.services import security_monitor as security_monitor_module
+from app.services.security_monitor import SecurityMonitor
+
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def monitor(server, monkeypatch):
+    monitor = SecurityMonitor(cache_seconds=10, snapshot_ttl_seconds=60)
+    monitor.redis_client = fakeredis.FakeRedis(server=server, decode_responses=True)
+    monitor.async_redis_client = fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+    monitor.collected = []
+
+    def collect(persist):
+        monitor.collected.append(persist)
+        return {"source": "collected", "persist": persist}
+    monkeypatch.setattr(monitor, "_collect_metrics", collect)
+    return monitor
+
+
+def collect(monitor):
+    return asyncio.run(monitor.collect_security_metrics())
+
+
+def test_metrics_are_memoized_for_cache_seconds(monitor):
+    reads = []
+    read_snapshot = monitor._read_snapshot
+
+    async def counting_read():
+        reads.append(1)
+        return await read_snapshot()
+    monitor._read_snapshot = counting_read
+
+    first = collect(monitor)
+    assert collect(monitor) is first
+    assert len(reads) == 1
+
+    monitor._cached_at -= monitor.cache_seconds
+    collect(monitor)
+    assert len(reads) == 2
+
+
+def test_redis_snapshot_is_preferred(monitor):
+    monitor.redis_client.set(SecurityMonitor.SNAPSHOT_KEY, json.dumps({"source": "redis"}))
+    monitor._local_snapshot = {"source": "local"}
+    monitor._local_snapshot_at = security_monitor_module.time.monotonic()
+
+    assert collect(monitor) == {"source": "redis"}
+    assert monitor.collected == []
+
+
+def test_local_snapshot_is_used_when_redis_has_none(monitor, server):
+    monitor._local_snapshot = {"source": "local"}
+    monitor._local_snapshot_at = security_monitor_module.time.monotonic()
+
+    assert collect(monitor) == {"source": "local"}
+
+    # También si Redis no responde
+    monitor._cached_metrics = None
+    server.connected = False
+    assert collect(monitor) == {"source": "local"}
+    assert monitor.collected == []
+
+
+def test_collects_without_persisting_as_last_resort(monitor):
+    # Una instantánea local vencida no se sirve
+    monitor._local_snapshot = {"source": "local"}
+    monitor._local_snapshot_at = security_monitor_module.time.monotonic() - monitor.snapshot_ttl_seconds
+
+    assert collect(monitor) == {"source": "collected", "persist": False}
+    assert monitor.collected == [False]
+
+
+def test_refresh_snapshot_persists_and_publishes(monitor):
+    metrics = asyncio.run(monitor.refresh_snapshot())
+
+    assert monitor.collected == [True]
+    assert json.loads(monitor.redis_client.get(SecurityMonitor.SNAPSHOT_KEY)) == metrics
+    assert 0 < monitor.redis_client.ttl(SecurityMonitor.SNAPSHOT_KEY) <= 60
+    assert monitor._local_snapshot == metrics
+    # Los endpoints del mismo worker la reutilizan sin volver a leer
+    assert collect(monitor) is metrics
+
+
+@pytest.fixture
+def security_db(db_session):
+    """Tablas de auditoría del esquema `security` en una base SQLite adjunta"""
+    raw = db_session.connection().connection.driver_connection
+    raw.create_function("GETDATE", 0, lambda: datetime.now().isoformat(" "))
+    for statement in (
+        "ATTACH DATABASE ':memory:' AS security",
+        "CREATE TABLE security.audit_login_attempts (username TEXT, ip_address TEXT, attempt_time TEXT, success INTEGER)",
+        "CREATE TABLE security.account_lockouts (is_active INTEGER, lockout_start TEXT, lockout_end TEXT)",
+        "CREATE TABLE security.token_blacklist (blacklisted_at TEXT, expires_at TEXT)",
+    ):
+        db_session.execute(text(statement))
+    return db_session
+
+
+def at(**delta):
+    return (datetime.now() + timedelta(**delta)).isoformat(" ")
+
+
+def test_metrics_query_aggregates_the_last_hour(security_db):
+    security_db.execute(text("INSERT INTO security.audit_login_attempts VALUES (:u, :ip, :t, :s)"), [
+        {"u": "ana", "ip": "10.0.0.1", "t": at(minutes=-5), "s": 1},
+        {"u": "ana", "ip": "10.0.0.2", "t": at(minutes=-10), "s": 0},
+        {"u": "luis", "ip": "10.0.0.1", "t": at(minutes=-30), "s": 0},
+        {"u": "marta", "ip": "10.0.0.9", "t": at(hours=-2), "s": 1},
+    ])
+    security_db.execute(text("INSERT INTO security.account_lockouts VALUES (:a, :start, :end)"), [
+        {"a": 1, "start": at(minutes=-5), "end": at(minutes=25)},
+        {"a": 1, "start": at(hours=-3), "end": at(hours=1)},
+        {"a": 1, "start": at(hours=-3), "end": at(hours=-2)},
+        {"a": 0, "start": at(minutes=-20), "end": at(minutes=10)},
+    ])
+    security_db.execute(text("INSERT INTO security.token_blacklist VALUES (:at, :exp)"), [
+        {"at": at(minutes=-1), "exp": at(minutes=29)},
+        {"at": at(hours=-5), "exp": at(hours=-4)},
+    ])
+
+    metrics = SecurityMonitor()._get_db_metrics(security_db)
+
+    assert metrics["login_attempts"] == {
+        "total_attempts": 3, "successful_attempts": 1, "failed_attempts": 2,
+        "success_rate": pytest.approx(100 / 3), "unique_users": 2, "unique_ips": 2,
+    }
+    assert metrics["account_lockouts"] == {"active_lockouts": 2, "recent_lockouts": 2}
+    assert metrics["token_blacklist"] == {"active_blacklist": 1, "recent_blacklist": 1}
+
+
+def test_metrics_query_on_empty_tables(security_db):
+    metrics = SecurityMonitor()._get_db_metrics(security_db)
+
+    assert metrics["login_attempts"]["success_rate"] == 0
+    assert metrics["account_lockouts"] == {"active_lockouts": 0, "recent_lockouts": 0}
+    assert metrics["token_blacklist"] == {"active_blacklist": 0, "recent_blacklist": 0}
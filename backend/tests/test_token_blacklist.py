@@ -0,0 +1,125 @@
+import time
+from collections import OrderedDict
+
+import fakeredis
+import pytest
+from jose import jwt
+
+from app.core import security
+from app.core.config import settings
+from app.core.token_blacklist import TokenBlacklist
+
+
+def wait_for(condition, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+@pytest.fixture
+def workers():
+    """Dos procesos con su propia blacklist sobre el mismo Redis"""
+    server = fakeredis.FakeServer()
+    blacklists = [TokenBlacklist(fakeredis.FakeRedis(server=server, decode_responses=True)) for _ in range(2)]
+    yield blacklists
+    for blacklist in blacklists:
+        blacklist.stop()
+
+
+@pytest.fixture
+def unsynced(fake_redis, monkeypatch):
+    """Blacklist sin hilo de sincronización (suscripción aún no establecida)"""
+    blacklist = TokenBlacklist(fake_redis)
+    monkeypatch.setattr(blacklist, "start", lambda: None)
+    return blacklist
+
+
+def test_revocation_reaches_other_worker_via_pubsub(workers):
+    first, second = workers
+    second.start()
+    assert second._synced.wait(3)
+
+    first.revoke("abc", time.time() + 60)
+
+    assert wait_for(lambda: "abc" in second._revoked)
+    # Ya sincronizado, la verificación no consulta Redis
+    second.client.delete(second._key("abc"))
+    assert second.is_revoked("abc")
+    assert not second.is_revoked("otro")
+
+
+def test_snapshot_loads_live_keys_on_connect(workers):
+    first, second = workers
+    expires_at = int(time.time() + 60)
+    for index in range(1200):
+        first.client.set(first._key(f"jti{index}"), expires_at, ex=60)
+    first.client.set("blacklist:legacy-token", "blacklisted")
+
+    second._load_snapshot()
+
+    assert len(second._revoked) == 1200
+    assert second._revoked["jti7"] == expires_at
+
+
+def test_prune_drops_expired_entries(unsynced):
+    unsynced._remember("vencido", time.time() - 1)
+    unsynced._remember("vigente", time.time() + 60)
+
+    unsynced._prune()
+
+    assert list(unsynced._revoked) == ["vigente"]
+
+
+def test_expired_local_entry_is_not_revoked(unsynced):
+    unsynced._remember("vencido", time.time() - 1)
+
+    assert not unsynced.is_revoked("vencido")
+
+
+def test_unsynced_check_falls_back_to_redis(unsynced, fake_redis):
+    fake_redis.set(unsynced._key("abc"), int(time.time() + 60), ex=60)
+
+    assert unsynced.is_revoked("abc")
+    assert not unsynced.is_revoked("otro")
+
+    # Una vez sincronizado, lo que no está en memoria no está revocado
+    unsynced._synced.set()
+    assert not unsynced.is_revoked("abc")
+
+
+def test_unsynced_check_fails_open_without_redis(monkeypatch):
+    server = fakeredis.FakeServer()
+    blacklist = TokenBlacklist(fakeredis.FakeRedis(server=server, decode_responses=True))
+    monkeypatch.setattr(blacklist, "start", lambda: None)
+    server.connected = False
+
+    assert not blacklist.is_revoked("abc")
+
+
+@pytest.fixture
+def verifier(unsynced, fake_redis, monkeypatch):
+    monkeypatch.setattr(security, "token_blacklist", unsynced)
+    monkeypatch.setattr(security, "redis_client", fake_redis)
+    monkeypatch.setattr(security.token_decode_cache, "_entries", OrderedDict())
+
+
+def test_verify_token_checks_legacy_token_key(verifier, fake_redis):
+    token = jwt.encode({"sub": "ana", "exp": int(time.time() + 60)}, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    assert security.verify_token(token)["sub"] == "ana"
+
+    fake_redis.set(f"blacklist:{token}", "blacklisted", ex=60)
+
+    assert security.verify_token(token) is None
+
+
+def test_verify_token_checks_jti(verifier, unsynced):
+    token = security.create_access_token({"sub": "ana"})
+    payload = security.verify_token(token)
+    assert payload["sub"] == "ana"
+
+    unsynced.revoke(payload["jti"], time.time() + 60)
+
+    assert security.verify_token(token) is None
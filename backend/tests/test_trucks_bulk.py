@@ -0,0 +1,244 @@
+import pytest
+from anyio import CapacityLimiter
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from app.api.v1.endpoints import trucks
+from app.crud.crud_trucks import crud_truck
+from app.db.databases import AsyncDBSession, get_async_main_db
+from app.models.trucks import Truck
+from app.schemas.trucks import TruckBulkUpdateItem, TruckCreate
+from app.services.truck_cache import truck_list_cache
+
+
+@pytest.fixture
+def db(db_session, fake_redis, monkeypatch):
+    monkeypatch.setattr(truck_list_cache, "client", fake_redis)
+    monkeypatch.setattr(truck_list_cache, "ttl_seconds", 60)
+    # Falla real de base de datos para una fila concreta, dentro de un lote
+    db_session.execute(text("""
+        CREATE TRIGGER reject_carrier BEFORE INSERT ON trucks_control
+        WHEN NEW.carrier = 'RECHAZAR'
+        BEGIN SELECT RAISE(ABORT, 'carrier rechazado'); END
+    """))
+    db_session.commit()
+    return db_session
+
+
+def rows(*carriers):
+    return [(index, TruckCreate(id_empresa=1, id_warehouse=2, carrier=carrier, load_number=f"L{index}"))
+            for index, carrier in enumerate(carriers)]
+
+
+def test_create_bulk_inserts_in_chunks(db, fake_redis):
+    created, errors = crud_truck.create_bulk(db, rows(*["DHL"] * 7), chunk_size=3)
+
+    assert (created, errors) == (7, [])
+    assert db.query(Truck).count() == 7
+    # Los listados de la empresa y el almacén quedan invalidados
+    assert fake_redis.get(f"{truck_list_cache.VERSION_PREFIX}:{truck_list_cache._scope(1, 2)}") == "1"
+
+
+def test_create_bulk_mixes_column_sets(db):
+    data = [
+        (0, TruckCreate(load_number="A")),
+        (1, TruckCreate(load_number="B", carrier="DHL")),
+        (2, TruckCreate()),
+        (3, TruckCreate(load_number="C")),
+    ]
+
+    assert crud_truck.create_bulk(db, data) == (4, [])
+    assert sorted((truck.load_number or "", truck.carrier or "") for truck in db.query(Truck)) == [
+        ("", ""), ("A", ""), ("B", "DHL"), ("C", ""),
+    ]
+
+
+def test_create_bulk_falls_back_to_row_by_row(db):
+    created, errors = crud_truck.create_bulk(db, rows("DHL", "RECHAZAR", "UPS", "FedEx"), chunk_size=2)
+
+    assert created == 3
+    assert [error["index"] for error in errors] == [1]
+    assert errors[0]["load_number"] == "L1"
+    assert "carrier rechazado" in errors[0]["errors"][0]
+    assert sorted(carrier for carrier, in db.query(Truck.carrier)) == ["DHL", "FedEx", "UPS"]
+
+
+@pytest.fixture
+def bulk_client(db):
+    app = FastAPI()
+    app.include_router(trucks.router)
+    app.dependency_overrides[get_async_main_db] = lambda: AsyncDBSession(lambda: db, CapacityLimiter(1))
+    return TestClient(app)
+
+
+def test_bulk_endpoint_reports_row_errors(bulk_client):
+    response = bulk_client.post("/trucks/bulk", json=[
+        {"load_number": "A1", "carrier": "DHL"},
+        {"load_number": "A2", "qty": -1},
+        "no es un objeto",
+        {"load_number": "A4", "carrier": "RECHAZAR"},
+    ])
+
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["total"], body["created"], body["failed"]) == (4, 1, 3)
+    assert [error["index"] for error in body["errors"]] == [1, 2, 3]
+    assert body["errors"][0]["load_number"] == "A2"
+
+
+def test_bulk_endpoint_parses_multipart_csv(bulk_client, db):
+    content = "\ufeffload_number,carrier,qty,ship_date,file_name\nC1,DHL,10,2025-06-26,\nC2,,5,,otro.csv\nC3,UPS,x,,\n"
+
+    response = bulk_client.post("/trucks/bulk", files={"file": ("cargas.csv", content.encode("utf-8"), "text/csv")})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["total"], body["created"]) == (3, 2)
+    assert body["errors"][0]["index"] == 2
+    created = {truck.load_number: truck for truck in db.query(Truck)}
+    # Las celdas vacías son nulas y el nombre del archivo completa `file_name`
+    assert created["C1"].file_name == "cargas.csv"
+    assert created["C1"].qty == 10
+    assert created["C2"].carrier is None
+    assert created["C2"].file_name == "otro.csv"
+
+
+def test_bulk_endpoint_requires_file_field(bulk_client):
+    response = bulk_client.post("/trucks/bulk", data={"other": "x"}, files={"archivo": ("a.csv", b"load_number\nX\n")})
+
+    assert response.status_code == 400
+
+
+def test_bulk_endpoint_enforces_max_rows(bulk_client, db, monkeypatch):
+    monkeypatch.setattr(trucks, "BULK_MAX_ROWS", 2)
+
+    response = bulk_client.post("/trucks/bulk", json=[{"load_number": f"M{index}"} for index in range(3)])
+
+    assert response.status_code == 413
+    assert db.query(Truck).count() == 0
+
+
+@pytest.fixture
+def trucks_db(db):
+    db.execute(text("""
+        CREATE TRIGGER reject_carrier_update BEFORE UPDATE ON trucks_control
+        WHEN NEW.carrier = 'RECHAZAR'
+        BEGIN SELECT RAISE(ABORT, 'carrier rechazado'); END
+    """))
+    db.add_all([
+        Truck(id=1, id_empresa=1, id_warehouse=2, load_number="A", carrier="DHL"),
+        Truck(id=2, id_empresa=1, id_warehouse=2, load_number="B", carrier="DHL"),
+        Truck(id=3, id_empresa=1, id_warehouse=2, load_number="C", carrier="DHL"),
+    ])
+    db.commit()
+    return db
+
+
+def updates(*items):
+    return list(enumerate(TruckBulkUpdateItem(**item) for item in items))
+
+
+def carriers(db):
+    db.expire_all()
+    return {truck.load_number: truck.carrier for truck in db.query(Truck).order_by(Truck.id)}
+
+
+def test_update_bulk_by_id_and_load_number(trucks_db):
+    result = crud_truck.update_bulk(trucks_db, updates(
+        {"id": 1, "carrier": "UPS"},
+        {"load_number": "B", "carrier": "FedEx"},
+    ))
+
+    assert result == (2, 0, [])
+    assert carriers(trucks_db) == {"A": "UPS", "B": "FedEx", "C": "DHL"}
+
+
+def test_update_bulk_merges_keys_for_the_same_row(trucks_db, monkeypatch):
+    statements = []
+    update_rows = crud_truck._update_rows
+    monkeypatch.setattr(crud_truck, "_update_rows", lambda db, entries: statements.append(entries) or update_rows(db, entries))
+
+    result = crud_truck.update_bulk(trucks_db, updates(
+        {"id": 1, "carrier": "UPS", "door": "D1"},
+        {"load_number": "A", "carrier": "FedEx"},
+        {"load_number": "B", "door": "D2"},
+        {"load_number": "B", "door": "D3"},
+    ))
+
+    assert result == (2, 0, [])
+    # Una sola entrada por fila, con los últimos valores de cada campo
+    assert [row_id for row_id, _ in statements[0]] == [1, 2]
+    trucks_db.expire_all()
+    first, second = trucks_db.query(Truck).filter(Truck.id.in_([1, 2])).order_by(Truck.id)
+    assert (first.carrier, first.door) == ("FedEx", "D1")
+    assert second.door == "D3"
+
+
+def test_update_bulk_reports_missing_keys(trucks_db):
+    updated, created, errors = crud_truck.update_bulk(trucks_db, updates(
+        {"id": 99, "carrier": "UPS"},
+        {"load_number": "Z", "carrier": "UPS"},
+        {"carrier": "UPS"},
+    ))
+
+    assert (updated, created) == (0, 0)
+    assert [(error["index"], error["errors"]) for error in errors] == [
+        (0, ["Truck not found"]), (1, ["Truck not found"]), (2, ["Se requiere id o load_number"]),
+    ]
+    assert trucks_db.query(Truck).count() == 3
+
+
+def test_update_bulk_upsert_inserts_each_new_load_number_once(trucks_db):
+    updated, created, errors = crud_truck.update_bulk(trucks_db, updates(
+        {"id": 99, "carrier": "UPS"},
+        {"load_number": "N", "carrier": "UPS", "door": "D1"},
+        {"load_number": "N", "carrier": "FedEx"},
+        {"load_number": "A", "carrier": "TNT"},
+    ), upsert=True)
+
+    assert (updated, created) == (1, 1)
+    # Solo los load_number se insertan; un id inexistente sigue siendo un error
+    assert [error["index"] for error in errors] == [0]
+    new = trucks_db.query(Truck).filter(Truck.load_number == "N").all()
+    assert [(truck.carrier, truck.door) for truck in new] == [("FedEx", "D1")]
+
+
+def test_update_bulk_upsert_reports_insert_errors_for_every_merged_item(trucks_db):
+    updated, created, errors = crud_truck.update_bulk(trucks_db, updates(
+        {"load_number": "N", "carrier": "UPS"},
+        {"load_number": "N", "carrier": "RECHAZAR"},
+    ), upsert=True)
+
+    assert (updated, created) == (0, 0)
+    assert sorted(error["index"] for error in errors) == [0, 1]
+
+
+def test_update_bulk_falls_back_to_row_by_row(trucks_db):
+    updated, created, errors = crud_truck.update_bulk(trucks_db, updates(
+        {"id": 1, "carrier": "UPS"},
+        {"load_number": "B", "carrier": "RECHAZAR"},
+        {"id": 3, "carrier": "FedEx"},
+    ))
+
+    assert (updated, created) == (2, 0)
+    assert [(error["index"], error["load_number"]) for error in errors] == [(1, "B")]
+    assert "carrier rechazado" in errors[0]["errors"][0]
+    assert carriers(trucks_db) == {"A": "UPS", "B": "DHL", "C": "FedEx"}
+
+
+def test_bulk_update_endpoint(bulk_client, trucks_db):
+    response = bulk_client.patch("/trucks/bulk?upsert=true", json=[
+        {"id": 1, "carrier": "UPS"},
+        {"load_number": "A", "door": "D1"},
+        {"load_number": "N", "carrier": "UPS"},
+        {"load_number": "N", "carrier": "TNT"},
+        {"id": 99, "carrier": "UPS"},
+        {"load_number": "C", "carrier": "RECHAZAR"},
+    ])
+
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["total"], body["updated"], body["created"], body["failed"]) == (6, 1, 1, 2)
+    assert [error["index"] for error in body["errors"]] == [4, 5]
+    assert carriers(trucks_db) == {"A": "UPS", "B": "DHL", "C": "DHL", "N": "TNT"}
@@ -0,0 +1,105 @@
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.v1.endpoints import users
+from app.core.security import create_access_token
+from app.core.token_blacklist import token_blacklist
+from app.db.databases import get_main_db
+from app.models.user import User as UserModel
+from app.services.ad_profile_cache import ad_profile_cache
+from app.services.auth_context import auth_context_cache
+from app.services.refresh_tokens import refresh_token_store
+
+
+def cache_context(client, username, **overrides):
+    context = {
+        "username": username, "registered": True, "user_id": 1,
+        "is_active": True, "is_superuser": False, "company_codes": [],
+    }
+    context.update(overrides)
+    client.set(auth_context_cache._key(username), json.dumps(context))
+
+
+@pytest.fixture
+def users_client(db_session, fake_redis, monkeypatch):
+    for service in (auth_context_cache, ad_profile_cache, refresh_token_store, token_blacklist):
+        monkeypatch.setattr(service, "client", fake_redis)
+    monkeypatch.setattr(auth_context_cache, "ttl_seconds", 300)
+    # El costo de bcrypt no es lo que se prueba aquí
+    monkeypatch.setattr(users, "get_password_hash", lambda password: f"hash:{password}")
+
+    db_session.add_all([
+        UserModel(id=1, username="admin", email="admin@example.com", hashed_password="x", is_superuser=True),
+        UserModel(id=2, username="luis", email="luis@example.com", hashed_password="x"),
+    ])
+    db_session.commit()
+    cache_context(fake_redis, "admin", is_superuser=True)
+
+    app = FastAPI()
+    app.include_router(users.router, prefix="/users")
+    app.dependency_overrides[get_main_db] = lambda: db_session
+    client = TestClient(app)
+    client.headers["Authorization"] = f"Bearer {create_access_token({'sub': 'admin', 'permissions': ['*']})}"
+    return client
+
+
+def user_payload(username, **overrides):
+    payload = {"username": username, "email": f"{username}@example.com", "password": "secreta"}
+    payload.update(overrides)
+    return payload
+
+
+def test_superuser_context_grants_access(users_client):
+    response = users_client.get("/users/")
+
+    assert response.status_code == 200
+    assert response.headers["X-Total-Count"] == "2"
+
+
+def test_demoted_user_is_rejected_despite_token_permissions(users_client, fake_redis):
+    cache_context(fake_redis, "admin", is_superuser=False)
+
+    assert users_client.get("/users/").status_code == 403
+    assert users_client.delete("/users/2").status_code == 403
+
+
+def test_deactivated_user_is_rejected(users_client, fake_redis):
+    cache_context(fake_redis, "admin", is_superuser=True, is_active=False)
+
+    assert users_client.get("/users/2").status_code == 403
+
+
+def test_create_drops_cached_context(users_client, fake_redis):
+    # Un "no registrado" cacheado antes del alta no debe sobrevivir a ella
+    fake_redis.set(auth_context_cache._key("marta"), json.dumps({"username": "marta", "registered": False}))
+
+    response = users_client.post("/users/", json=user_payload("marta", company_permissions=[{"company_code": "ORA1"}]))
+
+    assert response.status_code == 200
+    assert not fake_redis.exists(auth_context_cache._key("marta"))
+
+
+def test_update_drops_cached_context_for_old_and_new_username(users_client, fake_redis):
+    cache_context(fake_redis, "luis", user_id=2)
+    cache_context(fake_redis, "luis.p", registered=False)
+
+    response = users_client.put("/users/2", json=user_payload("luis.p", is_superuser=True))
+
+    assert response.status_code == 200
+    assert not fake_redis.exists(auth_context_cache._key("luis"))
+    assert not fake_redis.exists(auth_context_cache._key("luis.p"))
+
+
+def test_delete_drops_cached_context(users_client, fake_redis):
+    cache_context(fake_redis, "luis", user_id=2)
+
+    assert users_client.delete("/users/2").status_code == 200
+
+    assert not fake_redis.exists(auth_context_cache._key("luis"))
+
+
+def test_cannot_delete_own_user(users_client):
+    assert users_client.delete("/users/1").status_code == 400